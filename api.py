@@ -0,0 +1,238 @@
+"""Headless HTTP query service for bots and integrations.
+
+Runs the same retrieval (VectorStoreManager) and generation (RAGSystem) as the
+Streamlit app, with the same role permissions, on an asyncio server:
+
+    python api.py --port 8080
+    curl -u employee:employee123 -d '{"query": "What is the vacation policy?"}' localhost:8080/query
+    curl -u employee:employee123 -X POST localhost:8080/token   # then -H "Authorization: Bearer <token>"
+    curl -u employee:employee123 -d '{"queries": ["PTO policy", "sick leave"]}' localhost:8080/search
+    curl localhost:8080/metrics   # Prometheus text format
+
+Blocking work (Chroma, embeddings, the Groq call) runs on a thread pool. At
+most Config.API_MAX_CONCURRENT_LLM generations are in flight; requests beyond
+that wait, and once Config.API_MAX_QUEUED are waiting new ones get 503.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from utils.auth import Authentication
+from utils.document_loader import format_citation
+from utils.metrics import render_prometheus
+from utils.resources import get_rag_system, get_vector_manager
+
+
+class QueryService:
+    def __init__(self, max_concurrent_llm: int = None, max_queued: int = None,
+                 request_timeout: float = None, worker_threads: int = None):
+        self.llm_slots = asyncio.Semaphore(max_concurrent_llm or Config.API_MAX_CONCURRENT_LLM)
+        self.max_queued = max_queued if max_queued is not None else Config.API_MAX_QUEUED
+        self.request_timeout = request_timeout or Config.API_REQUEST_TIMEOUT
+        self.executor = ThreadPoolExecutor(max_workers=worker_threads or Config.API_WORKER_THREADS,
+                                           thread_name_prefix="query-api")
+        self.waiting = 0
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+
+    async def authenticate(self, request: web.Request) -> dict:
+        """Profile of the caller, from a Bearer session token (see /token) or Basic credentials"""
+        header = request.headers.get("Authorization", "")
+        if header.startswith("Bearer "):
+            # HMAC check only; cheap enough for the event loop
+            user = Authentication.verify_token(header[7:].strip())
+            if user is None:
+                raise web.HTTPUnauthorized(text="Invalid or expired token",
+                                           headers={"WWW-Authenticate": 'Bearer realm="knowledge-agent"'})
+            return user
+        if not header.startswith("Basic "):
+            raise web.HTTPUnauthorized(headers={"WWW-Authenticate": 'Basic realm="knowledge-agent"'})
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode("utf-8").partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            raise web.HTTPUnauthorized()
+        # bcrypt is CPU-bound; keep it off the event loop
+        user = await self._run_blocking(Authentication.authenticate, username, password)
+        if user is None:
+            raise web.HTTPUnauthorized(headers={"WWW-Authenticate": 'Basic realm="knowledge-agent"'})
+        return user
+
+    async def handle_token(self, request: web.Request) -> web.Response:
+        """Exchange Basic credentials for a session token, so later requests skip bcrypt"""
+        user = await self.authenticate(request)
+        token = await self._run_blocking(Authentication.issue_token, user)
+        return web.json_response({"token": token, "token_type": "Bearer", "expires_in": Config.SESSION_TIMEOUT})
+
+    def _release_llm_slot(self, generation: asyncio.Future):
+        self.llm_slots.release()
+        if not generation.cancelled():
+            # Retrieve the outcome so an abandoned generation's error isn't reported as unhandled
+            generation.exception()
+
+    async def answer(self, user: dict, query: str, k: int) -> dict:
+        vector_manager = get_vector_manager()
+        rag_system = get_rag_system()
+
+        collections = await self._run_blocking(
+            vector_manager.visible_partitions, user["department"],
+            all_departments=Authentication.has_permission(user["role"], "view_all_departments")
+        )
+        collection_version = await self._run_blocking(vector_manager.collections_version, collections)
+        # A paraphrase of an already answered question skips retrieval and the LLM slot
+        cached = await self._run_blocking(rag_system.cached_answer, query, collection_version, k, user)
+        if cached is not None:
+            response, sources, similar_query = cached
+            return {"answer": response, "sources": sources, "chunks": [], "similar_query": similar_query}
+
+        docs = await self._run_blocking(vector_manager.search_documents, query, k=k, collection_names=collections)
+        if not docs:
+            return {"answer": None, "sources": [], "chunks": []}
+
+        if self.waiting >= self.max_queued and self.llm_slots.locked():
+            raise web.HTTPServiceUnavailable(text="Too many requests in flight", headers={"Retry-After": "1"})
+        self.waiting += 1
+        try:
+            await self.llm_slots.acquire()
+        finally:
+            self.waiting -= 1
+        # The slot is held until the generation itself finishes: a request that
+        # times out stops waiting, but its executor thread keeps calling Groq
+        loop = asyncio.get_running_loop()
+        generation = loop.run_in_executor(
+            self.executor,
+            lambda: rag_system.generate_response(query, docs, cache_version=collection_version, user=user, k=k)
+        )
+        generation.add_done_callback(self._release_llm_slot)
+        response, sources = await asyncio.shield(generation)
+
+        return {
+            "answer": response,
+            "sources": sources,
+            "chunks": [
+                {"source": format_citation(doc.metadata), "content": doc.page_content}
+                for doc in docs
+            ]
+        }
+
+    async def handle_query(self, request: web.Request) -> web.Response:
+        user = await self.authenticate(request)
+        if not Authentication.has_permission(user["role"], "query"):
+            raise web.HTTPForbidden(text="Missing permission: query")
+        body = await self._read_body(request)
+        query = str(body.get("query", "")).strip()
+        if not query:
+            raise web.HTTPBadRequest(text="'query' is required")
+        k = self._parse_k(body)
+
+        try:
+            result = await asyncio.wait_for(self.answer(user, query, k), timeout=self.request_timeout)
+        except asyncio.TimeoutError:
+            raise web.HTTPGatewayTimeout(text="Query timed out")
+        return web.json_response(result)
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        """Retrieval only, for a batch of queries: per-query chunks with scores plus the fused list"""
+        user = await self.authenticate(request)
+        if not Authentication.has_permission(user["role"], "query"):
+            raise web.HTTPForbidden(text="Missing permission: query")
+        body = await self._read_body(request)
+        queries = body.get("queries")
+        if not isinstance(queries, list) or not queries:
+            raise web.HTTPBadRequest(text="'queries' must be a non-empty list")
+        queries = [str(query).strip() for query in queries]
+        if not all(queries):
+            raise web.HTTPBadRequest(text="'queries' must not contain empty strings")
+        if len(queries) > Config.API_MAX_BATCH_QUERIES:
+            raise web.HTTPBadRequest(text=f"At most {Config.API_MAX_BATCH_QUERIES} queries per request")
+        k = self._parse_k(body)
+
+        vector_manager = get_vector_manager()
+        collections = await self._run_blocking(
+            vector_manager.visible_partitions, user["department"],
+            all_departments=Authentication.has_permission(user["role"], "view_all_departments")
+        )
+        try:
+            batch = await asyncio.wait_for(
+                self._run_blocking(vector_manager.search_batch, queries, k=k, collection_names=collections),
+                timeout=self.request_timeout
+            )
+        except asyncio.TimeoutError:
+            raise web.HTTPGatewayTimeout(text="Search timed out")
+
+        def chunk(doc, score=None) -> dict:
+            found = {"source": format_citation(doc.metadata), "content": doc.page_content}
+            if score is not None:
+                found["score"] = round(score, 6)
+            return found
+
+        return web.json_response({
+            "results": [
+                {"query": query, "chunks": [chunk(doc, score) for doc, score in results]}
+                for query, results in zip(queries, batch["results"])
+            ],
+            "fused": [chunk(doc) for doc in batch["fused"]]
+        })
+
+    @staticmethod
+    async def _read_body(request: web.Request) -> dict:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Body must be JSON")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="Body must be a JSON object")
+        return body
+
+    @staticmethod
+    def _parse_k(body: dict) -> int:
+        try:
+            k = int(body.get("k", 4))
+        except (TypeError, ValueError):
+            raise web.HTTPBadRequest(text="'k' must be an integer")
+        return max(1, min(k, Config.API_MAX_K))
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "in_flight_waiting": self.waiting})
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def close(self, app: web.Application):
+        self.executor.shutdown(wait=False)
+
+
+def create_app(service: QueryService = None) -> web.Application:
+    service = service or QueryService()
+    app = web.Application()
+    app["service"] = service
+    app.router.add_get("/health", service.handle_health)
+    app.router.add_get("/metrics", service.handle_metrics)
+    app.router.add_post("/token", service.handle_token)
+    app.router.add_post("/query", service.handle_query)
+    app.router.add_post("/search", service.handle_search)
+    app.on_cleanup.append(service.close)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Company Knowledge Agent query API")
+    parser.add_argument("--host", default=Config.API_HOST)
+    parser.add_argument("--port", type=int, default=Config.API_PORT)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,11 +6,17 @@ import streamlit as st
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Now import your modules
-from utils.document_loader import DocumentProcessor
-from utils.vector_store import VectorStoreManager
+from utils.document_loader import format_citation
 from utils.auth import Authentication, AuditLogger
+from utils.resources import (
+    get_audit_store, get_document_processor, get_ingest_queue, get_ingest_workers, get_rag_system,
+    get_vector_manager
+)
+from utils.cache import normalize_query
+from utils.chunk_store import stitch
+from utils.metrics import cache_summary, stage_summary, start_file_exporter
 from config import Config
-from groq import Groq
+import pandas as pd
 import time
 
 
@@ -22,70 +28,6 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize components
-document_processor = DocumentProcessor()
-vector_manager = VectorStoreManager()
-
-class RAGSystem:
-    def __init__(self):
-        try:
-            self.client = Groq(api_key=Config.GROQ_API_KEY)
-            print("✅ Groq client initialized successfully")
-        except Exception as e:
-            st.error(f"Failed to initialize Groq client: {e}")
-            self.client = None
-    
-    def generate_response(self, query: str, context_docs: list) -> str:
-        if not self.client:
-            return "Error: Groq client not initialized. Check your API key.", []
-        
-        context = "\n\n".join([doc.page_content for doc in context_docs])
-        sources = list(set([doc.metadata.get("source", "Unknown") for doc in context_docs]))
-        
-        prompt = f"""Based on the following company documents, please answer the user's question. 
-        If the information is not in the provided context, say you don't know.
-
-        Company Documents Context:
-        {context}
-
-        User Question: {query}
-
-        Please provide a helpful answer with citations from the source documents:"""
-        
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful company knowledge assistant. Provide accurate answers based on the given documents."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model=Config.GROQ_MODEL,
-                temperature=0.1,
-                max_tokens=1024
-            )
-            
-            response = chat_completion.choices[0].message.content
-            
-            # Log the interaction
-            if st.session_state.get("authenticated", False):
-                AuditLogger.log_query(
-                    st.session_state["username"],
-                    query,
-                    response,
-                    sources
-                )
-            
-            return response, sources
-            
-        except Exception as e:
-            error_msg = f"Error generating response: {str(e)}"
-            return error_msg, []
-
 def login_section():
     """Display login form"""
     st.sidebar.title("🔐 Login")
@@ -102,6 +44,35 @@ def login_section():
             else:
                 st.sidebar.error("Invalid credentials")
 
+def ingestion_jobs_section() -> bool:
+    """Show the current user's recent ingestion jobs; returns True while any is still pending"""
+    if Config.INGEST_RUN_IN_APP:
+        get_ingest_workers()
+    jobs = get_ingest_queue().list_jobs(username=st.session_state["username"], limit=5)
+    if not jobs:
+        return False
+    
+    st.subheader("📦 Ingestion Jobs")
+    active = False
+    for job in jobs:
+        label = (f"Job #{job['id']} · {job['status']} · {job['files_parsed']}/{job['files_total']} files · "
+                 f"{job['chunks_embedded']}/{job['chunks_total']} chunks · {job['chunks_per_second']:.1f} chunks/s")
+        if job["status"] in ("spooling", "queued", "running"):
+            active = True
+            st.progress(job["files_parsed"] / max(job["files_total"], 1), text=label)
+        elif job["status"] in ("failed", "partial"):
+            failures = "; ".join(f"{name}: {error}" for name, error in get_ingest_queue().failed_files(job["id"]))
+            details = " — ".join(part for part in (job["error"], failures) if part)
+            if job["status"] == "failed":
+                st.error(f"{label} — {details}")
+            else:
+                st.warning(f"{label} — {details}")
+        else:
+            st.caption(f"✅ {label}")
+    if active:
+        st.button("🔄 Refresh job progress")
+    return active
+
 def main_application():
     """Main application after login"""
     
@@ -109,6 +80,18 @@ def main_application():
     if Authentication.check_session_timeout():
         st.rerun()
     
+    # Shared across sessions; created on first use after login
+    start_file_exporter()
+    document_processor = get_document_processor()
+    vector_manager = get_vector_manager()
+    # Searches only cover the shared collection and the user's department partition
+    visible_collections = vector_manager.visible_partitions(
+        st.session_state["department"], all_departments=Authentication.check_permission("view_all_departments")
+    )
+    upload_collection = vector_manager.partition_name(st.session_state["department"])
+    jobs_active = False
+    answer_shown = False
+    
     # Sidebar
     st.sidebar.title(f"🏢 Company Knowledge Agent")
     st.sidebar.write(f"Welcome, **{st.session_state['username']}**")
@@ -116,7 +99,7 @@ def main_application():
     st.sidebar.write(f"Department: **{st.session_state['department']}**")
     
     # Search Statistics
-    stats = vector_manager.get_search_stats()
+    stats = vector_manager.get_search_stats(visible_collections)
     st.sidebar.info(f"📊 Knowledge Base: {stats['total_chunks']} chunks")
     
     # Admin tools in sidebar
@@ -125,14 +108,14 @@ def main_application():
         
         # Add clear database button
         if st.sidebar.button("🗑️ Clear Database"):
-            if vector_manager.clear_database():
+            if vector_manager.clear_database(visible_collections):
                 st.sidebar.success("Database cleared! Upload new documents.")
                 st.rerun()
         
         if st.sidebar.button("View Audit Logs"):
-            logs = AuditLogger.get_audit_logs()
-            if logs:
-                st.sidebar.info(f"Total queries: {len(logs)}")
+            total = AuditLogger.count_audit_logs()
+            if total:
+                st.sidebar.info(f"Total queries: {total}")
             else:
                 st.sidebar.info("No audit logs yet")
     
@@ -157,26 +140,48 @@ def main_application():
         
         if uploaded_files:
             st.write(f"Selected {len(uploaded_files)} file(s) for processing")
+            if Config.PARTITION_BY_DEPARTMENT and Authentication.check_permission("view_all_departments"):
+                if st.checkbox("Share with all departments"):
+                    upload_collection = Config.SHARED_COLLECTION
             
             if st.button("Process Documents", type="primary"):
-                with st.spinner("Processing documents..."):
-                    all_documents = []
-                    for uploaded_file in uploaded_files:
-                        documents = document_processor.process_uploaded_file(uploaded_file)
-                        all_documents.extend(documents)
+                if Config.BACKGROUND_INGESTION:
+                    job_id = get_ingest_queue().enqueue(
+                        [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files],
+                        username=st.session_state["username"],
+                        department=st.session_state["department"],
+                        collection_name=upload_collection
+                    )
+                    st.success(f"📥 Queued ingestion job #{job_id}. You can keep working while it runs.")
+                else:
+                    with st.spinner("Processing documents..."):
+                        progress = st.progress(0.0)
+                        parsed_files = 0
+                        indexed_files = 0
+                        failed_files = 0
+                        # Files are indexed as soon as they are parsed, while the rest keep parsing
+                        for file_name, documents in document_processor.iter_uploaded_files(uploaded_files):
+                            parsed_files += 1
+                            # documents may be a lazy iterator, parsed as it is indexed
+                            if vector_manager.create_vector_store(documents, collection_name=upload_collection):
+                                indexed_files += 1
+                            else:
+                                failed_files += 1
+                            progress.progress(parsed_files / len(uploaded_files), text=f"Processed {file_name}")
                     
-                    if all_documents:
-                        success = vector_manager.create_vector_store(all_documents)
-                        if success:
-                            st.success("✅ Documents processed and added to knowledge base!")
-                            
+                        if indexed_files:
+                            st.success(f"✅ {indexed_files} document(s) processed and added to knowledge base!")
+                        
                             # Show enhanced stats
-                            stats = vector_manager.get_search_stats()
+                            stats = vector_manager.get_search_stats(visible_collections)
                             st.info(f"📊 Knowledge base now has {stats['total_chunks']} searchable chunks")
-                        else:
-                            st.error("❌ Failed to process documents")
-                    else:
-                        st.warning("No documents were processed")
+                        if failed_files:
+                            st.error(f"❌ Failed to process {failed_files} document(s)")
+                        if not indexed_files and not failed_files:
+                            st.warning("No documents were processed")
+        
+        if Config.BACKGROUND_INGESTION:
+            jobs_active = ingestion_jobs_section()
     
     # Query Section
     st.header("💬 Ask Questions")
@@ -195,19 +200,48 @@ def main_application():
     if st.button("🔍 Get AI-Powered Answer", type="primary") and query:
         with st.spinner("🔍 Searching documents..."):
             # Search for relevant documents
-            relevant_docs = vector_manager.search_documents(query, k=result_count)
+            collection_version = vector_manager.collections_version(visible_collections)
+            rag_system = get_rag_system()
+            cached = rag_system.cached_answer(query, collection_version, result_count)
+            relevant_docs = [] if cached is not None else vector_manager.search_documents(
+                query, k=result_count, collection_names=visible_collections
+            )
             
-            if relevant_docs:
+            if cached is not None:
+                answer_shown = True
+                response, sources, similar_query = cached
+                st.subheader("🤖 AI Answer:")
+                st.write(response)
+                if normalize_query(similar_query) != normalize_query(query):
+                    st.caption(f"♻️ Answer reused from a similar question: \"{similar_query}\"")
+                
+                st.subheader("📚 Sources:")
+                for source in sources:
+                    st.write(f"- {source}")
+            elif relevant_docs:
+                answer_shown = True
                 # Show search stats
                 st.info(f"📈 Found {len(relevant_docs)} relevant document chunks")
                 
                 # Generate response using RAG
-                rag_system = RAGSystem()
-                response, sources = rag_system.generate_response(query, relevant_docs)
-                
-                # Display response
                 st.subheader("🤖 AI Answer:")
-                st.write(response)
+                if Config.STREAM_RESPONSES:
+                    response_stream = rag_system.stream_response(query, relevant_docs, cache_version=collection_version,
+                                                                 k=result_count)
+                    answer_placeholder = st.empty()
+                    response = ""
+                    for token in response_stream:
+                        response += token
+                        answer_placeholder.markdown(response + "▌")
+                    answer_placeholder.markdown(response)
+                    sources = response_stream.sources
+                    if response_stream.time_to_first_token is not None:
+                        st.caption(f"⚡ First token after {response_stream.time_to_first_token:.2f}s")
+                else:
+                    response, sources = rag_system.generate_response(
+                        query, relevant_docs, cache_version=collection_version, k=result_count
+                    )
+                    st.write(response)
                 
                 # Display sources
                 st.subheader("📚 Sources:")
@@ -217,11 +251,16 @@ def main_application():
                 # Display relevant document snippets
                 with st.expander("🔍 View Retrieved Document Chunks", expanded=False):
                     for i, doc in enumerate(relevant_docs):
-                        source = doc.metadata.get('source', 'Unknown')
+                        source = format_citation(doc.metadata)
                         doc_type = doc.metadata.get('type', 'Unknown')
                         
                         st.write(f"**Chunk {i+1}** | Source: `{source}` | Type: `{doc_type}`")
                         st.write(f"**Content:** {doc.page_content[:400]}..." if len(doc.page_content) > 400 else f"**Content:** {doc.page_content}")
+                        if Config.SNIPPET_NEIGHBORS:
+                            run = vector_manager.neighbors(doc, Config.SNIPPET_NEIGHBORS)
+                            if len(run) > 1:
+                                st.text_area("Surrounding context", stitch(run), height=200,
+                                             disabled=True, key=f"context_{i}")
                         st.divider()
             else:
                 st.warning("❌ No relevant documents found. Please upload relevant documents first or try a different query.")
@@ -243,12 +282,32 @@ def main_application():
     if Authentication.check_permission("view_audit"):
         st.header("📊 Audit Logs")
         
-        logs = AuditLogger.get_audit_logs()
-        if logs:
-            st.write(f"**Total queries logged:** {len(logs)}")
+        audit_store = get_audit_store()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            user_filter = st.selectbox("User", ["All"] + audit_store.distinct("username"))
+        with col2:
+            department_filter = st.selectbox("Department", ["All"] + audit_store.distinct("department"))
+        with col3:
+            date_range = st.date_input("Date range", value=())
+        
+        filters = {
+            "username": None if user_filter == "All" else user_filter,
+            "department": None if department_filter == "All" else department_filter,
+        }
+        if len(date_range) == 2:
+            filters["since"] = time.mktime(date_range[0].timetuple())
+            filters["until"] = time.mktime(date_range[1].timetuple()) + 86400
+        
+        total = AuditLogger.count_audit_logs(**filters)
+        if total:
+            pages = (total + Config.AUDIT_PAGE_SIZE - 1) // Config.AUDIT_PAGE_SIZE
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+            st.write(f"**Total queries logged:** {total}")
             
-            # Show latest logs with enhanced display
-            for log in reversed(logs[-5:]):  # Show last 5 logs
+            logs = AuditLogger.get_audit_logs(limit=Config.AUDIT_PAGE_SIZE,
+                                              offset=(page - 1) * Config.AUDIT_PAGE_SIZE, **filters)
+            for log in logs:
                 with st.expander(f"🗓️ {time.ctime(log['timestamp'])} | 👤 {log['username']} | ❓ {log['query'][:50]}..."):
                     col1, col2 = st.columns(2)
                     with col1:
@@ -259,6 +318,23 @@ def main_application():
                     st.write(f"**Response:** {log['response']}")
         else:
             st.info("No audit logs available yet. Questions you ask will appear here.")
+    
+    # Performance metrics (for admin users); per server process
+    if Authentication.check_permission("view_audit") and Config.METRICS_ENABLED:
+        with st.expander("⏱️ Performance Metrics"):
+            stages = stage_summary()
+            if stages:
+                st.write("**Stage latency** (p50/p95 over recent samples)")
+                st.dataframe(pd.DataFrame(stages), hide_index=True, use_container_width=True)
+            else:
+                st.info("No timings recorded yet.")
+            st.write("**Cache hit rates**")
+            st.dataframe(pd.DataFrame(cache_summary()), hide_index=True, use_container_width=True)
+    
+    # Poll background ingestion progress; skipped right after an answer so the rerun doesn't clear it
+    if jobs_active and not answer_shown:
+        time.sleep(Config.INGEST_POLL_SECONDS)
+        st.rerun()
 
 def main():
     """Main application flow"""
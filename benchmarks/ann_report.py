@@ -0,0 +1,165 @@
+"""Recall vs latency of the vector index settings.
+
+Measures Chroma's HNSW implementation (chroma-hnswlib, used directly so each
+search_ef can be tried on one built graph) over a grid of M, construction_ef
+and search_ef, and the int8 QuantizedIndex over re-rank factors, against
+exact float32 search. Use it to pick Config.HNSW_* and VECTOR_INDEX.
+
+    python -m benchmarks.ann_report --vectors 50000 --k 10
+    python -m benchmarks.ann_report --vectors-file embeddings.npy --output ann.json
+
+Without --vectors-file the vectors are synthetic: unit-normalized points
+scattered around random cluster centres, which is harder for ANN than
+uniform noise and closer to sentence embeddings.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import latency_summary
+
+
+def synthetic_vectors(count: int, dimensions: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dimensions))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall(found: list, truth: np.ndarray) -> float:
+    hits = sum(len(set(ids) & set(expected.tolist())) for ids, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def exact_search(data: np.ndarray, queries: np.ndarray, k: int) -> tuple:
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        scores = data @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        results.append(top[np.argsort(-scores[top])])
+        latencies.append(time.perf_counter() - started)
+    return np.array(results), latencies
+
+
+def hnsw_rows(data: np.ndarray, queries: np.ndarray, truth: np.ndarray, args) -> list:
+    import hnswlib
+
+    rows = []
+    for m in args.m:
+        for construction_ef in args.construction_ef:
+            index = hnswlib.Index(space="cosine", dim=data.shape[1])
+            index.init_index(max_elements=len(data), M=m, ef_construction=construction_ef)
+            index.set_num_threads(1)
+            started = time.perf_counter()
+            index.add_items(data, np.arange(len(data)))
+            build_seconds = time.perf_counter() - started
+            for search_ef in args.search_ef:
+                index.set_ef(max(search_ef, args.k))
+                latencies = []
+                found = []
+                for query in queries:
+                    started = time.perf_counter()
+                    labels, _ = index.knn_query(query, k=args.k)
+                    latencies.append(time.perf_counter() - started)
+                    found.append(labels[0].tolist())
+                row = {"index": "hnsw", "M": m, "construction_ef": construction_ef, "search_ef": search_ef,
+                       f"recall_at_{args.k}": round(recall(found, truth), 4),
+                       "build_s": round(build_seconds, 2),
+                       # vectors plus roughly 2*M neighbour links per element on layer 0
+                       "memory_mb": round(len(data) * (data.shape[1] * 4 + m * 2 * 4) / 1e6, 1)}
+                row.update(latency_summary(latencies))
+                rows.append(row)
+    return rows
+
+
+def int8_rows(data: np.ndarray, queries: np.ndarray, truth: np.ndarray, args) -> list:
+    from utils.quantized_index import QuantizedIndex
+
+    workdir = tempfile.mkdtemp(prefix="ckb-ann-")
+    try:
+        index = QuantizedIndex(os.path.join(workdir, "bench.int8"))
+        started = time.perf_counter()
+        index.add([str(i) for i in range(len(data))], data)
+        index.memory_bytes()  # folds the appended block in before timing queries
+        build_seconds = time.perf_counter() - started
+        rows = []
+        for factor in args.rerank_factors:
+            latencies = []
+            found = []
+            for query in queries:
+                started = time.perf_counter()
+                hits = index.search(query, args.k, rerank_factor=factor)
+                latencies.append(time.perf_counter() - started)
+                found.append([int(chunk_id) for _, chunk_id in hits])
+            row = {"index": "int8", "rerank_factor": factor,
+                   f"recall_at_{args.k}": round(recall(found, truth), 4),
+                   "build_s": round(build_seconds, 2),
+                   "memory_mb": round(index.memory_bytes() / 1e6, 1)}
+            row.update(latency_summary(latencies))
+            rows.append(row)
+        return rows
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--vectors-file", help=".npy of embeddings to use instead of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.vectors_file:
+        data = np.load(args.vectors_file).astype(np.float32)
+        data /= np.linalg.norm(data, axis=1, keepdims=True)
+    else:
+        data = synthetic_vectors(args.vectors + args.queries, args.dimensions, args.clusters, args.seed)
+    queries, data = data[:args.queries], data[args.queries:]
+
+    truth, latencies = exact_search(data, queries, args.k)
+    rows = [dict(index="exact", **{f"recall_at_{args.k}": 1.0}, build_s=0.0,
+                 memory_mb=round(data.nbytes / 1e6, 1), **latency_summary(latencies))]
+    rows += hnsw_rows(data, queries, truth, args)
+    rows += int8_rows(data, queries, truth, args)
+
+    recall_key = f"recall_at_{args.k}"
+    print(f"{len(data)} vectors x {data.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"{'index':<6} {'settings':<28} {recall_key:>12} {'p50_ms':>8} {'p95_ms':>8} {'build_s':>8} {'memory_mb':>10}")
+    for row in rows:
+        if row["index"] == "hnsw":
+            settings = f"M={row['M']} ef_c={row['construction_ef']} ef_s={row['search_ef']}"
+        elif row["index"] == "int8":
+            settings = f"rerank x{row['rerank_factor']}"
+        else:
+            settings = "float32 brute force"
+        print(f"{row['index']:<6} {settings:<28} {row[recall_key]:>12} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+              f"{row['build_s']:>8} {row['memory_mb']:>10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"vectors": len(data), "dimensions": int(data.shape[1]), "queries": len(queries),
+                       "k": args.k, "results": rows}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
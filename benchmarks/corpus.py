@@ -0,0 +1,150 @@
+"""Synthetic TXT/PDF/CSV corpora with a labeled question set.
+
+Every fact carries a unique code (policy or SKU). A question counts as answered
+at k when any of the top-k retrieved chunks contains its code.
+"""
+import csv
+import io
+import os
+import random
+from typing import List, Tuple
+
+DEPARTMENTS = ["Engineering", "Finance", "HR", "IT", "Legal", "Marketing", "Operations", "Sales"]
+TOPICS = ["vacation", "remote work", "sick leave", "training", "parental leave", "volunteer"]
+FILLER = [
+    "All employees are expected to follow the guidelines described in this handbook.",
+    "Managers should review these procedures with new team members during onboarding.",
+    "Exceptions must be approved in writing by the department head.",
+    "Questions about this section can be directed to the People Operations team.",
+    "This document is reviewed annually and updated as regulations change.",
+    "Requests submitted after the deadline will be processed in the next cycle.",
+    "Records of approvals are kept for a minimum of seven years.",
+    "Please consult the intranet for the most recent version of each form.",
+]
+
+
+def _fact(rng: random.Random, code: str) -> Tuple[str, str]:
+    department = rng.choice(DEPARTMENTS)
+    topic = rng.choice(TOPICS)
+    days = rng.randint(1, 40)
+    sentence = f"Policy {code} states that {department} staff receive {days} {topic} days per year."
+    question = f"How many {topic} days do {department} staff get under policy {code}?"
+    return sentence, question
+
+
+def _paragraph(rng: random.Random, sentences: int = 5) -> str:
+    return " ".join(rng.choice(FILLER) for _ in range(sentences))
+
+
+def _escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """Minimal PDF with one text line per entry on each page (Helvetica, no dependencies)"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font_ref = 3 + 2 * len(pages)
+    for i, lines in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_ref} 0 R >> >> >>"
+        )
+        commands = ["BT", "/F1 10 Tf", "14 TL", "40 750 Td"]
+        commands += [f"({_escape_pdf_text(line)}) '" for line in lines]
+        commands.append("ET")
+        stream = "\n".join(commands)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    return out.getvalue()
+
+
+def generate_corpus(directory: str, txt_files: int = 20, pdf_files: int = 10, csv_files: int = 2,
+                    paragraphs: int = 30, pdf_pages: int = 10, csv_rows: int = 2000,
+                    questions_per_file: int = 3, seed: int = 7,
+                    duplicate_files: int = 0) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Write the corpus into directory; returns (file paths, [(question, expected code)]).
+
+    duplicate_files TXT files are uploaded again as lightly edited revisions,
+    like re-uploaded handbooks, producing near-duplicate chunks.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    questions = []
+    code_number = 0
+
+    def next_code():
+        nonlocal code_number
+        code_number += 1
+        return f"POL-{code_number:05d}"
+
+    for file_number in range(txt_files):
+        fact_slots = set(rng.sample(range(paragraphs), min(questions_per_file, paragraphs)))
+        blocks = []
+        for index in range(paragraphs):
+            block = _paragraph(rng)
+            if index in fact_slots:
+                code = next_code()
+                sentence, question = _fact(rng, code)
+                block = f"{block} {sentence} {_paragraph(rng, 2)}"
+                questions.append((question, code))
+            blocks.append(block)
+        path = os.path.join(directory, f"handbook_{file_number:04d}.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("\n\n".join(blocks))
+        paths.append(path)
+
+    for file_number in range(min(duplicate_files, txt_files)):
+        with open(paths[file_number], "r", encoding="utf-8") as file:
+            text = file.read()
+        path = os.path.join(directory, f"handbook_{file_number:04d}_rev2.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text.replace("handbook", "employee handbook", 1) + "\n\nRevised edition.")
+        paths.append(path)
+
+    for file_number in range(pdf_files):
+        fact_pages = set(rng.sample(range(pdf_pages), min(questions_per_file, pdf_pages)))
+        pages = []
+        for page in range(pdf_pages):
+            lines = [rng.choice(FILLER) for _ in range(12)]
+            if page in fact_pages:
+                code = next_code()
+                sentence, question = _fact(rng, code)
+                lines.insert(rng.randint(0, len(lines)), sentence)
+                questions.append((question, code))
+            pages.append(lines)
+        path = os.path.join(directory, f"manual_{file_number:04d}.pdf")
+        with open(path, "wb") as file:
+            file.write(make_pdf(pages))
+        paths.append(path)
+
+    for file_number in range(csv_files):
+        path = os.path.join(directory, f"inventory_{file_number:04d}.csv")
+        skus = []
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["sku", "product", "price", "warehouse", "owner"])
+            for row in range(csv_rows):
+                sku = f"SKU-{file_number:02d}{row:06d}"
+                skus.append(sku)
+                writer.writerow([sku, f"Widget model {rng.randint(1, 999)}", f"{rng.uniform(1, 500):.2f}",
+                                 f"WH-{rng.randint(1, 20):02d}", rng.choice(DEPARTMENTS)])
+        for sku in rng.sample(skus, min(questions_per_file, len(skus))):
+            questions.append((f"What is the price and warehouse of {sku}?", sku))
+        paths.append(path)
+
+    return paths, questions
@@ -0,0 +1,253 @@
+"""Offline ingestion and retrieval benchmark.
+
+Generates a synthetic corpus, ingests it through DocumentProcessor and
+VectorStoreManager into a throwaway Chroma directory, then measures query
+latency, recall@k against the generated questions, prompt assembly through
+RAGSystem (with a stub in place of Groq) and peak RSS.
+
+    python -m benchmarks.run_benchmarks --txt-files 50 --output report.json
+    python -m benchmarks.run_benchmarks --baseline report.json --tolerance 0.15
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from benchmarks.corpus import generate_corpus
+from benchmarks.stubs import HashingEmbedder, StubGroqClient
+
+LOWER_IS_BETTER = ("_ms", "_mb", "prompt_chars")
+HIGHER_IS_BETTER = ("per_second", "recall")
+# Latency changes smaller than this are timer noise, whatever the ratio
+MIN_LATENCY_DELTA_MS = 1.0
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(seconds: list) -> dict:
+    return {
+        "p50_ms": round(percentile(seconds, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(seconds, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(seconds, 0.99) * 1000, 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def compare_chunkers(documents: list, repeats: int) -> dict:
+    """Throughput of the native TextChunker against LangChain's recursive splitter"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from utils.document_loader import TextChunker, chunk_limits
+
+    chunk_size, chunk_overlap = chunk_limits()
+    splitters = {
+        "native": TextChunker(chunk_size, chunk_overlap),
+        "langchain": RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len,
+            separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+        ),
+    }
+    megabytes = sum(len(doc.page_content) for doc in documents) * repeats / 1e6
+    report = {}
+    for name, splitter in splitters.items():
+        started = time.perf_counter()
+        for _ in range(repeats):
+            chunks = splitter.split_documents(documents)
+        seconds = time.perf_counter() - started
+        report[f"{name}_mb_per_second"] = round(megabytes / max(seconds, 1e-9), 2)
+        report[f"{name}_chunk_count"] = len(chunks)
+    return report
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="ckb-bench-")
+    Config.VECTOR_DB_PATH = os.path.join(workdir, "chroma_db")
+    Config.EMBEDDING_CACHE_PATH = os.path.join(workdir, "embedding_cache.sqlite3")
+    # Rebuilding a collection clears its sync manifest entries; keep every store off the real data/
+    Config.SYNC_MANIFEST_PATH = os.path.join(workdir, "sync_manifest.sqlite3")
+    Config.INGEST_QUEUE_PATH = os.path.join(workdir, "ingest_jobs.sqlite3")
+    Config.INGEST_SPOOL_DIR = os.path.join(workdir, "ingest_spool")
+    Config.AUDIT_DB_PATH = os.path.join(workdir, "audit.sqlite3")
+    Config.RERANK_ENABLED = args.rerank
+
+    from utils.cache import query_embedding_cache, rerank_score_cache, retrieval_cache
+    from utils.document_loader import DocumentProcessor, parse_file_bytes
+    from utils.rag import RAGSystem
+    from utils.vector_store import VectorStoreManager
+
+    try:
+        paths, questions = generate_corpus(
+            os.path.join(workdir, "corpus"), txt_files=args.txt_files, pdf_files=args.pdf_files,
+            csv_files=args.csv_files, paragraphs=args.paragraphs, pdf_pages=args.pdf_pages,
+            csv_rows=args.csv_rows, questions_per_file=args.questions_per_file, seed=args.seed,
+            duplicate_files=args.duplicate_files
+        )
+
+        processor = DocumentProcessor()
+        manager = VectorStoreManager()
+        if args.fake_embeddings:
+            manager.embedder = HashingEmbedder()
+
+        started = time.perf_counter()
+        documents = []
+        for path in paths:
+            with open(path, "rb") as file:
+                documents.extend(parse_file_bytes(os.path.basename(path), file.read()))
+        parse_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        chunks = processor.split_documents(documents)
+        split_seconds = time.perf_counter() - started
+        chunking = compare_chunkers(documents, args.chunk_repeats)
+
+        started = time.perf_counter()
+        manager.create_vector_store(documents, mode="rebuild")
+        index_seconds = time.perf_counter() - started
+
+        report = {
+            "corpus": {"files": len(paths), "documents": len(documents), "chunks": len(chunks),
+                       "questions": len(questions), "fake_embeddings": bool(args.fake_embeddings),
+                       "rerank": bool(args.rerank)},
+            "ingestion": {
+                "parse_ms": round(parse_seconds * 1000, 1),
+                "split_chunks_per_second": round(len(chunks) / max(split_seconds, 1e-9), 1),
+                "index_chunks_per_second": round(len(chunks) / max(index_seconds, 1e-9), 1),
+            },
+            "chunking": chunking,
+            "query": {},
+        }
+
+        for mode in args.modes:
+            latencies = []
+            hits = 0
+            for question, code in questions:
+                # Measure the uncached path
+                retrieval_cache.clear()
+                query_embedding_cache.clear()
+                rerank_score_cache.clear()
+                started = time.perf_counter()
+                results = manager.search_documents(question, k=args.k, mode=mode)
+                latencies.append(time.perf_counter() - started)
+                hits += any(code in doc.page_content for doc in results)
+            summary = latency_summary(latencies)
+            summary[f"recall_at_{args.k}"] = round(hits / max(len(questions), 1), 4)
+            report["query"][mode] = summary
+
+        stub = StubGroqClient()
+        rag_system = RAGSystem(client=stub)
+        latencies = []
+        retrieved_chars = []
+        for question, _ in questions[:args.generation_samples]:
+            context_docs = manager.search_documents(question, k=args.k)
+            retrieved_chars.append(sum(len(doc.page_content) for doc in context_docs))
+            started = time.perf_counter()
+            rag_system.generate_response(question, context_docs)
+            latencies.append(time.perf_counter() - started)
+        report["generation"] = latency_summary(latencies)
+        report["generation"]["mean_prompt_chars"] = round(
+            sum(stub.prompt_chars) / max(len(stub.prompt_chars), 1), 1
+        )
+        # Context before packing (dedup, merging, token budget), for comparison with the prompt
+        report["generation"]["mean_retrieved_chars"] = round(
+            sum(retrieved_chars) / max(len(retrieved_chars), 1), 1
+        )
+
+        report["peak_rss_mb"] = peak_rss_mb()
+        return report
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def flatten(report: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics that got worse than baseline by more than tolerance (a fraction)"""
+    found = []
+    current = flatten(report)
+    for name, old in flatten(baseline).items():
+        new = current.get(name)
+        if new is None or not old:
+            continue
+        if name.endswith(LOWER_IS_BETTER) and new > old * (1 + tolerance):
+            if name.endswith("_ms") and new - old < MIN_LATENCY_DELTA_MS:
+                continue
+            found.append(f"{name}: {old} -> {new}")
+        elif any(marker in name for marker in HIGHER_IS_BETTER) and new < old * (1 - tolerance):
+            found.append(f"{name}: {old} -> {new}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--txt-files", type=int, default=20)
+    parser.add_argument("--pdf-files", type=int, default=10)
+    parser.add_argument("--csv-files", type=int, default=2)
+    parser.add_argument("--paragraphs", type=int, default=30, help="paragraphs per TXT file")
+    parser.add_argument("--pdf-pages", type=int, default=10)
+    parser.add_argument("--csv-rows", type=int, default=2000)
+    parser.add_argument("--questions-per-file", type=int, default=3)
+    parser.add_argument("--duplicate-files", type=int, default=0,
+                        help="TXT files to upload again as near-duplicate revisions")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=["vector", "hybrid"])
+    parser.add_argument("--chunk-repeats", type=int, default=5,
+                        help="passes over the corpus when comparing chunkers")
+    parser.add_argument("--generation-samples", type=int, default=50)
+    parser.add_argument("--rerank", action="store_true",
+                        help="re-rank a wider candidate pool with the cross-encoder")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="use hashing embeddings instead of the sentence-transformers model")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary corpus and index")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        found = regressions(report, baseline, args.tolerance)
+        if found:
+            print("Regressions against baseline:", file=sys.stderr)
+            for line in found:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Offline stand-ins for Groq and the sentence-transformers model"""
+import hashlib
+import math
+import re
+from types import SimpleNamespace
+from typing import List
+
+
+class StubGroqClient:
+    """Answers instantly and records prompt sizes; mirrors client.chat.completions.create"""
+
+    def __init__(self, answer: str = "Stub answer."):
+        self.answer = answer
+        self.prompt_chars = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages: list, stream: bool = False, **kwargs):
+        self.prompt_chars.append(sum(len(message["content"]) for message in messages))
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.answer))])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.answer))])
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words hashing embeddings, for runs without the model download.
+
+    Latency numbers then exclude model inference; recall is only indicative.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+        self.model_name = f"hashing-{dimensions}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            bucket = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little")
+            vector[bucket % self.dimensions] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.embed_documents(list(input))
@@ -4,15 +4,128 @@ class Config:
     # Groq API - Use Streamlit secrets
     GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")  # Simple approach for Streamlit Cloud
     GROQ_MODEL = "llama-3.1-8b-instant"
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None  # point at a local stand-in server for tests
+    STREAM_RESPONSES = True
     
     # Vector Database
     VECTOR_DB_PATH = "chroma_db"
+    SHARED_COLLECTION = "company_docs"  # company-wide documents, visible to everyone
+    PARTITION_BY_DEPARTMENT = True  # uploads go to a per-department collection
+    # HNSW parameters, applied when a collection is created
+    HNSW_SPACE = "cosine"
+    HNSW_M = 16
+    HNSW_CONSTRUCTION_EF = 200
+    HNSW_SEARCH_EF = 64
+    HNSW_COLLECTION_PARAMS = {}  # per-collection overrides, e.g. {"dept_sales": {"hnsw:M": 32}}
+    VECTOR_INDEX = "hnsw"  # or "int8": quantized in-memory scan with exact re-ranking
+    QUANTIZED_RERANK_FACTOR = 4
+    
+    # Ingestion
+    CHUNK_SIZE = 1000
+    CHUNK_OVERLAP = 200
+    CHUNKER = "native"  # or "langchain" (RecursiveCharacterTextSplitter)
+    CHUNK_LENGTH_UNIT = "chars"  # or "tokens", sized by CHUNK_SIZE_TOKENS / CHUNK_OVERLAP_TOKENS
+    CHUNK_SIZE_TOKENS = 256
+    CHUNK_OVERLAP_TOKENS = 50
+    CHARS_PER_TOKEN = 4  # approximate, for English text and Llama-family tokenizers
+    INGEST_MODE = "append"  # "append", "upsert" or "rebuild"
+    INGEST_BATCH_SIZE = 256
+    PARSE_WORKERS = min(4, os.cpu_count() or 1)
+    PDF_PAGES_PER_DOCUMENT = 1
+    PDF_PAGE_WORKERS = min(4, os.cpu_count() or 1)
+    PDF_PARALLEL_MIN_PAGES = 500  # below this the pool overhead outweighs splitting the extraction
+    CSV_READ_CHUNKSIZE = 50000
+    
+    # Background ingestion
+    BACKGROUND_INGESTION = True
+    INGEST_RUN_IN_APP = True  # False when workers run via `python -m utils.ingest_queue`
+    INGEST_QUEUE_PATH = "data/ingest_jobs.sqlite3"
+    INGEST_SPOOL_DIR = "data/ingest_spool"
+    INGEST_WORKERS = 2
+    INGEST_POLL_SECONDS = 2
+    INGEST_STALE_SECONDS = 600
+    
+    # Embeddings
+    EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE = 64
+    EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+    EMBEDDING_DEVICE = "cpu"
+    EMBEDDING_CACHE_PATH = "data/embedding_cache.sqlite3"
+    
+    # Retrieval
+    RETRIEVAL_MODE = "hybrid"  # "hybrid" (BM25 + vector) or "vector"
+    HYBRID_CANDIDATE_POOL = 20
+    RRF_K = 60
+    # Rule-based rewrites (utils/query_expansion.py) searched in the same batch as the query
+    QUERY_EXPANSION = True
+    QUERY_EXPANSION_MAX = 3
+    QUERY_SYNONYMS = {}  # extra term -> [replacements], merged over the built-in table
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    
+    # Re-ranking: retrieve RERANK_CANDIDATES, keep the best k by cross-encoder score
+    RERANK_ENABLED = True
+    RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES = 50
+    RERANK_BATCH_SIZE = 16
+    RERANK_TIME_BUDGET = 0.5  # seconds; past it the retrieval order is used
+    
+    # Prompt context
+    CONTEXT_TOKEN_BUDGET = 3000
+    CONTEXT_NEIGHBORS = 0  # widen each retrieved chunk by this many neighbours either side before packing
+    CONTEXT_SIMHASH_DISTANCE = 3  # of 64 bits
+    
+    # Chunk store: memory-mapped chunk texts next to the Chroma data, for neighbour lookups
+    CHUNK_STORE_ENABLED = True
+    SNIPPET_NEIGHBORS = 1  # neighbours either side shown as context for retrieved chunks in the app
+    
+    # Caching
+    CACHE_TTL_SECONDS = 3600
+    QUERY_EMBEDDING_CACHE_SIZE = 2048
+    RETRIEVAL_CACHE_SIZE = 1024
+    ANSWER_CACHE_SIZE = 512
+    RERANK_CACHE_SIZE = 20000
+    # Answers reused for paraphrased questions (cosine similarity of query embeddings)
+    SEMANTIC_CACHE_ENABLED = True
+    SEMANTIC_CACHE_SIZE = 512
+    SEMANTIC_CACHE_THRESHOLD = 0.9
+    
+    # Query API (api.py)
+    API_HOST = "0.0.0.0"
+    API_PORT = 8080
+    API_MAX_CONCURRENT_LLM = 8
+    API_MAX_QUEUED = 64
+    API_REQUEST_TIMEOUT = 30
+    API_WORKER_THREADS = 16
+    API_MAX_K = 20
+    API_MAX_BATCH_QUERIES = 16  # per /search request
+    
+    # Audit log
+    AUDIT_DB_PATH = "data/audit.sqlite3"
+    AUDIT_BATCH_SIZE = 500
+    AUDIT_FLUSH_SECONDS = 1.0
+    AUDIT_QUEUE_SIZE = 10000
+    AUDIT_PAGE_SIZE = 20
+    
+    # Metrics
+    METRICS_ENABLED = True
+    METRICS_FILE = "data/metrics.prom"  # Prometheus textfile export from the Streamlit process; "" to disable
+    METRICS_FILE_INTERVAL = 15
     
     # App Settings
     UPLOAD_FOLDER = "data/uploads"
+    # Folder sync (python -m utils.folder_sync)
+    SYNC_ROOTS = [UPLOAD_FOLDER]  # add mounted share drives here
+    SYNC_MANIFEST_PATH = "data/sync_manifest.sqlite3"
+    SYNC_BATCH_FILES = 200  # files per index write
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'csv'}
     
     # Security
-    SESSION_TIMEOUT = 1800
+    SESSION_TIMEOUT = 1800  # seconds; also the lifetime of signed session tokens
+    SESSION_SECRET = os.getenv("SESSION_SECRET", "")  # token signing key; generated and stored in USER_DB_PATH if unset
+    USER_DB_PATH = "data/users.sqlite3"
+    SEED_DEMO_USERS = os.getenv("SEED_DEMO_USERS", "1") == "1"  # only when USER_DB_PATH is first created
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # existing hashes are upgraded on their next login
+    AUTH_MAX_CONCURRENT_HASHES = max(1, (os.cpu_count() or 2) // 2)
 
 config = Config()
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""Local stand-in for the Groq chat completions API.
+
+Serves POST /openai/v1/chat/completions in the OpenAI-compatible shape the Groq
+client expects, with and without stream=True. Point the app at it with:
+
+    python scripts/fake_llm_server.py --port 8008
+    GROQ_BASE_URL=http://127.0.0.1:8008 GROQ_API_KEY=test streamlit run app.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+def make_handler(answer: str, token_delay: float, first_token_delay: float):
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            if self.path != COMPLETIONS_PATH:
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            model = request.get("model", "fake-model")
+            created = int(time.time())
+            time.sleep(first_token_delay)
+            if request.get("stream"):
+                self._stream(model, created)
+            else:
+                self._complete(model, created)
+
+        def _complete(self, model: str, created: int):
+            time.sleep(token_delay * len(answer.split()))
+            body = json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(answer.split()), "total_tokens": 0}
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, model: str, created: int):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = answer.split(" ")
+            for i, word in enumerate(words):
+                token = word if i == 0 else " " + word
+                self._event({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                })
+                time.sleep(token_delay)
+            self._event({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            })
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _event(self, payload: dict):
+            self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+    return FakeLLMHandler
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0,
+                 answer: str = "This is a canned answer from the fake LLM server.",
+                 token_delay: float = 0.0, first_token_delay: float = 0.0) -> ThreadingHTTPServer:
+    """Start the server on a daemon thread; port 0 picks a free port (see server.server_address)"""
+    server = ThreadingHTTPServer((host, port), make_handler(answer, token_delay, first_token_delay))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--answer", default="This is a canned answer from the fake LLM server.")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="seconds before the first token")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(args.answer, args.token_delay, args.first_token_delay))
+    print(f"Fake LLM listening on http://{args.host}:{args.port}{COMPLETIONS_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Manage accounts in the persistent user store (Config.USER_DB_PATH).
+
+    python scripts/manage_users.py list
+    python scripts/manage_users.py add alice --role user --department Finance
+    python scripts/manage_users.py passwd alice
+    python scripts/manage_users.py delete alice
+
+Passwords are prompted for, hashed with Config.BCRYPT_ROUNDS and stored; the
+app and API read the same database. Session tokens already issued stay valid
+until they expire (Config.SESSION_TIMEOUT).
+"""
+import argparse
+import getpass
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.auth import ROLE_PERMISSIONS
+from utils.user_store import UserStore
+
+
+def prompt_password() -> str:
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Repeat password: "):
+        sys.exit("Passwords do not match")
+    if not password:
+        sys.exit("Password must not be empty")
+    return password
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="user database (default Config.USER_DB_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    add = commands.add_parser("add")
+    add.add_argument("username")
+    add.add_argument("--role", choices=sorted(ROLE_PERMISSIONS), default="user")
+    add.add_argument("--department")
+    commands.add_parser("passwd").add_argument("username")
+    commands.add_parser("delete").add_argument("username")
+    args = parser.parse_args()
+
+    store = UserStore(args.db)
+    if args.command == "list":
+        for user in store.list_users():
+            print(f"{user['username']:<20} {user['role']:<8} {user['department'] or '-'}")
+    elif args.command == "add":
+        try:
+            store.add_user(args.username, prompt_password(), args.role, args.department)
+        except sqlite3.IntegrityError:
+            sys.exit(f"User {args.username} already exists")
+        print(f"Added {args.username}")
+    elif args.command == "passwd":
+        if store.get(args.username) is None:
+            sys.exit(f"No such user: {args.username}")
+        store.set_password(args.username, prompt_password())
+        print(f"Password changed for {args.username}")
+    elif args.command == "delete":
+        if not store.delete_user(args.username):
+            sys.exit(f"No such user: {args.username}")
+        print(f"Deleted {args.username}")
+
+
+if __name__ == "__main__":
+    main()
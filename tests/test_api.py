@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+try:
+    from langchain.schema import Document
+except ImportError:
+    from langchain_core.documents import Document
+
+import api
+from config import Config
+from utils.auth import Authentication
+
+USER = {"username": "employee", "role": "user", "department": "HR"}
+
+
+class FakeVectorManager:
+    def visible_partitions(self, department, all_departments=False):
+        return ["tests"]
+
+    def collections_version(self, collections):
+        return "v1"
+
+    def search_documents(self, query, k=4, collection_names=None):
+        return [Document(page_content="Employees get twenty days of leave.", metadata={"source": "leave.txt"})]
+
+
+class FakeRAG:
+    """Generation that takes `seconds` and records how many ran at once"""
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self.finished = 0
+        self._lock = threading.Lock()
+
+    def cached_answer(self, query, cache_version, k, user=None):
+        return None
+
+    def generate_response(self, query, docs, cache_version=None, user=None, k=None):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+            self.finished += 1
+        return f"answer to {query}", ["leave.txt"]
+
+
+@pytest.fixture
+def headers(monkeypatch):
+    monkeypatch.setattr(Config, "SESSION_SECRET", "test-secret")
+    monkeypatch.setattr(api, "get_vector_manager", FakeVectorManager)
+    return {"Authorization": f"Bearer {Authentication.issue_token(USER)}"}
+
+
+def use_rag(monkeypatch, seconds: float) -> FakeRAG:
+    rag = FakeRAG(seconds)
+    monkeypatch.setattr(api, "get_rag_system", lambda: rag)
+    return rag
+
+
+def serve(service: api.QueryService, scenario):
+    async def run():
+        async with TestClient(TestServer(api.create_app(service))) as client:
+            return await scenario(client)
+    return asyncio.run(run())
+
+
+def test_query_answers(monkeypatch, headers):
+    use_rag(monkeypatch, 0)
+
+    async def scenario(client):
+        response = await client.post("/query", json={"query": "leave?"}, headers=headers)
+        return response.status, await response.json()
+    status, body = serve(api.QueryService(request_timeout=5), scenario)
+    assert status == 200
+    assert body["answer"] == "answer to leave?"
+    assert body["chunks"][0]["source"] == "leave.txt"
+
+
+def test_timed_out_generation_keeps_its_slot(monkeypatch, headers):
+    rag = use_rag(monkeypatch, 0.4)
+    service = api.QueryService(max_concurrent_llm=1, max_queued=10, request_timeout=0.1)
+
+    async def scenario(client):
+        responses = await asyncio.gather(*[
+            client.post("/query", json={"query": f"q{i}"}, headers=headers) for i in range(4)
+        ])
+        # The first generation is still running after its request gave up
+        held = service.llm_slots.locked()
+        while rag.finished < 1 or service.llm_slots.locked():
+            await asyncio.sleep(0.05)
+        return [response.status for response in responses], held
+    statuses, held = serve(service, scenario)
+    assert statuses == [504] * 4
+    assert held
+    assert rag.peak == 1
+    assert rag.finished == 1
+
+
+def test_generations_never_exceed_the_limit(monkeypatch, headers):
+    rag = use_rag(monkeypatch, 0.1)
+    service = api.QueryService(max_concurrent_llm=2, max_queued=10, request_timeout=5)
+
+    async def scenario(client):
+        responses = await asyncio.gather(*[
+            client.post("/query", json={"query": f"q{i}"}, headers=headers) for i in range(6)
+        ])
+        return [response.status for response in responses]
+    assert serve(service, scenario) == [200] * 6
+    assert rag.peak == 2
+
+
+def test_full_queue_gets_503(monkeypatch, headers):
+    rag = use_rag(monkeypatch, 0.3)
+    service = api.QueryService(max_concurrent_llm=1, max_queued=0, request_timeout=5)
+
+    async def scenario(client):
+        first = asyncio.ensure_future(client.post("/query", json={"query": "first"}, headers=headers))
+        while not service.llm_slots.locked():
+            await asyncio.sleep(0.01)
+        second = await client.post("/query", json={"query": "second"}, headers=headers)
+        return (await first).status, second.status, second.headers.get("Retry-After")
+    assert serve(service, scenario) == (200, 503, "1")
+    assert rag.finished == 1
+
+
+@pytest.mark.parametrize("path", ["/query", "/search"])
+@pytest.mark.parametrize("body", ["[1, 2]", '"leave?"', "5", "null"])
+def test_non_object_body_is_rejected(monkeypatch, headers, path, body):
+    use_rag(monkeypatch, 0)
+
+    async def scenario(client):
+        response = await client.post(path, data=body, headers=headers)
+        return response.status, await response.text()
+    assert serve(api.QueryService(), scenario) == (400, "Body must be a JSON object")
+
+
+def test_missing_credentials_are_rejected(monkeypatch, headers):
+    use_rag(monkeypatch, 0)
+
+    async def scenario(client):
+        response = await client.post("/query", json={"query": "leave?"})
+        return response.status
+    assert serve(api.QueryService(), scenario) == 401
@@ -0,0 +1,57 @@
+from utils.bm25 import BM25Index, tokenize
+
+
+def test_tokenize_keeps_codes_and_their_parts():
+    assert tokenize("See HR-POL-7 now") == ["see", "hr-pol-7", "hr", "pol", "7", "now"]
+
+
+def test_log_round_trips_adds_and_removes(tmp_path):
+    path = str(tmp_path / "docs.bm25")
+    index = BM25Index(path)
+    index.add(["a", "b", "c"], ["paid leave policy", "expense report form", "leave carry over"])
+    index.remove(["b"])
+    index.add(["d"], ["parental leave"])
+
+    loaded = BM25Index.load(path)
+    assert set(loaded.doc_lengths) == {"a", "c", "d"}
+    assert loaded.total_length == index.total_length
+    assert loaded.search("leave", 5) == index.search("leave", 5)
+    assert loaded.search("expense", 5) == []
+
+
+def test_refresh_applies_other_writers_appends(tmp_path):
+    path = str(tmp_path / "docs.bm25")
+    writer = BM25Index(path)
+    writer.add(["a"], ["paid leave policy"])
+    reader = BM25Index.load(path)
+    writer.add(["b"], ["expense report form"])
+    writer.remove(["a"])
+
+    assert reader.refresh()
+    assert set(reader.doc_lengths) == {"b"}
+    assert "leave" not in reader.postings
+
+
+def test_clear_and_compaction_force_a_reload(tmp_path):
+    path = str(tmp_path / "docs.bm25")
+    writer = BM25Index(path)
+    writer.add(["a", "b"], ["paid leave policy", "expense report form"])
+    reader = BM25Index.load(path)
+
+    writer.compact()
+    assert not reader.refresh()
+    assert set(BM25Index.load(path).doc_lengths) == {"a", "b"}
+
+    writer.clear()
+    assert len(BM25Index.load(path)) == 0
+    # A writer whose log was replaced reloads before appending to it
+    reader.add(["c"], ["travel policy"])
+    assert set(BM25Index.load(path).doc_lengths) == {"c"}
+
+
+def test_duplicate_ids_are_indexed_once(tmp_path):
+    index = BM25Index(str(tmp_path / "docs.bm25"))
+    index.add(["a", "a"], ["paid leave", "paid leave"])
+    index.add(["a"], ["paid leave"])
+    assert index.postings["leave"] == {"a": 1}
+    assert index.total_length == 2
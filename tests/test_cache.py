@@ -0,0 +1,54 @@
+import numpy as np
+
+from utils.cache import SemanticCache, TTLCache, normalize_query
+
+
+def unit(*values) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_paraphrase_hits_only_within_its_scope():
+    cache = SemanticCache(4, threshold=0.9, ttl=60)
+    cache.set(unit(1, 0, 0), ("v1", 4), "answer")
+    assert cache.get(unit(1, 0.1, 0), ("v1", 4)) == "answer"
+    assert cache.get(unit(1, 0.1, 0), ("v1", 2)) is None
+    assert cache.get(unit(1, 0.1, 0), ("v2", 4)) is None
+    assert cache.get(unit(0, 1, 0), ("v1", 4)) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_paraphrase_replaces_its_entry_and_lru_is_evicted():
+    cache = SemanticCache(2, threshold=0.9, ttl=60)
+    cache.set(unit(1, 0, 0), "v1", "first")
+    cache.set(unit(1, 0.05, 0), "v1", "rephrased")
+    assert len(cache) == 1
+    assert cache.get(unit(1, 0, 0), "v1") == "rephrased"
+
+    cache.set(unit(0, 1, 0), "v1", "second")
+    cache.get(unit(1, 0, 0), "v1")
+    cache.set(unit(0, 0, 1), "v1", "third")
+    assert len(cache) == 2
+    assert cache.get(unit(0, 1, 0), "v1") is None
+    assert cache.get(unit(1, 0, 0), "v1") == "rephrased"
+
+
+def test_expired_entries_miss():
+    cache = SemanticCache(2, threshold=0.9, ttl=-1)
+    cache.set(unit(1, 0), "v1", "answer")
+    assert cache.get(unit(1, 0), "v1") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_normalize_query():
+    assert normalize_query("  How much   LEAVE? ") == "how much leave"
@@ -0,0 +1,72 @@
+try:
+    from langchain.schema import Document
+except ImportError:
+    from langchain_core.documents import Document
+
+from utils.chunk_store import ChunkStore, stitch
+
+
+def chunk(source: str, page: int, start: int, text: str) -> Document:
+    return Document(page_content=text, metadata={"source": source, "page": page, "start_index": start,
+                                                 "end_index": start + len(text)})
+
+
+def make_store(prefix: str):
+    docs = {f"{i:032x}": chunk("a.pdf", 1, i * 10, f"chunk {i} of a") for i in range(5)}
+    docs["f" * 32] = chunk("b.pdf", 1, 0, "only chunk of b")
+    store = ChunkStore(prefix)
+    # Out of source order, as batches arrive
+    ids = sorted(docs, reverse=True)
+    store.add(ids, [docs[chunk_id] for chunk_id in ids])
+    return store, docs
+
+
+def test_get_and_neighbors_in_source_order(tmp_path):
+    store, docs = make_store(str(tmp_path / "docs.chunks"))
+    found = store.get([f"{2:032x}", "missing"])
+    assert list(found) == [f"{2:032x}"]
+    assert found[f"{2:032x}"].page_content == "chunk 2 of a"
+    assert found[f"{2:032x}"].metadata["chunk_id"] == f"{2:032x}"
+
+    around = store.neighbors(f"{0:032x}", window=2)
+    assert [doc.page_content for doc in around] == ["chunk 0 of a", "chunk 1 of a", "chunk 2 of a"]
+    # Neighbours never cross into another source
+    assert [doc.page_content for doc in store.neighbors("f" * 32)] == ["only chunk of b"]
+
+
+def test_add_remove_compact_and_reload_round_trip(tmp_path):
+    prefix = str(tmp_path / "docs.chunks")
+    store, docs = make_store(prefix)
+    store.add([f"{1:032x}"], [docs[f"{1:032x}"]])
+    assert len(store) == 6
+
+    store.remove([f"{1:032x}", f"{3:032x}"])
+    assert [doc.page_content for doc in store.neighbors(f"{2:032x}")] == \
+        ["chunk 0 of a", "chunk 2 of a", "chunk 4 of a"]
+    # Past half the records dead the files are rewritten without them
+    store.remove([f"{0:032x}", f"{4:032x}"])
+    assert store._dead == 0
+
+    loaded = ChunkStore.load(prefix)
+    assert len(loaded) == 2
+    assert set(loaded.get(list(docs))) == {f"{2:032x}", "f" * 32}
+    assert loaded.get([f"{2:032x}"])[f"{2:032x}"].page_content == "chunk 2 of a"
+
+
+def test_clear_and_interrupted_compaction(tmp_path):
+    prefix = str(tmp_path / "docs.chunks")
+    store, docs = make_store(prefix)
+    open(f"{prefix}.compacting", "w").close()
+    # A store left half-compacted is dropped and backfilled from the collection
+    assert len(ChunkStore.load(prefix)) == 0
+
+    store, docs = make_store(prefix)
+    store.clear()
+    assert len(ChunkStore.load(prefix)) == 0
+    assert store.get(list(docs)) == {}
+
+
+def test_stitch_drops_splitter_overlap():
+    first = chunk("a.txt", 0, 0, "The leave policy covers")
+    second = chunk("a.txt", 0, 10, "policy covers paid leave.")
+    assert stitch([first, second]) == "The leave policy covers paid leave."
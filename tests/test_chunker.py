@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+try:
+    from langchain.schema import Document
+except ImportError:
+    from langchain_core.documents import Document
+
+from utils.document_loader import TextChunker
+
+PIECES = ["a", "bb", "policy", "zeta!", "eps", "x.", "why?", "\n\n", " \n\n ", "\n", " ", "  ",
+          "unbrokenwordlongerthanachunk"]
+
+
+def random_texts(count: int, seed: int = 7):
+    generator = random.Random(seed)
+    for _ in range(count):
+        text = "".join(generator.choice(PIECES) + generator.choice(["", " "])
+                       for _ in range(generator.randint(0, 80)))
+        chunk_size = generator.randint(4, 60)
+        yield text, chunk_size, generator.randint(0, chunk_size - 1)
+
+
+def test_whitespace_run_does_not_yield_nested_span():
+    # The span after "zeta!" trimmed back to (4, 5), inside the previous (2, 5)
+    text = "zeta! \n\n eps ilon"
+    spans = list(TextChunker(chunk_size=4, chunk_overlap=2).iter_spans(text))
+    assert (4, 5) not in spans
+    for (_, previous_stop), (_, stop) in zip(spans, spans[1:]):
+        assert stop > previous_stop
+
+
+@pytest.mark.parametrize("text, chunk_size, chunk_overlap", list(random_texts(300)))
+def test_span_invariants(text, chunk_size, chunk_overlap):
+    spans = list(TextChunker(chunk_size, chunk_overlap).iter_spans(text))
+    covered = set()
+    for start, stop in spans:
+        assert 0 <= start < stop <= len(text)
+        assert stop - start <= chunk_size
+        assert not text[start].isspace() and not text[stop - 1].isspace()
+        covered.update(range(start, stop))
+    for (start, stop), (next_start, next_stop) in zip(spans, spans[1:]):
+        assert next_start > start and next_stop > stop
+        assert stop - next_start <= chunk_overlap
+    assert all(index in covered for index, char in enumerate(text) if not char.isspace())
+
+
+def test_chunk_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        TextChunker(chunk_size=10, chunk_overlap=10)
+
+
+def test_split_documents_records_offsets():
+    text = "First paragraph about leave.\n\nSecond paragraph about travel expenses and receipts."
+    chunks = TextChunker(chunk_size=40, chunk_overlap=10).split_documents(
+        [Document(page_content=text, metadata={"source": "policy.txt"})]
+    )
+    assert len(chunks) > 1
+    for chunk in chunks:
+        metadata = chunk.metadata
+        assert metadata["source"] == "policy.txt"
+        assert text[metadata["start_index"]:metadata["end_index"]] == chunk.page_content
+        assert metadata["tokens"] > 0
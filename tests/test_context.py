@@ -0,0 +1,46 @@
+try:
+    from langchain.schema import Document
+except ImportError:
+    from langchain_core.documents import Document
+
+from config import Config
+from utils.context import dedupe, estimate_tokens, merge_overlapping, pack_context
+
+POLICY = ("Employees receive twenty days of paid leave each calendar year, accrued monthly from their start date. "
+          "Unused leave carries over for one year and then expires unless a manager approves an extension.")
+
+
+def doc(text: str, source: str = "leave.txt", **metadata) -> Document:
+    return Document(page_content=text, metadata={"source": source, **metadata})
+
+
+def test_dedupe_drops_near_duplicates_keeping_the_better_ranked():
+    first = doc(POLICY, page=1)
+    reupload = doc(POLICY.replace("twenty", "Twenty"), source="leave (1).txt", page=3)
+    other = doc("Expense reports are due within thirty days of purchase, with itemised receipts attached.")
+    assert dedupe([first, reupload, other]) == [first, other]
+
+
+def test_overlapping_chunks_of_a_source_merge_in_either_order(monkeypatch):
+    monkeypatch.setattr(Config, "CHUNK_LENGTH_UNIT", "chars")
+    monkeypatch.setattr(Config, "CHUNK_OVERLAP", 60)
+    head, tail = doc(POLICY[:120], page=1), doc(POLICY[80:], page=2)
+    for ranked in ([head, tail], [tail, head]):
+        merged = merge_overlapping(ranked)
+        assert len(merged) == 1
+        assert merged[0].page_content == POLICY
+        assert (merged[0].metadata["page"], merged[0].metadata["page_end"]) == (1, 2)
+    # The same text in another source is not merged
+    assert len(merge_overlapping([head, doc(POLICY[80:], source="other.txt")])) == 2
+
+
+def test_pack_context_skips_spans_over_budget_and_truncates_the_first():
+    big = doc("x " * 400, source="big.txt")
+    small = doc("Expense reports are due within thirty days.", source="expenses.txt")
+    budget = estimate_tokens(small.page_content) + 10
+    assert pack_context([big, small], token_budget=1000) == [big, small]
+    assert pack_context([small, big], token_budget=budget) == [small]
+
+    packed = pack_context([big, small], token_budget=budget)
+    assert len(packed[0].page_content) == budget * Config.CHARS_PER_TOKEN
+    assert sum(estimate_tokens(d.page_content) for d in packed) <= budget
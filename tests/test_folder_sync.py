@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+from config import Config
+from utils.folder_sync import FolderSync, SyncManifest
+
+LEAVE = "Leave policy. Employees get twenty days of paid leave every year."
+EXPENSES = "Expense policy. Reports are due within thirty days of purchase."
+
+
+class FakeVectorManager:
+    """Chunk ids per collection; every write bumps the collection version, as Chroma's does"""
+    def __init__(self):
+        self.ids = set()
+        self.version = 0
+        self.writes = []
+
+    def collection_version(self, collection_name):
+        return str(self.version)
+
+    def replace_chunks(self, split_docs, delete_ids, collection_name="company_docs", batch_size=None):
+        from utils.vector_store import VectorStoreManager
+        ids = {VectorStoreManager.chunk_id(doc) for doc in split_docs}
+        added = ids - self.ids
+        deleted = self.ids & set(delete_ids)
+        self.ids = (self.ids | added) - deleted
+        self.version += 1
+        self.writes.append((sorted(added), sorted(deleted)))
+        return {"added": len(added), "deleted": len(deleted)}
+
+    def delete_chunks(self, ids, collection_name="company_docs"):
+        deleted = self.ids & set(ids)
+        self.ids -= deleted
+        self.version += 1
+        return len(deleted)
+
+    def ingest_documents(self, documents, collection_name="company_docs", progress_callback=None):
+        self.version += 1
+        return {"ids": [], "chunks": 1, "added": 1, "skipped": 0}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "share"
+    (root / "hr").mkdir(parents=True)
+    (root / "hr" / "leave.txt").write_text(LEAVE)
+    (root / "expenses.txt").write_text(EXPENSES)
+    (root / "notes.docx").write_text("unsupported")
+    return root
+
+
+@pytest.fixture
+def sync(folder, tmp_path):
+    vector_manager = FakeVectorManager()
+    return FolderSync([str(folder)], "tests", SyncManifest(str(tmp_path / "manifest.sqlite3")),
+                      vector_manager=vector_manager, workers=1)
+
+
+def test_first_run_ingests_and_rerun_does_nothing(sync):
+    stats = sync.run()
+    assert (stats["scanned"], stats["new"], stats["stale"]) == (2, 2, False)
+    assert stats["chunks_added"] == len(sync.vector_manager.ids) > 0
+    assert sync.manifest.entries("tests").keys() == {os.path.join(sync.roots[0], "hr", "leave.txt"),
+                                                     os.path.join(sync.roots[0], "expenses.txt")}
+
+    plan = sync.plan()
+    assert (plan["candidates"], plan["deleted"], plan["unchanged"]) == ([], [], 2)
+    writes = len(sync.vector_manager.writes)
+    assert sync.run()["unchanged"] == 2
+    assert len(sync.vector_manager.writes) == writes
+
+
+def test_unrelated_ingest_does_not_mark_the_sync_stale(sync):
+    sync.run()
+    # An upload into the same collection through the app or the API
+    sync.vector_manager.ingest_documents([], "tests")
+    plan = sync.plan()
+    assert not plan["stale"]
+    assert plan["candidates"] == []
+
+
+def test_chunker_change_reparses_everything_once(sync, monkeypatch):
+    sync.run()
+    monkeypatch.setattr(Config, "CHUNK_SIZE", Config.CHUNK_SIZE // 2)
+    plan = sync.plan()
+    assert plan["stale"]
+    assert len(plan["candidates"]) == 2
+
+    stats = sync.run()
+    assert stats["changed"] == 2
+    assert not sync.plan()["stale"]
+
+
+def test_changed_touched_and_deleted_files(sync, folder):
+    sync.run()
+    old_ids = set(sync.vector_manager.ids)
+    leave = folder / "hr" / "leave.txt"
+    leave.write_text(LEAVE.replace("twenty", "twenty-five"))
+    expenses = folder / "expenses.txt"
+    stat = expenses.stat()
+    os.utime(expenses, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    stats = sync.run()
+    assert (stats["changed"], stats["touched"], stats["unchanged"]) == (1, 1, 0)
+    assert stats["chunks_added"] == stats["chunks_deleted"] == 1
+    assert sync.vector_manager.ids != old_ids
+
+    leave.unlink()
+    stats = sync.run()
+    assert (stats["deleted"], stats["chunks_deleted"]) == (1, 1)
+    assert len(sync.vector_manager.ids) == 1
+    assert sync.plan()["candidates"] == []
+
+
+def test_missing_root_is_not_treated_as_deleted(sync, folder):
+    sync.run()
+    folder.rename(folder.with_name("unmounted"))
+    plan = sync.plan()
+    assert plan["deleted"] == []
+    assert plan["scanned"] == 0
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from config import Config
+from utils import resources
+from utils.ingest_queue import IngestQueue, IngestWorkerPool
+
+GOOD = b"Leave policy. Employees get twenty days of paid leave every year."
+
+
+class FakeVectorManager:
+    """Consumes the streamed documents as three chunks each, one of them not yet indexed"""
+    def __init__(self):
+        self.collections = []
+
+    def ingest_documents(self, documents, collection_name, progress_callback=None):
+        documents = len(list(documents))
+        self.collections.append(collection_name)
+        return {"ids": [], "chunks": 3 * documents, "added": documents, "skipped": 2 * documents}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return IngestQueue(str(tmp_path / "queue.sqlite3"), str(tmp_path / "spool"))
+
+
+@pytest.fixture
+def vector_manager(monkeypatch):
+    fake = FakeVectorManager()
+    monkeypatch.setattr(resources, "get_vector_manager", lambda: fake)
+    return fake
+
+
+def run_job(queue: IngestQueue, files) -> dict:
+    job_id = queue.enqueue(files, collection_name="tests")
+    job = queue.claim_next()
+    IngestWorkerPool(queue, workers=1).process(job)
+    queue.finish(job_id)
+    return queue.get_job(job_id)
+
+
+def test_failed_files_are_recorded_and_job_is_partial(queue, vector_manager):
+    job = run_job(queue, [("bad.pdf", b"not a pdf"), ("latin.txt", "caf\xe9".encode("latin-1")),
+                          ("good.txt", GOOD), ("more.csv", b"a,b\n1,2\n3,4\n")])
+    assert job["status"] == "partial"
+    assert job["files_parsed"] == 4
+    assert job["files_failed"] == 2
+    assert job["error"] is None
+    failed = dict(queue.failed_files(job["id"]))
+    assert set(failed) == {"bad.pdf", "latin.txt"}
+    assert failed["latin.txt"].startswith("UnicodeDecodeError")
+    assert vector_manager.collections == ["tests", "tests"]
+
+
+def test_pooled_parsing_records_failures_per_file(queue, vector_manager, monkeypatch):
+    monkeypatch.setattr(Config, "PARSE_WORKERS", 2)
+    job = run_job(queue, [("bad.pdf", b"not a pdf"), ("good.txt", GOOD), ("more.txt", GOOD)])
+    assert job["status"] == "partial"
+    assert [name for name, _ in queue.failed_files(job["id"])] == ["bad.pdf"]
+    assert job["chunks_total"] == 6
+
+
+def test_only_added_chunks_count_as_embedded(queue, vector_manager):
+    job = run_job(queue, [("one.txt", GOOD), ("two.txt", GOOD)])
+    assert job["status"] == "done"
+    assert job["chunks_total"] == 6
+    assert job["chunks_embedded"] == 2
+
+
+def test_job_fails_when_no_file_could_be_processed(queue, vector_manager):
+    job = run_job(queue, [("bad.pdf", b"x"), ("notes.docx", b"x")])
+    assert job["status"] == "failed"
+    assert job["error"] == "No file could be processed"
+    assert job["files_failed"] == 2
+    assert vector_manager.collections == []
+
+
+def test_worker_thread_marks_job_failed_on_error(queue, monkeypatch):
+    def unavailable():
+        raise RuntimeError("vector store unavailable")
+    monkeypatch.setattr(resources, "get_vector_manager", unavailable)
+    job_id = queue.enqueue([("good.txt", GOOD)], collection_name="tests")
+    pool = IngestWorkerPool(queue, workers=1, poll_interval=0.05)
+    pool.start()
+    try:
+        deadline = time.time() + 5
+        while queue.get_job(job_id)["status"] in ("queued", "running") and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+    job = queue.get_job(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "vector store unavailable"
+
+
+def test_stale_job_is_requeued_without_its_failures(queue, vector_manager):
+    job_id = queue.enqueue([("bad.pdf", b"x"), ("good.txt", GOOD)], collection_name="tests")
+    job = queue.claim_next()
+    IngestWorkerPool(queue, workers=1).process(job)
+    assert queue.requeue_stale(stale_seconds=-1) == 1
+    job = queue.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["files_failed"] == 0
+    assert queue.failed_files(job_id) == []
@@ -0,0 +1,55 @@
+import numpy as np
+
+from utils.quantized_index import QuantizedIndex
+
+
+def unit_vectors(count: int, dimensions: int = 16, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_search_matches_exact_cosine_ranking(tmp_path):
+    vectors = unit_vectors(200)
+    index = QuantizedIndex(str(tmp_path / "docs.int8"))
+    index.add([f"id{i}" for i in range(200)], vectors)
+
+    query = vectors[7]
+    exact = np.argsort(-(vectors @ query))[:5]
+    found = index.search(query, 5)
+    assert [chunk_id for _, chunk_id in found] == [f"id{i}" for i in exact]
+    assert abs(found[0][0]) < 1e-5
+
+
+def test_append_remove_and_reload_round_trip(tmp_path):
+    prefix = str(tmp_path / "docs.int8")
+    vectors = unit_vectors(30)
+    index = QuantizedIndex(prefix)
+    index.add([f"id{i}" for i in range(20)], vectors[:20])
+    # Already indexed ids are skipped
+    index.add([f"id{i}" for i in range(10, 30)], vectors[10:30])
+    assert len(index) == 30
+
+    index.remove([f"id{i}" for i in range(0, 30, 2)])
+    loaded = QuantizedIndex.load(prefix)
+    assert loaded.ids == [f"id{i}" for i in range(1, 30, 2)]
+    assert loaded.search(vectors[3], 1)[0][1] == "id3"
+    assert "id4" not in [chunk_id for _, chunk_id in loaded.search(vectors[4], 15)]
+
+
+def test_interrupted_append_keeps_complete_rows(tmp_path):
+    prefix = str(tmp_path / "docs.int8")
+    vectors = unit_vectors(5)
+    QuantizedIndex(prefix).add([f"id{i}" for i in range(5)], vectors)
+    # Crashed after writing the vector of a sixth row but before its id
+    with open(f"{prefix}.vectors", "ab") as file:
+        unit_vectors(1, seed=1).tofile(file)
+    assert QuantizedIndex.load(prefix).ids == [f"id{i}" for i in range(5)]
+
+
+def test_clear_removes_files(tmp_path):
+    prefix = str(tmp_path / "docs.int8")
+    index = QuantizedIndex(prefix)
+    index.add(["a"], unit_vectors(1))
+    index.clear()
+    assert len(QuantizedIndex.load(prefix)) == 0
+    assert index.search(unit_vectors(1)[0], 3) == []
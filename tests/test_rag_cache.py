@@ -0,0 +1,44 @@
+import uuid
+
+import numpy as np
+import pytest
+
+try:
+    from langchain.schema import Document
+except ImportError:
+    from langchain_core.documents import Document
+
+from benchmarks.stubs import StubGroqClient
+from config import Config
+from utils.rag import RAGSystem
+
+DOCS = [Document(page_content="Employees get twenty days of paid leave.", metadata={"source": "leave.txt"}),
+        Document(page_content="Unused leave carries over for one year.", metadata={"source": "leave.txt"})]
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    monkeypatch.setattr(Config, "CONTEXT_NEIGHBORS", 0)
+    monkeypatch.setattr(Config, "SEMANTIC_CACHE_ENABLED", True)
+    vector = np.zeros(8, dtype=np.float32)
+    vector[0] = 1.0
+    monkeypatch.setattr(RAGSystem, "_query_vector", staticmethod(lambda query: vector))
+    return RAGSystem(client=StubGroqClient("Twenty days."))
+
+
+def test_answer_is_cached_under_the_requested_k(rag):
+    version = uuid.uuid4().hex
+    # Retrieval found fewer chunks than were asked for
+    rag.generate_response("How much leave?", DOCS, cache_version=version, k=4)
+    assert rag.cached_answer("How much leave do I get?", version, 4)[0] == "Twenty days."
+    assert rag.cached_answer("How much leave do I get?", version, 2) is None
+
+
+def test_streamed_answer_is_cached_under_the_requested_k(rag):
+    version = uuid.uuid4().hex
+    assert "".join(rag.stream_response("How much leave?", DOCS, cache_version=version, k=6)) == "Twenty days."
+    assert rag.cached_answer("How much leave?", version, 6)[0] == "Twenty days."
+    assert len(rag.client.prompt_chars) == 1
+    # The exact-match cache uses the same scope
+    rag.generate_response("How much leave?", DOCS, cache_version=version, k=6)
+    assert len(rag.client.prompt_chars) == 1
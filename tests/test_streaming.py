@@ -0,0 +1,43 @@
+import pytest
+
+try:
+    from langchain.schema import Document
+except ImportError:
+    from langchain_core.documents import Document
+
+from config import Config
+from scripts.fake_llm_server import start_server
+from utils.metrics import histogram
+from utils.rag import RAGSystem
+
+ANSWER = "Employees get twenty days of paid leave."
+FIRST_TOKEN_DELAY = 0.2
+
+
+@pytest.fixture
+def fake_llm():
+    server = start_server(answer=ANSWER, token_delay=0.01, first_token_delay=FIRST_TOKEN_DELAY)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stream_response_yields_tokens_in_order_and_records_ttft(fake_llm, monkeypatch):
+    from groq import Groq
+    monkeypatch.setattr(Config, "CONTEXT_NEIGHBORS", 0)
+    rag = RAGSystem(client=Groq(api_key="test", base_url=fake_llm))
+    docs = [Document(page_content="Employees get twenty days of paid leave per year.",
+                     metadata={"source": "leave.txt"})]
+    first_tokens = histogram("llm_first_token")
+    observed = first_tokens.count
+
+    stream = rag.stream_response("How much leave do I get?", docs)
+    assert stream.time_to_first_token is None
+    fragments = list(stream)
+
+    assert fragments == [word if i == 0 else " " + word for i, word in enumerate(ANSWER.split(" "))]
+    assert "".join(fragments) == ANSWER
+    assert stream.sources == ["leave.txt"]
+    assert FIRST_TOKEN_DELAY <= stream.time_to_first_token < FIRST_TOKEN_DELAY + 2
+    assert first_tokens.count == observed + 1
+    assert first_tokens.recent[-1] == stream.time_to_first_token
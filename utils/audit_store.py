@@ -0,0 +1,151 @@
+"""Durable audit log.
+
+Entries are appended to a SQLite database (WAL mode) by a background writer
+thread: AuditStore.record only puts the entry on a queue, and the writer
+commits whatever has accumulated in one transaction, at most
+Config.AUDIT_BATCH_SIZE entries or Config.AUDIT_FLUSH_SECONDS apart. Reads are
+indexed by user, department and time and paginated, so the admin view never
+loads the whole log.
+"""
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    username TEXT NOT NULL,
+    department TEXT,
+    query TEXT NOT NULL,
+    response TEXT,
+    sources TEXT
+);
+CREATE INDEX IF NOT EXISTS audit_time ON audit_log (timestamp);
+CREATE INDEX IF NOT EXISTS audit_user_time ON audit_log (username, timestamp);
+CREATE INDEX IF NOT EXISTS audit_department_time ON audit_log (department, timestamp);
+"""
+
+INSERT = ("INSERT INTO audit_log (timestamp, username, department, query, response, sources) "
+          "VALUES (?, ?, ?, ?, ?, ?)")
+
+
+class AuditStore:
+    def __init__(self, db_path: str = None, batch_size: int = None, flush_interval: float = None,
+                 max_pending: int = None):
+        self.db_path = db_path or Config.AUDIT_DB_PATH
+        self.batch_size = batch_size or Config.AUDIT_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.AUDIT_FLUSH_SECONDS
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._read_lock = threading.Lock()
+        self._reader = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._reader.row_factory = sqlite3.Row
+        self._reader.execute("PRAGMA journal_mode=WAL")
+        self._reader.executescript(SCHEMA)
+
+        # Bounded so a stalled disk applies backpressure instead of growing memory
+        self._pending = queue.Queue(maxsize=max_pending or Config.AUDIT_QUEUE_SIZE)
+        self._writer = threading.Thread(target=self._write_loop, name="audit-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def record(self, entry: Dict):
+        """Queue an entry for writing; returns without touching the database"""
+        self._pending.put((
+            entry["timestamp"],
+            entry["username"],
+            entry.get("department"),
+            entry["query"],
+            entry.get("response"),
+            json.dumps(entry.get("sources") or []),
+        ))
+
+    def flush(self):
+        """Block until every entry recorded so far is committed"""
+        self._pending.join()
+
+    def _write_loop(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(INSERT, batch)
+            except sqlite3.Error as e:
+                print(f"Audit log write failed, {len(batch)} entries lost: {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    @staticmethod
+    def _filters(username: str = None, department: str = None, since: float = None,
+                 until: float = None) -> tuple:
+        clauses = []
+        params = []
+        if username:
+            clauses.append("username = ?")
+            params.append(username)
+        if department:
+            clauses.append("department = ?")
+            params.append(department)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query(self, username: str = None, department: str = None, since: float = None,
+              until: float = None, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Matching entries, newest first"""
+        where, params = self._filters(username, department, since, until)
+        with self._read_lock:
+            rows = self._reader.execute(
+                f"SELECT * FROM audit_log{where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        logs = []
+        for row in rows:
+            log = dict(row)
+            log["sources"] = json.loads(log["sources"] or "[]")
+            logs.append(log)
+        return logs
+
+    def count(self, username: str = None, department: str = None, since: float = None,
+              until: float = None) -> int:
+        where, params = self._filters(username, department, since, until)
+        with self._read_lock:
+            return self._reader.execute(f"SELECT COUNT(*) FROM audit_log{where}", params).fetchone()[0]
+
+    def distinct(self, column: str) -> List[str]:
+        """Known usernames or departments, for filter widgets"""
+        if column not in ("username", "department"):
+            raise ValueError(f"Cannot list distinct values of {column}")
+        with self._read_lock:
+            rows = self._reader.execute(
+                f"SELECT DISTINCT {column} FROM audit_log WHERE {column} IS NOT NULL ORDER BY {column}"
+            ).fetchall()
+        return [row[0] for row in rows]
@@ -1,79 +1,110 @@
 import streamlit as st
-import bcrypt
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import base64
+import hashlib
+import hmac
+import json
 import time
-from typing import Dict, List
-
-# User database
-USERS_DB = {
-    "admin": {
-        "password_hash": bcrypt.hashpw("admin123".encode('utf-8'), bcrypt.gensalt()),
-        "role": "admin",
-        "department": "IT"
-    },
-    "employee": {
-        "password_hash": bcrypt.hashpw("employee123".encode('utf-8'), bcrypt.gensalt()),
-        "role": "user",
-        "department": "HR"
-    },
-    "viewer": {
-        "password_hash": bcrypt.hashpw("viewer123".encode('utf-8'), bcrypt.gensalt()),
-        "role": "viewer",
-        "department": "Marketing"
-    }
-}
+from typing import Dict, List, Optional
+from config import Config
+from utils.resources import get_audit_store, get_user_store
 
 # Role permissions
 ROLE_PERMISSIONS = {
-    "admin": ["upload_docs", "query", "view_audit", "manage_users"],
+    "admin": ["upload_docs", "query", "view_audit", "manage_users", "view_all_departments"],
     "user": ["upload_docs", "query"],
     "viewer": ["query"]
 }
 
 class Authentication:
     @staticmethod
-    def verify_password(password: str, password_hash: str) -> bool:
-        return bcrypt.checkpw(password.encode('utf-8'), password_hash)
+    def authenticate(username: str, password: str) -> Optional[Dict]:
+        """Verify credentials without touching session state; returns the user's profile"""
+        return get_user_store().verify(username, password)
+    
+    @staticmethod
+    def _signing_key() -> bytes:
+        return Config.SESSION_SECRET.encode("utf-8") if Config.SESSION_SECRET else get_user_store().secret()
+    
+    @staticmethod
+    def _sign(payload: bytes) -> str:
+        digest = hmac.new(Authentication._signing_key(), payload, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+    
+    @staticmethod
+    def issue_token(user: Dict, ttl: float = None) -> str:
+        """Signed session token carrying the user's profile, valid for ttl seconds"""
+        claims = {
+            "sub": user["username"],
+            "role": user["role"],
+            "dept": user["department"],
+            "exp": time.time() + (ttl or Config.SESSION_TIMEOUT)
+        }
+        payload = base64.urlsafe_b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8")).rstrip(b"=")
+        return f"{payload.decode('ascii')}.{Authentication._sign(payload)}"
+    
+    @staticmethod
+    def verify_token(token: str) -> Optional[Dict]:
+        """Profile from a token issued by issue_token, or None if it is forged or expired (no bcrypt involved)"""
+        payload, _, signature = token.partition(".")
+        try:
+            if not hmac.compare_digest(Authentication._sign(payload.encode("ascii")).encode("ascii"),
+                                       signature.encode("ascii")):
+                return None
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except ValueError:
+            # Non-ASCII or malformed token
+            return None
+        if claims.get("exp", 0) < time.time():
+            return None
+        return {"username": claims["sub"], "role": claims["role"], "department": claims["dept"]}
     
     @staticmethod
     def login(username: str, password: str) -> bool:
-        if username in USERS_DB:
-            user_data = USERS_DB[username]
-            if Authentication.verify_password(password, user_data["password_hash"]):
-                st.session_state["authenticated"] = True
-                st.session_state["username"] = username
-                st.session_state["role"] = user_data["role"]
-                st.session_state["department"] = user_data["department"]
-                st.session_state["login_time"] = time.time()
-                return True
+        user = Authentication.authenticate(username, password)
+        if user:
+            st.session_state["authenticated"] = True
+            st.session_state["username"] = username
+            st.session_state["role"] = user["role"]
+            st.session_state["department"] = user["department"]
+            st.session_state["login_time"] = time.time()
+            st.session_state["session_token"] = Authentication.issue_token(user)
+            return True
         return False
     
     @staticmethod
     def logout():
-        for key in ["authenticated", "username", "role", "department", "login_time"]:
+        for key in ["authenticated", "username", "role", "department", "login_time", "session_token"]:
             if key in st.session_state:
                 del st.session_state[key]
     
+    @staticmethod
+    def has_permission(role: str, permission: str) -> bool:
+        return permission in ROLE_PERMISSIONS.get(role, [])
+    
     @staticmethod
     def check_permission(permission: str) -> bool:
         if not st.session_state.get("authenticated", False):
             return False
         user_role = st.session_state.get("role", "viewer")
-        return permission in ROLE_PERMISSIONS.get(user_role, [])
+        return Authentication.has_permission(user_role, permission)
     
     @staticmethod
     def check_session_timeout():
-        if "login_time" in st.session_state:
-            if time.time() - st.session_state["login_time"] > 1800:
-                Authentication.logout()
-                st.error("Session timed out. Please login again.")
-                return True
+        # The token's signed expiry is the session deadline
+        token = st.session_state.get("session_token")
+        if st.session_state.get("authenticated", False) and (token is None or Authentication.verify_token(token) is None):
+            Authentication.logout()
+            st.error("Session timed out. Please login again.")
+            return True
         return False
 
 class AuditLogger:
     @staticmethod
-    def log_query(username: str, query: str, response: str, sources: List[str]):
-        if "audit_logs" not in st.session_state:
-            st.session_state["audit_logs"] = []
+    def log_query(username: str, query: str, response: str, sources: List[str], department: str = None):
+        # Written by the audit store's background thread, off the request path
+        if department is None and get_script_run_ctx() is not None:
+            department = st.session_state.get("department", "Unknown")
         
         log_entry = {
             "timestamp": time.time(),
@@ -81,10 +112,18 @@ class AuditLogger:
             "query": query,
             "response": response[:200] + "..." if len(response) > 200 else response,
             "sources": sources,
-            "department": st.session_state.get("department", "Unknown")
+            "department": department or "Unknown"
         }
-        st.session_state["audit_logs"].append(log_entry)
+        get_audit_store().record(log_entry)
+    
+    @staticmethod
+    def get_audit_logs(username: str = None, department: str = None, since: float = None,
+                       until: float = None, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Logged queries from all users and processes, newest first"""
+        return get_audit_store().query(username=username, department=department, since=since,
+                                       until=until, limit=limit, offset=offset)
     
     @staticmethod
-    def get_audit_logs():
-        return st.session_state.get("audit_logs", [])
\ No newline at end of file
+    def count_audit_logs(username: str = None, department: str = None, since: float = None,
+                         until: float = None) -> int:
+        return get_audit_store().count(username=username, department=department, since=since, until=until)
@@ -0,0 +1,283 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from config import Config
+
+# Keeps codes such as "HR-POL-7", "SKU-000123" or "v2.1" together as one token
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; compound codes also contribute their parts"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-./]", token) if part)
+    return tokens
+
+
+# Terms per "+" record when the log is compacted
+COMPACT_RECORD_TERMS = 4096
+# The log is compacted once it holds this many more chunks than its last compaction wrote
+COMPACT_MIN_CHUNKS = 4096
+
+
+class BM25Index:
+    """Incremental inverted index with Okapi BM25 scoring.
+
+    Postings map term -> {chunk id: term frequency}; a query only touches the
+    postings of its own terms, so lookups stay cheap as the corpus grows.
+
+    With a path the index is persisted as an append-only log of JSON lines: a
+    {"generation": ..., "compacted": chunks} header, then one
+    ["+", {term: {chunk id: frequency}}, {chunk id: length}] record per add()
+    and one ["-", [chunk ids]] record per remove(). Writes append only what
+    changed, and other processes catch up by reading the log from the offset
+    they last reached (refresh). The log is rewritten under a new generation
+    (compacted) once more than half the chunks it holds were removed, or once
+    it has grown past twice what the last compaction wrote, so rewrites stay
+    rare as the corpus grows.
+    """
+
+    def __init__(self, path: str = None, k1: float = None, b: float = None):
+        self.path = path
+        self.k1 = k1 or Config.BM25_K1
+        self.b = b or Config.BM25_B
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, chunk_id: str):
+        return chunk_id in self.doc_lengths
+
+    def _reset(self):
+        self.postings.clear()
+        self.doc_lengths.clear()
+        self.total_length = 0
+        # Log generation and byte offset applied so far, chunks its "+" records hold,
+        # and how many of those the last compaction wrote
+        self._generation = None
+        self._offset = 0
+        self._logged = 0
+        self._compacted = 0
+
+    def _insert(self, postings: Dict[str, Dict[str, int]], lengths: Dict[str, int]):
+        # dict.update keeps replaying a log close to the speed of parsing it
+        for term, docs in postings.items():
+            self.postings.setdefault(term, {}).update(docs)
+        for chunk_id, length in lengths.items():
+            previous = self.doc_lengths.get(chunk_id)
+            self.total_length += length - (previous or 0)
+            self.doc_lengths[chunk_id] = length
+        self._logged += len(lengths)
+
+    def _delete(self, ids: Iterable[str]) -> List[str]:
+        removed = []
+        for chunk_id in ids:
+            length = self.doc_lengths.pop(chunk_id, None)
+            if length is not None:
+                self.total_length -= length
+                removed.append(chunk_id)
+        if removed:
+            doomed = set(removed)
+            for term in list(self.postings):
+                docs = self.postings[term]
+                if len(doomed) < len(docs):
+                    for chunk_id in doomed:
+                        docs.pop(chunk_id, None)
+                else:
+                    for chunk_id in [chunk_id for chunk_id in docs if chunk_id in doomed]:
+                        del docs[chunk_id]
+                if not docs:
+                    del self.postings[term]
+        return removed
+
+    def _apply(self, lines: bytes):
+        for line in lines.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn write from an interrupted append
+                continue
+            if not isinstance(record, list):
+                continue
+            if record[0] == "+":
+                self._insert(record[1], record[2])
+            elif record[0] == "-":
+                self._delete(record[1])
+
+    @staticmethod
+    def _read_header(file) -> dict:
+        try:
+            header = json.loads(file.readline())
+        except ValueError:
+            return {}
+        return header if isinstance(header, dict) else {}
+
+    @staticmethod
+    def _encode(record) -> bytes:
+        return json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+
+    def _append(self, record: list):
+        if self.path is None:
+            return
+        with open(self.path, "ab") as file:
+            prefix = b""
+            if file.tell() == 0:
+                self._generation = uuid.uuid4().hex
+                prefix = self._encode({"generation": self._generation, "compacted": 0})
+            elif file.tell() != self._offset:
+                # Unapplied bytes are a torn line; start ours on a fresh one
+                prefix = b"\n"
+            file.write(prefix + self._encode(record))
+            self._offset = file.tell()
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        # Chunk ids are content hashes, so an id that is already indexed has the same terms
+        with self._lock:
+            self._catch_up()
+            postings: Dict[str, Dict[str, int]] = {}
+            lengths: Dict[str, int] = {}
+            for chunk_id, text in zip(ids, texts):
+                if chunk_id in self.doc_lengths or chunk_id in lengths:
+                    continue
+                terms = tokenize(text)
+                for term, frequency in Counter(terms).items():
+                    postings.setdefault(term, {})[chunk_id] = frequency
+                lengths[chunk_id] = len(terms)
+            if not lengths:
+                return
+            self._insert(postings, lengths)
+            self._append(["+", postings, lengths])
+            if self.path is not None and self._logged > 2 * max(self._compacted, COMPACT_MIN_CHUNKS):
+                self.compact()
+
+    def remove(self, ids: Iterable[str]):
+        """Drop chunks; one pass over the postings per call, so batch removals"""
+        with self._lock:
+            self._catch_up()
+            removed = self._delete(ids)
+            if not removed:
+                return
+            self._append(["-", removed])
+            if self.path is not None and self._logged > 2 * len(self.doc_lengths):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the log with only the chunks still indexed, under a new generation"""
+        with self._lock:
+            if self.path is None:
+                return
+            generation = uuid.uuid4().hex
+            terms = list(self.postings)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(self._encode({"generation": generation, "compacted": len(self.doc_lengths)}))
+                for start in range(0, len(terms), COMPACT_RECORD_TERMS):
+                    group = {term: self.postings[term] for term in terms[start:start + COMPACT_RECORD_TERMS]}
+                    file.write(self._encode(["+", group, {}]))
+                file.write(self._encode(["+", {}, self.doc_lengths]))
+                offset = file.tell()
+            os.replace(temp_path, self.path)
+            self._generation, self._offset = generation, offset
+            self._logged = self._compacted = len(self.doc_lengths)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            if self.path is not None:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+
+    def refresh(self) -> bool:
+        """Apply records other processes appended since the last load or refresh.
+
+        Reads only the new end of the log. Returns False when the log was
+        compacted or cleared since, in which case the index must be reloaded.
+        """
+        if self.path is None:
+            return True
+        with self._lock:
+            try:
+                file = open(self.path, "rb")
+            except OSError:
+                return not self.doc_lengths
+            with file:
+                if self._read_header(file).get("generation") != self._generation:
+                    if self._generation is None and not self.doc_lengths:
+                        self._load_from(file)
+                        return True
+                    return False
+                file.seek(self._offset)
+                data = file.read()
+            complete = data.rfind(b"\n") + 1
+            self._apply(data[:complete])
+            self._offset += complete
+            return True
+
+    def _catch_up(self):
+        # Writers must append to the log they have applied, so reload when it was replaced
+        if self.refresh():
+            return
+        self._reset()
+        try:
+            with open(self.path, "rb") as file:
+                self._load_from(file)
+        except OSError:
+            pass
+
+    def _load_from(self, file):
+        file.seek(0)
+        header = self._read_header(file)
+        self._generation = header.get("generation")
+        self._compacted = header.get("compacted", 0)
+        self._offset = file.tell()
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            self._apply(line)
+            self._offset += len(line)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, score) pairs for query"""
+        with self._lock:
+            doc_count = len(self.doc_lengths)
+            if not doc_count:
+                return []
+            average_length = self.total_length / doc_count
+            scores = {}
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for chunk_id, frequency in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls(path)
+        try:
+            with open(path, "rb") as file:
+                index._load_from(file)
+        except OSError:
+            pass
+        return index
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from config import Config
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SemanticCache:
+    """LRU cache keyed by query embedding instead of query text.
+
+    A lookup hits when a stored query of the same scope (e.g. the collection
+    version) has cosine similarity >= threshold with the new one, so
+    paraphrases share an entry. Embeddings must be unit-normalized. Entries
+    live in a preallocated matrix and are scanned exactly; at a few hundred
+    entries one matrix-vector product is cheaper than maintaining an ANN graph
+    and lets evicted slots be reused in place.
+    """
+
+    def __init__(self, max_entries: int, threshold: float, ttl: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._vectors = None  # (max_entries, dimensions), allocated on the first set()
+        self._slots = {}  # slot -> (scope, expires, value)
+        self._scopes = {}  # scope -> [slot]
+        self._order = OrderedDict()  # slots, least recently used first
+        self._lock = threading.Lock()
+
+    def _best(self, vector: np.ndarray, scope):
+        """(similarity, slot) of the closest live entry in scope, or (None, None)"""
+        slots = self._scopes.get(scope)
+        if not slots or self._vectors is None or len(vector) != self._vectors.shape[1]:
+            return None, None
+        # The whole matrix is one product; indexing its rows per scope would copy them
+        similarities = (self._vectors @ vector)[slots]
+        best = int(np.argmax(similarities))
+        return float(similarities[best]), slots[best]
+
+    def _drop(self, slot: int):
+        scope, _, _ = self._slots.pop(slot)
+        self._scopes[scope].remove(slot)
+        if not self._scopes[scope]:
+            del self._scopes[scope]
+        del self._order[slot]
+
+    def get(self, vector, scope, default=None):
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            similarity, slot = self._best(vector, scope)
+            if similarity is None or similarity < self.threshold:
+                self.misses += 1
+                return default
+            _, expires, value = self._slots[slot]
+            if expires < time.monotonic():
+                self._drop(slot)
+                self.misses += 1
+                return default
+            self._order.move_to_end(slot)
+            self.hits += 1
+            return value
+
+    def set(self, vector, scope, value):
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None or len(vector) != self._vectors.shape[1]:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._slots, self._scopes, self._order = {}, {}, OrderedDict()
+            similarity, slot = self._best(vector, scope)
+            if similarity is not None and similarity >= self.threshold:
+                # Replace the paraphrase it would hit rather than storing a near-copy
+                self._drop(slot)
+            elif len(self._slots) < self.max_entries:
+                slot = len(self._slots)
+                while slot in self._slots:
+                    slot = (slot + 1) % self.max_entries
+            else:
+                slot = next(iter(self._order))
+                self._drop(slot)
+            self._vectors[slot] = vector
+            self._slots[slot] = (scope, time.monotonic() + self.ttl, value)
+            self._scopes.setdefault(scope, []).append(slot)
+            self._order[slot] = None
+
+    def clear(self):
+        with self._lock:
+            self._slots, self._scopes, self._order = {}, {}, OrderedDict()
+
+    def __len__(self):
+        return len(self._slots)
+
+
+def normalize_query(query: str) -> str:
+    """Collapse case, whitespace and trailing punctuation so trivial variants share a cache key"""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+# Process-wide caches: module state is shared by every Streamlit session in the server process
+query_embedding_cache = TTLCache(Config.QUERY_EMBEDDING_CACHE_SIZE, Config.CACHE_TTL_SECONDS)
+retrieval_cache = TTLCache(Config.RETRIEVAL_CACHE_SIZE, Config.CACHE_TTL_SECONDS)
+answer_cache = TTLCache(Config.ANSWER_CACHE_SIZE, Config.CACHE_TTL_SECONDS)
+rerank_score_cache = TTLCache(Config.RERANK_CACHE_SIZE, Config.CACHE_TTL_SECONDS)
+semantic_answer_cache = SemanticCache(Config.SEMANTIC_CACHE_SIZE, Config.SEMANTIC_CACHE_THRESHOLD,
+                                      Config.CACHE_TTL_SECONDS)
@@ -0,0 +1,315 @@
+"""Memory-mapped chunk text store.
+
+Chunk texts and metadata are appended to a segment file that is read
+through mmap, so a large corpus lives in the page cache rather than the
+Python heap. A fixed-width record file indexes the segment by chunk id and
+by position in the source (source, section, start offset). Position order
+gives each chunk's neighbours, so a hit can be widened to its surrounding
+text even though the source files are not kept.
+
+Files for prefix <collection>.chunks: .segment (per chunk, UTF-8 text then
+JSON metadata), .records (RECORD rows) and .sources (one JSON-encoded source
+name per line, numbered by line). Deleted chunks are tombstoned in place;
+compact() drops them and runs from remove() once half the records are dead.
+The store is derived from the collection, so one left half-compacted by a
+crash is cleared on load and backfilled again.
+"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+try:
+    from langchain.schema import Document
+except ImportError:
+    from langchain_core.documents import Document
+
+RECORD = np.dtype([
+    ("id", "S16"),
+    ("source", "<i4"),
+    ("section", "<i8"),  # page (PDF) or first row (CSV) of the parsed document the chunk came from
+    ("start", "<i8"),  # start_index/end_index within that document, -1 when the splitter gave none
+    ("end", "<i8"),
+    ("offset", "<i8"),
+    ("text_length", "<i4"),
+    ("meta_length", "<i4"),
+    ("deleted", "u1"),
+])
+_DELETED_OFFSET = RECORD.fields["deleted"][1]
+# Ids appended since the sorted id index was built are looked up in a dict until there are this many
+MAX_UNSORTED = 65536
+
+
+def _key(chunk_id: str) -> bytes:
+    """16-byte record key; numpy drops trailing NULs from "S16" values, so keys are stored without them"""
+    try:
+        raw = bytes.fromhex(chunk_id)
+    except ValueError:
+        raw = b""
+    if len(raw) != 16:
+        raw = hashlib.md5(chunk_id.encode("utf-8")).digest()
+    return raw.rstrip(b"\0")
+
+
+def _chunk_id(key: bytes) -> str:
+    return key.ljust(16, b"\0").hex()
+
+
+def _section(metadata: dict) -> int:
+    return int(metadata.get("page") or metadata.get("row_start") or 0)
+
+
+def stitch(docs: List[Document]) -> str:
+    """Text of consecutive chunks of one source, without the splitter's overlaps"""
+    parts = []
+    previous = None
+    for doc in docs:
+        text = doc.page_content
+        if previous is not None:
+            same_section = _section(previous.metadata) == _section(doc.metadata)
+            previous_end = previous.metadata.get("end_index")
+            start = doc.metadata.get("start_index")
+            if same_section and previous_end is not None and start is not None and start <= previous_end:
+                text = text[previous_end - start:]
+            else:
+                parts.append("\n")
+        parts.append(text)
+        previous = doc
+    return "".join(parts)
+
+
+class ChunkStore:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._lock = threading.RLock()
+        self._sources: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+        self._records = np.zeros(0, dtype=RECORD)
+        self._segment = None
+        self._segment_size = 0
+        self._dead = 0
+        self._invalidate()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._records) - self._dead
+
+    @classmethod
+    def load(cls, prefix: str) -> "ChunkStore":
+        return cls(prefix)
+
+    def _path(self, suffix: str) -> str:
+        return f"{self.prefix}.{suffix}"
+
+    def _invalidate(self):
+        # Sorted id index (keys, rows) plus the dict of rows appended since it was built
+        self._sorted_keys = None
+        self._sorted_rows = None
+        self._recent: Dict[bytes, int] = {}
+        # Live rows in (source, section, start, row) order, and each row's place in it
+        self._order = None
+        self._rank = None
+
+    def _load(self):
+        if os.path.exists(self._path("compacting")):
+            self.clear()
+            return
+        try:
+            with open(self._path("sources"), "r", encoding="utf-8") as file:
+                self._sources = [json.loads(line) for line in file if line.strip()]
+            self._segment_size = os.path.getsize(self._path("segment"))
+        except OSError:
+            return
+        self._source_ids = {source: i for i, source in enumerate(self._sources)}
+        self._records = self._open_records()
+        self._dead = int(self._records["deleted"].sum()) if len(self._records) else 0
+
+    def _open_records(self) -> np.ndarray:
+        # Records are written last, so a partial trailing row is an interrupted append
+        try:
+            rows = os.path.getsize(self._path("records")) // RECORD.itemsize
+        except OSError:
+            rows = 0
+        if not rows:
+            return np.zeros(0, dtype=RECORD)
+        return np.memmap(self._path("records"), dtype=RECORD, mode="r", shape=(rows,))
+
+    def _segment_view(self) -> mmap.mmap:
+        if self._segment is None or len(self._segment) < self._segment_size:
+            if self._segment is not None:
+                self._segment.close()
+            with open(self._path("segment"), "rb") as file:
+                self._segment = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._segment
+
+    def _row_of(self, key: bytes) -> int:
+        row = self._recent.get(key)
+        if row is not None:
+            return row
+        if self._sorted_keys is None:
+            live = np.flatnonzero(self._records["deleted"] == 0)
+            keys = self._records["id"][live]
+            order = np.argsort(keys, kind="stable")
+            self._sorted_keys, self._sorted_rows = keys[order], live[order]
+            self._recent = {}
+        position = int(np.searchsorted(self._sorted_keys, key))
+        if position < len(self._sorted_keys) and self._sorted_keys[position] == key:
+            return int(self._sorted_rows[position])
+        return -1
+
+    def _document(self, row: int) -> Document:
+        record = self._records[row]
+        segment = self._segment_view()
+        start = int(record["offset"])
+        text_end = start + int(record["text_length"])
+        metadata = json.loads(segment[text_end:text_end + int(record["meta_length"])])
+        metadata["chunk_id"] = _chunk_id(bytes(record["id"]))
+        return Document(page_content=segment[start:text_end].decode("utf-8"), metadata=metadata)
+
+    def add(self, ids: List[str], docs: List[Document]):
+        """Append chunks and persist them immediately; ids already stored are skipped"""
+        with self._lock:
+            fresh = {}
+            for chunk_id, doc in zip(ids, docs):
+                key = _key(chunk_id)
+                if key not in fresh and self._row_of(key) == -1:
+                    fresh[key] = doc
+            if not fresh:
+                return
+
+            directory = os.path.dirname(self.prefix)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            try:
+                offset = os.path.getsize(self._path("segment"))
+            except OSError:
+                offset = 0
+            new_sources = []
+            records = np.zeros(len(fresh), dtype=RECORD)
+            parts = []
+            for i, (key, doc) in enumerate(fresh.items()):
+                metadata = {name: value for name, value in doc.metadata.items() if name != "chunk_id"}
+                source = str(metadata.get("source", ""))
+                source_id = self._source_ids.get(source)
+                if source_id is None:
+                    source_id = self._source_ids[source] = len(self._sources)
+                    self._sources.append(source)
+                    new_sources.append(source)
+                text = doc.page_content.encode("utf-8")
+                meta = json.dumps(metadata, separators=(",", ":"), default=str).encode("utf-8")
+                records[i] = (key, source_id, _section(metadata), int(metadata.get("start_index", -1)),
+                              int(metadata.get("end_index", -1)), offset, len(text), len(meta), 0)
+                parts += [text, meta]
+                offset += len(text) + len(meta)
+
+            if new_sources:
+                with open(self._path("sources"), "a", encoding="utf-8") as file:
+                    file.write("".join(json.dumps(source) + "\n" for source in new_sources))
+            with open(self._path("segment"), "ab") as file:
+                file.write(b"".join(parts))
+            # records last: a chunk only counts once its record is written
+            with open(self._path("records"), "ab") as file:
+                records.tofile(file)
+
+            first_row = len(self._records)
+            self._segment_size = offset
+            self._records = self._open_records()
+            for i, key in enumerate(fresh):
+                self._recent[key] = first_row + i
+            if len(self._recent) > MAX_UNSORTED:
+                self._sorted_keys = None
+            self._order = None
+
+    def get(self, ids: List[str]) -> Dict[str, Document]:
+        """{chunk id: Document} for the ids that are stored"""
+        with self._lock:
+            found = {}
+            for chunk_id in ids:
+                row = self._row_of(_key(chunk_id))
+                if row != -1:
+                    found[chunk_id] = self._document(row)
+                    found[chunk_id].metadata["chunk_id"] = chunk_id
+            return found
+
+    def neighbors(self, chunk_id: str, window: int = 1) -> List[Document]:
+        """The chunk and up to window chunks either side of it from the same source, in source order"""
+        with self._lock:
+            row = self._row_of(_key(chunk_id))
+            if row == -1:
+                return []
+            if self._order is None:
+                live = np.flatnonzero(self._records["deleted"] == 0)
+                records = self._records[live]
+                self._order = live[np.lexsort((live, records["start"], records["section"], records["source"]))]
+                self._rank = np.full(len(self._records), -1, dtype=np.int64)
+                self._rank[self._order] = np.arange(len(self._order))
+            position = int(self._rank[row])
+            source = self._records["source"][row]
+            rows = self._order[max(0, position - window):position + window + 1]
+            return [self._document(int(neighbour)) for neighbour in rows
+                    if self._records["source"][neighbour] == source]
+
+    def remove(self, ids: List[str]):
+        """Tombstone chunks by id, compacting once half the records are dead"""
+        with self._lock:
+            rows = {self._row_of(_key(chunk_id)) for chunk_id in ids}
+            rows.discard(-1)
+            if not rows:
+                return
+            with open(self._path("records"), "r+b") as file:
+                for row in sorted(rows):
+                    file.seek(row * RECORD.itemsize + _DELETED_OFFSET)
+                    file.write(b"\1")
+            self._records = self._open_records()
+            self._dead += len(rows)
+            self._invalidate()
+            if self._dead * 2 > len(self._records):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the segment and records without deleted chunks"""
+        with self._lock:
+            if not self._dead:
+                return
+            live = np.flatnonzero(self._records["deleted"] == 0)
+            records = np.array(self._records[live])
+            segment = self._segment_view() if len(records) else None
+            open(self._path("compacting"), "w").close()
+            lengths = records["text_length"].astype(np.int64) + records["meta_length"]
+            with open(self._path("segment.tmp"), "wb") as file:
+                for start, length in zip(records["offset"].tolist(), lengths.tolist()):
+                    file.write(segment[start:start + length])
+            offset = int(lengths.sum())
+            records["offset"] = np.cumsum(lengths) - lengths
+            records.tofile(self._path("records.tmp"))
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            os.replace(self._path("segment.tmp"), self._path("segment"))
+            os.replace(self._path("records.tmp"), self._path("records"))
+            os.remove(self._path("compacting"))
+            self._segment_size = offset
+            self._records = self._open_records()
+            self._dead = 0
+            self._invalidate()
+
+    def clear(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            for suffix in ("segment", "records", "sources", "segment.tmp", "records.tmp", "compacting"):
+                try:
+                    os.remove(self._path(suffix))
+                except OSError:
+                    pass
+            self._sources = []
+            self._source_ids = {}
+            self._records = np.zeros(0, dtype=RECORD)
+            self._segment_size = 0
+            self._dead = 0
+            self._invalidate()
@@ -0,0 +1,152 @@
+"""Prompt context assembly.
+
+Retrieved chunks overlap (the splitter repeats the configured overlap
+between neighbours) and re-uploaded files produce near-identical chunks.
+pack_context turns the ranked retrieval results into the context actually
+sent to the LLM:
+
+1. near-duplicates are dropped (64-bit SimHash over word shingles),
+2. chunks of the same source whose text overlaps are merged into one span,
+3. spans are packed best-first into a token budget.
+"""
+import hashlib
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+try:
+    from langchain.schema import Document
+except ImportError:
+    from langchain_core.documents import Document
+
+from config import Config
+
+_WORD = re.compile(r"\w+")
+# Overlaps shorter than this are coincidental ("the ", "\n\n")
+MIN_MERGE_OVERLAP = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count without loading a tokenizer"""
+    return (len(text) + Config.CHARS_PER_TOKEN - 1) // Config.CHARS_PER_TOKEN
+
+
+def chunk_limits() -> Tuple[int, int]:
+    """(chunk size, overlap) in characters, converting from tokens when configured"""
+    if Config.CHUNK_LENGTH_UNIT == "tokens":
+        return (Config.CHUNK_SIZE_TOKENS * Config.CHARS_PER_TOKEN,
+                Config.CHUNK_OVERLAP_TOKENS * Config.CHARS_PER_TOKEN)
+    return Config.CHUNK_SIZE, Config.CHUNK_OVERLAP
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    words = _WORD.findall(text.lower())
+    if len(words) < shingle:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+    values = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "little")
+         for item in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # Bit i is set when most shingle hashes have it set
+    bits = (values[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return sum(1 << bit for bit in np.flatnonzero(majority).tolist())
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is a prefix of right"""
+    longest = min(len(left), len(right), chunk_limits()[1] * 2)
+    for size in range(longest, MIN_MERGE_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_metadata(first: dict, second: dict) -> dict:
+    metadata = dict(first)
+    for start_key, end_key in (("page", "page_end"), ("row_start", "row_end")):
+        if start_key in first and start_key in second:
+            metadata[start_key] = min(first[start_key], second[start_key])
+            metadata[end_key] = max(first.get(end_key, first[start_key]),
+                                    second.get(end_key, second[start_key]))
+    return metadata
+
+
+def _try_merge(kept: Document, doc: Document):
+    """Merged document when doc continues or precedes kept, else None"""
+    if kept.metadata.get("source") != doc.metadata.get("source"):
+        return None
+    if doc.page_content in kept.page_content:
+        return kept
+    if kept.page_content in doc.page_content:
+        return Document(page_content=doc.page_content, metadata=_merge_metadata(kept.metadata, doc.metadata))
+    size = _overlap(kept.page_content, doc.page_content)
+    if size:
+        return Document(page_content=kept.page_content + doc.page_content[size:],
+                        metadata=_merge_metadata(kept.metadata, doc.metadata))
+    size = _overlap(doc.page_content, kept.page_content)
+    if size:
+        return Document(page_content=doc.page_content + kept.page_content[size:],
+                        metadata=_merge_metadata(doc.metadata, kept.metadata))
+    return None
+
+
+def dedupe(docs: List[Document], max_distance: int = None) -> List[Document]:
+    """Drop chunks within max_distance SimHash bits of a higher-ranked one"""
+    max_distance = Config.CONTEXT_SIMHASH_DISTANCE if max_distance is None else max_distance
+    kept = []
+    fingerprints = []
+    for doc in docs:
+        fingerprint = simhash(doc.page_content)
+        if any(hamming(fingerprint, other) <= max_distance for other in fingerprints):
+            continue
+        kept.append(doc)
+        fingerprints.append(fingerprint)
+    return kept
+
+
+def merge_overlapping(docs: List[Document]) -> List[Document]:
+    """Merge chunks of one source that overlap; merged spans keep the better rank"""
+    merged = []
+    for doc in docs:
+        for index, kept in enumerate(merged):
+            combined = _try_merge(kept, doc)
+            if combined is not None:
+                merged[index] = combined
+                break
+        else:
+            merged.append(doc)
+    # A merge can make two earlier spans overlap each other
+    if len(merged) < len(docs):
+        return merge_overlapping(merged)
+    return merged
+
+
+def pack_context(docs: List[Document], token_budget: int = None) -> List[Document]:
+    """Deduplicated, merged chunks in rank order, fitting within token_budget.
+
+    docs is the retrieval ranking, best first. A span that doesn't fit is
+    skipped in favour of smaller lower-ranked ones; if even the best span
+    doesn't fit it is truncated so the prompt is never empty.
+    """
+    token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+    packed = []
+    used = 0
+    for doc in merge_overlapping(dedupe(docs)):
+        tokens = estimate_tokens(doc.page_content)
+        if used + tokens <= token_budget:
+            packed.append(doc)
+            used += tokens
+        elif not packed:
+            text = doc.page_content[:token_budget * Config.CHARS_PER_TOKEN]
+            packed.append(Document(page_content=text, metadata=doc.metadata))
+            used = estimate_tokens(text)
+    return packed
@@ -1,4 +1,6 @@
+import io
 import os
+import uuid
 import pandas as pd
 from PyPDF2 import PdfReader
 # FIXED: Use correct import path
@@ -7,115 +9,400 @@ try:
 except ImportError:
     from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from typing import Iterable, Iterator, List, Tuple
+from config import Config
+from utils.context import chunk_limits, estimate_tokens
+from utils.metrics import span
 import streamlit as st
-import uuid
+
+
+# Pages extracted per pool task
+PDF_TASK_PAGES = 50
+# (file key, PdfReader) last opened in this pool worker. Opening a PDF and
+# reaching its last page costs about a tenth of extracting all of it, so
+# each worker opens a file once rather than once per task
+_open_pdf = None
+
+
+def _extract_pdf_pages(key: str, data: bytes, start: int, end: int) -> List[str]:
+    global _open_pdf
+    if _open_pdf is None or _open_pdf[0] != key:
+        _open_pdf = (key, PdfReader(io.BytesIO(data)))
+    reader = _open_pdf[1]
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _pdf_page_document(texts: List[str], start: int, total_pages: int, original_name: str) -> Document:
+    return Document(
+        page_content="\n".join(texts),
+        metadata={
+            "source": original_name, 
+            "type": "pdf",
+            "page": start + 1,
+            "page_end": start + len(texts),
+            "pages": total_pages
+        }
+    )
+
+
+def iter_pdf_pages(source, original_name: str, pages_per_document: int = None,
+                   workers: int = 1) -> Iterator[Document]:
+    """Yield one Document per page (or run of pages) of a PDF.
+
+    Pages are extracted lazily, so only the pages in flight are held in memory.
+    With workers > 1, in-memory bytes and at least Config.PDF_PARALLEL_MIN_PAGES
+    pages, runs of PDF_TASK_PAGES pages are extracted in the shared warm parse
+    pool (see get_parse_pool), with at most two runs per worker outstanding.
+    """
+    pages_per_document = pages_per_document or Config.PDF_PAGES_PER_DOCUMENT
+    if isinstance(source, (bytes, bytearray)):
+        data, source = source, io.BytesIO(source)
+    else:
+        data = None
+    reader = PdfReader(source)
+    total_pages = len(reader.pages)
+    ranges = [(start, min(start + pages_per_document, total_pages))
+              for start in range(0, total_pages, pages_per_document)]
+    
+    if workers <= 1 or data is None or total_pages < Config.PDF_PARALLEL_MIN_PAGES:
+        for start, end in ranges:
+            texts = [reader.pages[i].extract_text() or "" for i in range(start, end)]
+            yield _pdf_page_document(texts, start, total_pages, original_name)
+        return
+    
+    del reader
+    from utils.resources import get_parse_pool
+    pool = get_parse_pool()
+    key = uuid.uuid4().hex
+    per_task = max(1, PDF_TASK_PAGES // pages_per_document)
+    groups = [ranges[i:i + per_task] for i in range(0, len(ranges), per_task)]
+
+    def documents(group: list, future) -> Iterator[Document]:
+        texts = future.result()
+        offset = group[0][0]
+        for start, end in group:
+            yield _pdf_page_document(texts[start - offset:end - offset], start, total_pages, original_name)
+
+    pending = deque()
+    for group in groups:
+        pending.append((group, pool.submit(_extract_pdf_pages, key, data, group[0][0], group[-1][1])))
+        if len(pending) >= workers * 2:
+            yield from documents(*pending.popleft())
+    while pending:
+        yield from documents(*pending.popleft())
+
+
+def _txt_documents(text: str, original_name: str) -> List[Document]:
+    return [Document(
+        page_content=text,
+        metadata={
+            "source": original_name, 
+            "type": "txt",
+            "lines": text.count('\n') + 1
+        }
+    )]
+
+
+def iter_csv_documents(source, original_name: str, chunk_chars: int = None,
+                       read_chunksize: int = None) -> Iterator[Document]:
+    """Yield row-aligned Documents from a CSV, each starting with the column header.
+
+    The file is read in blocks of read_chunksize rows and rows are serialized with
+    vectorized string operations, then packed whole into documents that fit the
+    splitter's chunk size so no record is cut in half.
+    """
+    chunk_chars = chunk_chars or chunk_limits()[0]
+    read_chunksize = read_chunksize or Config.CSV_READ_CHUNKSIZE
+    reader = pd.read_csv(source, chunksize=read_chunksize, dtype=str, keep_default_na=False)
+    
+    for frame in reader:
+        columns = [str(column) for column in frame.columns]
+        header = "CSV columns: " + ", ".join(columns) + "\n"
+        budget = max(chunk_chars - len(header), 1)
+        
+        cells = [column + ": " + frame[column] for column in frame.columns]
+        rows = cells[0].str.cat(cells[1:], sep=", ") if len(cells) > 1 else cells[0]
+        lines = ("Row " + frame.index.astype(str) + ": " + rows + "\n").tolist()
+        lengths = [len(line) for line in lines]
+        first_row = int(frame.index[0]) if len(frame.index) else 0
+        
+        start = 0
+        while start < len(lines):
+            end = start + 1
+            size = lengths[start]
+            while end < len(lines) and size + lengths[end] <= budget:
+                size += lengths[end]
+                end += 1
+            yield Document(
+                page_content=header + "".join(lines[start:end]),
+                metadata={
+                    "source": original_name, 
+                    "type": "csv",
+                    "row_start": first_row + start,
+                    "row_end": first_row + end - 1,
+                    "columns": len(columns)
+                }
+            )
+            start = end
+
+
+def iter_file_bytes(file_name: str, data: bytes, pdf_workers: int = 1) -> Iterator[Document]:
+    """Parse an uploaded file straight from its bytes, lazily.
+
+    PDF pages and CSV row blocks are produced as the caller consumes them, so
+    only the documents in flight are held in memory. Errors are raised rather
+    than reported (possibly partway through the file) so the caller decides
+    how to surface them.
+    """
+    extension = file_name.lower()
+    if extension.endswith('.pdf'):
+        return iter_pdf_pages(data, file_name, workers=pdf_workers)
+    elif extension.endswith('.txt'):
+        return iter(_txt_documents(data.decode('utf-8'), file_name))
+    elif extension.endswith('.csv'):
+        return iter_csv_documents(io.BytesIO(data), file_name)
+    raise ValueError(f"Unsupported file type: {file_name}")
+
+
+def parse_file_bytes(file_name: str, data: bytes, pdf_workers: int = 1) -> List[Document]:
+    """iter_file_bytes collected into a list.
+
+    Kept at module level so it can be shipped to worker processes, whose
+    results are pickled whole; in-process callers should stream iter_file_bytes.
+    """
+    return list(iter_file_bytes(file_name, data, pdf_workers))
+
+
+def iter_parsed_files(files: list, max_workers: int = None) -> Iterator[Tuple]:
+    """Parse files (anything with .name and .getvalue(), like uploads or spooled
+    queue files), yielding (file, documents, error) as each one finishes.
+
+    With more than one worker, files are parsed in the shared warm pool (see
+    get_parse_pool) with at most two files per worker in flight, and documents
+    are lists. Otherwise documents are lazy iterators whose parse errors
+    surface while they are consumed.
+    """
+    from utils.resources import discard_parse_pool, get_parse_pool
+    max_workers = min(max_workers or Config.PARSE_WORKERS, len(files))
+    if max_workers <= 1:
+        for file in files:
+            try:
+                yield file, iter_file_bytes(file.name, file.getvalue(), pdf_workers=Config.PDF_PAGE_WORKERS), None
+            except Exception as e:
+                yield file, None, e
+        return
+    
+    pool = get_parse_pool()
+    remaining = iter(files)
+    pending = {}
+    unsubmitted = []
+    broken = False
+
+    def submit():
+        file = next(remaining, None)
+        if file is None:
+            return
+        try:
+            pending[pool.submit(parse_file_bytes, file.name, file.getvalue())] = file
+        except BrokenProcessPool:
+            unsubmitted.append(file)
+
+    for _ in range(max_workers * 2):
+        submit()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            file = pending.pop(future)
+            try:
+                documents, error = future.result(), None
+            except Exception as e:
+                documents, error = None, e
+                broken = broken or isinstance(e, BrokenProcessPool)
+            if not broken and not unsubmitted:
+                submit()
+            yield file, documents, error
+    if broken or unsubmitted:
+        # A crashed worker breaks the whole pool; later jobs get a fresh one
+        discard_parse_pool(pool)
+        for file in unsubmitted + list(remaining):
+            yield file, None, BrokenProcessPool("A parse worker terminated abruptly")
+
+
+def format_citation(metadata: dict) -> str:
+    """Source name for display, with the page or row range when known"""
+    source = metadata.get("source", "Unknown")
+    if "row_start" in metadata:
+        return f"{source} (rows {metadata['row_start']}-{metadata['row_end']})"
+    page = metadata.get("page")
+    if page is None:
+        return source
+    page_end = metadata.get("page_end", page)
+    if page_end != page:
+        return f"{source} (pp. {page}-{page_end})"
+    return f"{source} (p. {page})"
+
+
+
+class TextChunker:
+    """Single-pass splitter that works on offsets into the source text.
+
+    Each chunk ends at the last paragraph break, line break, sentence end or
+    space that fits in chunk_size (in that order of preference), searched with
+    str.rfind over that window only; the next chunk starts chunk_overlap
+    characters back, moved forward to a word boundary. Chunks are (start, end)
+    spans until split_documents materializes them, and carry their offsets and
+    an approximate token count in metadata.
+    """
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None,
+                 separators: Tuple[str, ...] = ("\n\n", "\n", ". ", "! ", "? ", " ")):
+        default_size, default_overlap = chunk_limits()
+        self.chunk_size = chunk_size or default_size
+        self.chunk_overlap = default_overlap if chunk_overlap is None else chunk_overlap
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.separators = separators
+        # Breaks earlier than this in the window would leave a runt chunk
+        self.min_chunk = self.chunk_size // 4
+
+    def _chunk_end(self, text: str, floor: int, limit: int) -> int:
+        for separator in self.separators:
+            position = text.rfind(separator, floor, limit)
+            if position != -1:
+                # Sentence punctuation stays with its sentence; whitespace is trimmed below
+                return position + len(separator)
+        return limit
+
+    def iter_spans(self, text: str) -> Iterator[Tuple[int, int]]:
+        length = len(text)
+        start = 0
+        previous_end = 0
+        last_stop = 0
+        while start < length and text[start].isspace():
+            start += 1
+        while start < length:
+            limit = start + self.chunk_size
+            # Each chunk must reach past the previous one, or it would sit inside its overlap
+            floor = max(start + self.min_chunk, previous_end)
+            end = length if limit >= length else self._chunk_end(text, floor, limit)
+            previous_end = end
+            stop = end
+            while stop > start and text[stop - 1].isspace():
+                stop -= 1
+            # Trimming trailing whitespace can pull stop back inside the previous
+            # chunk; such a span adds nothing and is dropped
+            if stop > start and stop > last_stop:
+                yield start, stop
+                last_stop = stop
+            if end >= length:
+                return
+            
+            start_of_overlap = end - self.chunk_overlap
+            if self.chunk_overlap and start_of_overlap > start:
+                boundary = text.find(" ", start_of_overlap, stop)
+                start = boundary + 1 if boundary != -1 else start_of_overlap
+            else:
+                # No overlap, or a chunk no longer than the overlap: don't step backwards
+                start = end
+            while start < length and text[start].isspace():
+                start += 1
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.iter_spans(text)]
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunks = []
+        for document in documents:
+            text = document.page_content
+            for start, end in self.iter_spans(text):
+                content = text[start:end]
+                metadata = dict(document.metadata)
+                metadata["start_index"] = start
+                metadata["end_index"] = end
+                metadata["tokens"] = estimate_tokens(content)
+                chunks.append(Document(page_content=content, metadata=metadata))
+        return chunks
+
 
 class DocumentProcessor:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-            separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
-        )
+        if Config.CHUNKER == "langchain":
+            chunk_size, chunk_overlap = chunk_limits()
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_function=len,
+                separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
+            )
+        else:
+            self.text_splitter = TextChunker()
            
         
-    def load_pdf(self, file_path: str) -> List[Document]:
+    def iter_pdf(self, file_path: str, workers: int = 1) -> Iterator[Document]:
+        """Stream a PDF from disk one page document at a time"""
+        if workers > 1:
+            with open(file_path, 'rb') as file:
+                source = file.read()
+        else:
+            source = file_path
+        return iter_pdf_pages(source, os.path.basename(file_path), workers=workers)
+    
+    def load_pdf(self, file_path: str) -> Iterator[Document]:
         try:
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            
-            # Use original filename
-            original_name = os.path.basename(file_path).replace('temp_', '')
-            documents = [Document(
-                page_content=text,
-                metadata={
-                    "source": original_name, 
-                    "type": "pdf",
-                    "pages": len(reader.pages)
-                }
-            )]
-            return documents
+            yield from self.iter_pdf(file_path)
         except Exception as e:
             st.error(f"Error loading PDF: {str(e)}")
-            return []
     
     def load_txt(self, file_path: str) -> List[Document]:
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 text = file.read()
-            
-            original_name = os.path.basename(file_path).replace('temp_', '')
-            documents = [Document(
-                page_content=text,
-                metadata={
-                    "source": original_name, 
-                    "type": "txt",
-                    "lines": text.count('\n') + 1
-                }
-            )]
-            return documents
+            return _txt_documents(text, os.path.basename(file_path))
         except Exception as e:
             st.error(f"Error loading text file: {str(e)}")
             return []
     
-    def load_csv(self, file_path: str) -> List[Document]:
+    def load_csv(self, file_path: str) -> Iterator[Document]:
         try:
-            df = pd.read_csv(file_path)
-            text = "CSV Data:\n"
-            for index, row in df.iterrows():
-                text += f"Row {index}: {dict(row)}\n"
-            
-            original_name = os.path.basename(file_path).replace('temp_', '')
-            documents = [Document(
-                page_content=text,
-                metadata={
-                    "source": original_name, 
-                    "type": "csv",
-                    "rows": len(df),
-                    "columns": len(df.columns)
-                }
-            )]
-            return documents
+            yield from iter_csv_documents(file_path, os.path.basename(file_path))
         except Exception as e:
             st.error(f"Error loading CSV: {str(e)}")
-            return []
     
-    def process_uploaded_file(self, uploaded_file) -> List[Document]:
-        # Create unique temp file name
-        unique_id = str(uuid.uuid4())[:8]
-        file_path = f"temp_{unique_id}_{uploaded_file.name}"
-        
+    def process_uploaded_file(self, uploaded_file) -> Iterator[Document]:
+        # Parse lazily from the upload buffer; nothing is written to disk
         try:
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
-            # Load based on file type
-            if uploaded_file.name.endswith('.pdf'):
-                documents = self.load_pdf(file_path)
-            elif uploaded_file.name.endswith('.txt'):
-                documents = self.load_txt(file_path)
-            elif uploaded_file.name.endswith('.csv'):
-                documents = self.load_csv(file_path)
-            else:
-                st.error(f"Unsupported file type: {uploaded_file.name}")
-                documents = []
-            
-            return documents
-            
+            yield from iter_file_bytes(uploaded_file.name, uploaded_file.getvalue(),
+                                       pdf_workers=Config.PDF_PAGE_WORKERS)
         except Exception as e:
             st.error(f"Error processing file: {str(e)}")
-            return []
-        finally:
-            # Always clean up temp file
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except:
-                pass
+    
+    def iter_uploaded_files(self, uploaded_files: list, max_workers: int = None):
+        """Parse uploads concurrently, yielding (file name, documents) as each one finishes.
+
+        Parsing runs in the shared process pool (see iter_parsed_files) so large
+        batches don't hold the Streamlit script thread, and callers can index
+        early files while later ones are still being parsed. With a single
+        worker nothing is parsed up front: each file's documents are an
+        iterator consumed by indexing.
+        """
+        if min(max_workers or Config.PARSE_WORKERS, len(uploaded_files)) <= 1:
+            for uploaded_file in uploaded_files:
+                yield uploaded_file.name, self.process_uploaded_file(uploaded_file)
+            return
+        
+        for uploaded_file, documents, error in iter_parsed_files(uploaded_files, max_workers):
+            if error is not None:
+                st.error(f"Error processing {uploaded_file.name}: {str(error)}")
+                documents = []
+            yield uploaded_file.name, documents
     
     def split_documents(self, documents: List[Document]) -> List[Document]:
-        return self.text_splitter.split_documents(documents)
\ No newline at end of file
+        with span("split_documents"):
+            return self.text_splitter.split_documents(documents)
+    
+    def iter_split(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Chunks of documents, splitting each document only as the chunks are consumed"""
+        for document in documents:
+            yield from self.split_documents([document])
\ No newline at end of file
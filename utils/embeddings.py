@@ -0,0 +1,141 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List
+
+import numpy as np
+from config import Config
+from utils.cache import query_embedding_cache
+from utils.metrics import span
+
+
+class EmbeddingCache:
+    """Persistent embedding store keyed by (model, text hash)"""
+
+    # SQLite limits the number of bound parameters per statement
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, text_hash))"
+            )
+            self._conn.commit()
+
+    def get_many(self, model: str, text_hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(text_hashes), self._LOOKUP_BATCH):
+                batch = text_hashes[start:start + self._LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                )
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, text_hash, np.asarray(vector, dtype=np.float32).tobytes())
+                 for text_hash, vector in vectors.items()]
+            )
+            self._conn.commit()
+
+
+class EmbeddingEngine:
+    """Local sentence-transformers embeddings with batching and a disk cache.
+
+    Instances are also valid Chroma embedding functions. The model is loaded on
+    first use so constructing the engine stays cheap.
+    """
+
+    def __init__(self, model_name: str = None, batch_size: int = None, num_threads: int = None,
+                 device: str = None, cache_path: str = None):
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
+        self.num_threads = num_threads or Config.EMBEDDING_THREADS
+        self.device = device or Config.EMBEDDING_DEVICE
+        self.cache = EmbeddingCache(cache_path or Config.EMBEDDING_CACHE_PATH)
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    if self.num_threads:
+                        import torch
+                        torch.set_num_threads(self.num_threads)
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, encoding only those missing from the cache"""
+        with span("embed_documents"):
+            return self._embed_documents(texts)
+
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [self.text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, list(dict.fromkeys(hashes)))
+
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+        if missing:
+            encoded = dict(zip(missing, self._encode(list(missing.values()))))
+            self.cache.put_many(self.model_name, encoded)
+            vectors.update(encoded)
+
+        return [vectors[text_hash].tolist() for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed search queries, encoding the uncached ones in one batch.
+
+        Queries only go through the in-memory LRU; the disk cache is meant for document chunks.
+        """
+        keys = [(self.model_name, text.strip()) for text in texts]
+        vectors = [query_embedding_cache.get(key) for key in keys]
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            with span("embed_query"):
+                encoded = self._encode([text for _, text in missing])
+            encoded = {key: vector.tolist() for key, vector in zip(missing, encoded)}
+            for key, vector in encoded.items():
+                query_embedding_cache.set(key, vector)
+            vectors = [vector if vector is not None else encoded[key] for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.embed_documents(list(input))
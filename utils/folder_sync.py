@@ -0,0 +1,341 @@
+"""Incremental ingestion of folder trees (Config.UPLOAD_FOLDER, mounted shares).
+
+    python -m utils.folder_sync                        # Config.SYNC_ROOTS into the shared collection
+    python -m utils.folder_sync /mnt/share/hr --department HR
+    python -m utils.folder_sync --dry-run
+
+A manifest (SQLite, Config.SYNC_MANIFEST_PATH) records each file's size,
+mtime, content hash and chunk ids. A run stats every file but reads only
+those whose size or mtime changed, and re-ingests only those whose content
+hash changed: new chunks are added, chunks of the old version that the new
+one lacks are deleted, and files gone from disk have their chunks removed.
+Changed files are parsed in a process pool and written in groups of
+Config.SYNC_BATCH_FILES, so the collection version is bumped once per
+group. The manifest is updated after each group is
+written, so an interrupted run is finished by the next one.
+
+A root that is missing (an unmounted share) or a directory that can't be
+listed never counts as deleted.
+
+The manifest also records the chunker settings each run left behind. If
+they differ at the next run, every file counts as changed and is parsed
+again; chunks that are still stored are skipped rather than re-embedded.
+Other writes to the collection (uploads, API ingests) don't affect synced
+files. Clearing or rebuilding a collection drops its manifest entries (see
+VectorStoreManager), so every file is then new.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+from utils.document_loader import chunk_limits, parse_file_bytes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    collection TEXT NOT NULL,
+    path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    chunk_ids TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (collection, path)
+);
+CREATE TABLE IF NOT EXISTS collection_settings (
+    collection TEXT PRIMARY KEY,
+    settings TEXT NOT NULL
+);
+-- Held the collection version too, which every unrelated write changes
+DROP TABLE IF EXISTS collections;
+"""
+
+
+def chunker_settings() -> str:
+    """Everything that decides how a file is cut into chunks, as a comparable string"""
+    return json.dumps({"chunker": Config.CHUNKER, "limits": chunk_limits(),
+                       "pdf_pages_per_document": Config.PDF_PAGES_PER_DOCUMENT}, sort_keys=True)
+
+
+class SyncManifest:
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or Config.SYNC_MANIFEST_PATH
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def entries(self, collection: str) -> Dict[str, Tuple[int, int, str]]:
+        """path -> (size, mtime_ns, content hash); chunk ids are loaded only when needed"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, content_hash FROM files WHERE collection = ?", (collection,)
+            ).fetchall()
+        return {path: (size, mtime_ns, content_hash) for path, size, mtime_ns, content_hash in rows}
+
+    def chunk_ids(self, collection: str, path: str) -> List[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT chunk_ids FROM files WHERE collection = ? AND path = ?",
+                                     (collection, path)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def upsert(self, collection: str, rows: List[Dict]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (collection, path, source, size, mtime_ns, content_hash, chunk_ids, "
+                "synced_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(collection, row["path"], row["source"], row["size"], row["mtime_ns"], row["content_hash"],
+                  json.dumps(row["chunk_ids"]), time.time()) for row in rows]
+            )
+            self._conn.commit()
+
+    def settings(self, collection: str) -> Optional[str]:
+        """Chunker settings recorded by the last completed run"""
+        with self._lock:
+            row = self._conn.execute("SELECT settings FROM collection_settings WHERE collection = ?",
+                                     (collection,)).fetchone()
+        return row[0] if row else None
+
+    def set_settings(self, collection: str, settings: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO collection_settings (collection, settings) VALUES (?, ?)",
+                               (collection, settings))
+            self._conn.commit()
+
+    def clear(self, collection: str):
+        """Forget every file synced into the collection"""
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE collection = ?", (collection,))
+            self._conn.execute("DELETE FROM collection_settings WHERE collection = ?", (collection,))
+            self._conn.commit()
+
+    def remove(self, collection: str, paths: List[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM files WHERE collection = ? AND path = ?",
+                                   [(collection, path) for path in paths])
+            self._conn.commit()
+
+
+def _load_file(path: str, source: str, known_hash: str = None) -> Tuple[str, Optional[list]]:
+    """(content hash, documents) for a file; documents is None when the hash is known_hash.
+
+    Runs in the parse pool, so each file is read once for hashing and parsing.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    content_hash = hashlib.sha256(data).hexdigest()
+    if content_hash == known_hash:
+        return content_hash, None
+    return content_hash, parse_file_bytes(source, data)
+
+
+def _under(path: str, directories: List[str]) -> bool:
+    return any(path == directory or path.startswith(directory + os.sep) for directory in directories)
+
+
+class FolderSync:
+    def __init__(self, roots: List[str] = None, collection_name: str = None, manifest: SyncManifest = None,
+                 vector_manager=None, batch_files: int = None, workers: int = None):
+        self.roots = [os.path.abspath(root) for root in (roots or Config.SYNC_ROOTS)]
+        self.collection_name = collection_name or Config.SHARED_COLLECTION
+        self.manifest = manifest or SyncManifest()
+        self._vector_manager = vector_manager
+        self.batch_files = batch_files or Config.SYNC_BATCH_FILES
+        self.workers = workers or Config.PARSE_WORKERS
+        # Roots and directories whose listing failed; files under them are never treated as deleted
+        self.unreadable: List[str] = []
+
+    @property
+    def vector_manager(self):
+        if self._vector_manager is None:
+            from utils.resources import get_vector_manager
+            self._vector_manager = get_vector_manager()
+        return self._vector_manager
+
+    @staticmethod
+    def source_name(root: str, path: str) -> str:
+        """Citation name: the path below the root, prefixed with the root's folder name"""
+        relative = os.path.relpath(path, root).replace(os.sep, "/")
+        return f"{os.path.basename(root)}/{relative}"
+
+    def iter_files(self) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """(path, source name, stat) of every supported file under the roots"""
+        for root in self.roots:
+            if not os.path.isdir(root):
+                print(f"Skipping missing sync root: {root}")
+                self.unreadable.append(root)
+                continue
+
+            def on_error(error: OSError):
+                print(f"Cannot list {error.filename}: {error.strerror}")
+                self.unreadable.append(os.path.abspath(error.filename))
+
+            for directory, subdirectories, files in os.walk(root, onerror=on_error):
+                subdirectories[:] = [name for name in subdirectories if not name.startswith(".")]
+                for name in files:
+                    extension = os.path.splitext(name)[1].lower().lstrip(".")
+                    if name.startswith((".", "~$")) or extension not in Config.ALLOWED_EXTENSIONS:
+                        continue
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        # Removed between listing and stat
+                        continue
+                    yield path, self.source_name(root, path), stat
+
+    def plan(self) -> Dict:
+        """Compare the roots with the manifest without reading any file contents.
+
+        Returns "candidates" (new files and files whose size or mtime changed,
+        as dicts with path, source, size, mtime_ns, known_hash, reparse),
+        "deleted" (manifest paths no longer on disk), "stale" (the chunker
+        settings changed since the last run, so every file is a candidate to
+        be parsed again) and the "scanned"/"unchanged" counts.
+        """
+        self.unreadable = []
+        known = self.manifest.entries(self.collection_name)
+        stale = bool(known) and self.manifest.settings(self.collection_name) != chunker_settings()
+        seen = set()
+        candidates = []
+        unchanged = 0
+        for path, source, stat in self.iter_files():
+            seen.add(path)
+            entry = known.get(path)
+            if not stale and entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                unchanged += 1
+                continue
+            candidates.append({"path": path, "source": source, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                               "known_hash": entry[2] if entry is not None else None, "reparse": stale})
+        deleted = [path for path in known
+                   if path not in seen and _under(path, self.roots) and not _under(path, self.unreadable)]
+        return {"candidates": candidates, "deleted": deleted, "stale": stale, "scanned": len(seen),
+                "unchanged": unchanged}
+
+    def _parsed_groups(self, pool: ProcessPoolExecutor, candidates: List[Dict]) -> Iterator[List[Tuple]]:
+        """Groups of (candidate, content hash, documents, error); the next group parses while one is written"""
+        def collect(futures):
+            results = []
+            for candidate, future in futures:
+                try:
+                    content_hash, documents = future.result()
+                    results.append((candidate, content_hash, documents, None))
+                except Exception as e:
+                    results.append((candidate, None, None, str(e) or e.__class__.__name__))
+            return results
+
+        pending = None
+        for start in range(0, len(candidates), self.batch_files):
+            futures = [(candidate, pool.submit(_load_file, candidate["path"], candidate["source"],
+                                               None if candidate["reparse"] else candidate["known_hash"]))
+                       for candidate in candidates[start:start + self.batch_files]]
+            if pending is not None:
+                yield collect(pending)
+            pending = futures
+        if pending is not None:
+            yield collect(pending)
+
+    def _write_group(self, results: List[Tuple], stats: Dict):
+        from utils.resources import get_document_processor
+        from utils.vector_store import VectorStoreManager
+        processor = get_document_processor()
+
+        split_docs = []
+        delete_ids = []
+        rows = []
+        for candidate, content_hash, documents, error in results:
+            if error is not None:
+                # Left out of the manifest, so the next run retries it
+                print(f"Failed to sync {candidate['path']}: {error}")
+                stats["failed"] += 1
+                continue
+            old_ids = self.manifest.chunk_ids(self.collection_name, candidate["path"]) \
+                if candidate["known_hash"] is not None else []
+            row = {key: candidate[key] for key in ("path", "source", "size", "mtime_ns")}
+            row["content_hash"] = content_hash
+            if documents is None:
+                # Touched but identical content: only the stat changed
+                row["chunk_ids"] = old_ids
+                stats["touched"] += 1
+            else:
+                chunks = processor.split_documents(documents)
+                row["chunk_ids"] = list(dict.fromkeys(VectorStoreManager.chunk_id(chunk) for chunk in chunks))
+                current = set(row["chunk_ids"])
+                delete_ids.extend(chunk_id for chunk_id in old_ids if chunk_id not in current)
+                split_docs.extend(chunks)
+                stats["changed" if candidate["known_hash"] is not None else "new"] += 1
+            rows.append(row)
+
+        if split_docs or delete_ids:
+            result = self.vector_manager.replace_chunks(split_docs, delete_ids, self.collection_name)
+            stats["chunks_added"] += result["added"]
+            stats["chunks_deleted"] += result["deleted"]
+        self.manifest.upsert(self.collection_name, rows)
+
+    def run(self, dry_run: bool = False) -> Dict:
+        """Sync the roots into the collection; returns counts of what was done (or would be, for dry_run)"""
+        started = time.perf_counter()
+        plan = self.plan()
+        stats = {"scanned": plan["scanned"], "unchanged": plan["unchanged"], "new": 0, "changed": 0,
+                 "touched": 0, "deleted": len(plan["deleted"]), "failed": 0, "chunks_added": 0, "chunks_deleted": 0,
+                 "stale": plan["stale"]}
+        if dry_run:
+            stats["to_check"] = len(plan["candidates"])
+            stats["seconds"] = round(time.perf_counter() - started, 2)
+            return stats
+
+        if plan["candidates"]:
+            with ProcessPoolExecutor(max_workers=max(1, self.workers),
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                for results in self._parsed_groups(pool, plan["candidates"]):
+                    self._write_group(results, stats)
+                    print(f"Synced {stats['new'] + stats['changed'] + stats['touched'] + stats['failed']}"
+                          f"/{len(plan['candidates'])} changed files")
+
+        for start in range(0, len(plan["deleted"]), self.batch_files):
+            paths = plan["deleted"][start:start + self.batch_files]
+            delete_ids = [chunk_id for path in paths for chunk_id in self.manifest.chunk_ids(self.collection_name, path)]
+            stats["chunks_deleted"] += self.vector_manager.delete_chunks(delete_ids, self.collection_name)
+            self.manifest.remove(self.collection_name, paths)
+
+        self.manifest.set_settings(self.collection_name, chunker_settings())
+        stats["seconds"] = round(time.perf_counter() - started, 2)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync folders into the knowledge base")
+    parser.add_argument("roots", nargs="*", help="folders to sync (default Config.SYNC_ROOTS)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--collection", help="collection to sync into (default the shared one)")
+    target.add_argument("--department", help="sync into this department's partition")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without reading files")
+    parser.add_argument("--workers", type=int, help="parse processes (default Config.PARSE_WORKERS)")
+    parser.add_argument("--batch-files", type=int, help="files per index write (default Config.SYNC_BATCH_FILES)")
+    parser.add_argument("--manifest", help="manifest database (default Config.SYNC_MANIFEST_PATH)")
+    args = parser.parse_args()
+
+    collection_name = args.collection
+    if args.department:
+        from utils.vector_store import VectorStoreManager
+        collection_name = VectorStoreManager.partition_name(args.department)
+    sync = FolderSync(args.roots or None, collection_name, SyncManifest(args.manifest),
+                      batch_files=args.batch_files, workers=args.workers)
+    stats = sync.run(dry_run=args.dry_run)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Persistent background ingestion.
+
+Uploads are spooled to disk and recorded as jobs in a SQLite database; a pool
+of worker threads parses, splits and embeds them through DocumentProcessor and
+VectorStoreManager while the UI polls job progress. Running jobs heartbeat as
+they progress; one whose heartbeat is older than Config.INGEST_STALE_SECONDS
+(its worker crashed or the server restarted) is put back in the queue.
+The files of a job are parsed in the process pool shared with the upload
+path (Config.PARSE_WORKERS), so a large file is embedded while the next
+ones are still being parsed.
+
+A file that fails to parse or index is recorded on the job with its error
+and the rest of the job carries on; the job then finishes "partial", or
+"failed" if no file succeeded.
+
+Workers normally run inside the Streamlit process (Config.INGEST_RUN_IN_APP);
+they can also run standalone:
+
+    python -m utils.ingest_queue
+"""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status TEXT NOT NULL,
+    username TEXT,
+    department TEXT,
+    collection TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    files_total INTEGER NOT NULL,
+    files_parsed INTEGER NOT NULL DEFAULT 0,
+    chunks_total INTEGER NOT NULL DEFAULT 0,
+    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+    files_failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_user ON jobs (username, id);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS job_files_job ON job_files (job_id);
+"""
+
+# Columns added after the first release: (table, column, definition)
+MIGRATIONS = [
+    ("jobs", "files_failed", "INTEGER NOT NULL DEFAULT 0"),
+    ("job_files", "error", "TEXT"),
+]
+
+
+class SpooledFile:
+    """A queued upload: its original name and the spool path holding its bytes"""
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+
+    def getvalue(self) -> bytes:
+        with open(self.path, "rb") as file:
+            return file.read()
+
+
+class IngestQueue:
+    def __init__(self, db_path: str = None, spool_dir: str = None):
+        self.db_path = db_path or Config.INGEST_QUEUE_PATH
+        self.spool_dir = spool_dir or Config.INGEST_SPOOL_DIR
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            for table, column, definition in MIGRATIONS:
+                columns = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def enqueue(self, files: List[Tuple[str, bytes]], username: str = None, department: str = None,
+                collection_name: str = "company_docs") -> int:
+        """Spool (name, bytes) pairs to disk and queue them as one job"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (status, username, department, collection, created_at, files_total) "
+                    "VALUES ('spooling', ?, ?, ?, ?, ?)",
+                    (username, department, collection_name, time.time(), len(files))
+                )
+                job_id = cursor.lastrowid
+                job_dir = os.path.join(self.spool_dir, str(job_id))
+                os.makedirs(job_dir, exist_ok=True)
+                for position, (name, data) in enumerate(files):
+                    path = os.path.join(job_dir, f"{position:05d}_{os.path.basename(name)}")
+                    with open(path, "wb") as file:
+                        file.write(data)
+                    self._conn.execute("INSERT INTO job_files (job_id, name, path) VALUES (?, ?, ?)",
+                                       (job_id, name, path))
+                self._conn.execute("UPDATE jobs SET status = 'queued' WHERE id = ?", (job_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim_next(self) -> Optional[Dict]:
+        """Atomically move the oldest queued job to running"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            now = time.time()
+            self._conn.execute("UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? WHERE id = ?",
+                               (now, now, row["id"]))
+            self._conn.execute("COMMIT")
+        return dict(row)
+
+    def job_files(self, job_id: int) -> List[SpooledFile]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name, path FROM job_files WHERE job_id = ?", (job_id,)).fetchall()
+        return [SpooledFile(row["name"], row["path"]) for row in rows]
+
+    def update_progress(self, job_id: int, **fields):
+        fields["heartbeat_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def record_failure(self, job_id: int, path: str, error: str):
+        """Mark one of the job's files as failed with its error"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("UPDATE job_files SET error = ? WHERE job_id = ? AND path = ?", (error, job_id, path))
+            self._conn.execute("UPDATE jobs SET files_failed = files_failed + 1, heartbeat_at = ? WHERE id = ?",
+                               (time.time(), job_id))
+            self._conn.execute("COMMIT")
+
+    def failed_files(self, job_id: int) -> List[Tuple[str, str]]:
+        """(file name, error) of the job's files that failed"""
+        with self._lock:
+            rows = self._conn.execute("SELECT name, error FROM job_files WHERE job_id = ? AND error IS NOT NULL",
+                                      (job_id,)).fetchall()
+        return [(row["name"], row["error"]) for row in rows]
+
+    def finish(self, job_id: int, error: str = None):
+        """Close the job: "failed" with error, else "done", "partial" or "failed" by how many files failed"""
+        with self._lock:
+            row = self._conn.execute("SELECT files_total, files_failed FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            status = "failed" if error is not None else "done"
+            if error is None and row is not None and row["files_failed"]:
+                if row["files_failed"] < row["files_total"]:
+                    status = "partial"
+                else:
+                    status, error = "failed", "No file could be processed"
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                (status, time.time(), error, job_id)
+            )
+        shutil.rmtree(os.path.join(self.spool_dir, str(job_id)), ignore_errors=True)
+
+    def requeue_stale(self, stale_seconds: float = None) -> int:
+        """Queue again running jobs whose worker stopped heartbeating"""
+        cutoff = time.time() - (stale_seconds if stale_seconds is not None else Config.INGEST_STALE_SECONDS)
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, heartbeat_at = NULL, files_parsed = 0, "
+                "chunks_total = 0, chunks_embedded = 0, files_failed = 0 WHERE status = 'running' AND heartbeat_at < ?",
+                (cutoff,)
+            )
+            if cursor.rowcount:
+                self._conn.execute("UPDATE job_files SET error = NULL WHERE job_id IN "
+                                   "(SELECT id FROM jobs WHERE status = 'queued')")
+        return cursor.rowcount
+
+    @staticmethod
+    def _with_rate(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["chunks_per_second"] = 0.0
+        if job["started_at"]:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+            if elapsed > 0:
+                job["chunks_per_second"] = job["chunks_embedded"] / elapsed
+        return job
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._with_rate(row) if row is not None else None
+
+    def list_jobs(self, username: str = None, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            if username is None:
+                rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = self._conn.execute("SELECT * FROM jobs WHERE username = ? ORDER BY id DESC LIMIT ?",
+                                          (username, limit)).fetchall()
+        return [self._with_rate(row) for row in rows]
+
+
+class IngestWorkerPool:
+    """Threads that drain the queue through DocumentProcessor and VectorStoreManager"""
+    def __init__(self, queue: IngestQueue, workers: int = None, poll_interval: float = None):
+        self.queue = queue
+        self.workers = workers or Config.INGEST_WORKERS
+        self.poll_interval = poll_interval or Config.INGEST_POLL_SECONDS
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingest-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.queue.requeue_stale()
+            job = self.queue.claim_next()
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                self.process(job)
+                self.queue.finish(job["id"])
+            except Exception as e:
+                self.queue.finish(job["id"], error=str(e) or e.__class__.__name__)
+
+    def process(self, job: Dict):
+        from utils.document_loader import iter_parsed_files
+        from utils.resources import get_vector_manager
+        vector_manager = get_vector_manager()
+        job_id = job["id"]
+
+        files_parsed = 0
+        chunks_total = 0
+        chunks_embedded = 0
+        # Several files are parsed in the shared process pool while earlier ones
+        # are embedded; a single file streams its pages and rows into embedding
+        for spooled, documents, error in iter_parsed_files(self.queue.job_files(job_id)):
+            def on_progress(done: int, added: int):
+                self.queue.update_progress(job_id, chunks_total=chunks_total + done,
+                                           chunks_embedded=chunks_embedded + added)
+
+            result = None
+            if error is None:
+                try:
+                    result = vector_manager.ingest_documents(documents, job["collection"],
+                                                             progress_callback=on_progress)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                self.queue.record_failure(job_id, spooled.path, f"{error.__class__.__name__}: {error}")
+            files_parsed += 1
+            if result is not None:
+                chunks_total += result["chunks"]
+                chunks_embedded += result["added"]
+            self.queue.update_progress(job_id, files_parsed=files_parsed, chunks_total=chunks_total,
+                                       chunks_embedded=chunks_embedded)
+
+
+def main():
+    from utils.resources import get_ingest_queue
+    pool = IngestWorkerPool(get_ingest_queue())
+    pool.start()
+    print(f"Ingestion workers running ({pool.workers}); queue at {pool.queue.db_path}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
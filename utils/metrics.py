@@ -0,0 +1,203 @@
+"""Timing spans and latency histograms for the ingestion and query hot paths.
+
+    with span("search_documents"):
+        ...
+
+Each stage feeds a histogram (Prometheus buckets plus a window of recent
+samples for exact percentiles). render_prometheus() produces the text
+exposition format served by the HTTP API at /metrics and written to
+Config.METRICS_FILE by the Streamlit process. With Config.METRICS_ENABLED off,
+span() returns a shared no-op context manager.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+from config import Config
+
+# Seconds; covers cache hits (sub-millisecond) through slow LLM calls
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RECENT_SAMPLES = 1024
+
+
+class Histogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+            self.count += 1
+            self.total += seconds
+            self.recent.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        with self._lock:
+            ordered = sorted(self.recent)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+_histograms: Dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(stage: str) -> Histogram:
+    found = _histograms.get(stage)
+    if found is None:
+        with _histograms_lock:
+            found = _histograms.setdefault(stage, Histogram())
+    return found
+
+
+def _stages() -> List[tuple]:
+    """(stage, histogram) pairs sorted by stage, copied under the lock so a new stage can't break iteration"""
+    with _histograms_lock:
+        stages = list(_histograms.items())
+    return sorted(stages)
+
+
+def observe(stage: str, seconds: float):
+    if Config.METRICS_ENABLED:
+        histogram(stage).observe(seconds)
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        histogram(self.stage).observe(time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str):
+    """Context manager timing the enclosed block into the stage's histogram"""
+    if not Config.METRICS_ENABLED:
+        return _NOOP_SPAN
+    return _Span(stage)
+
+
+def _cache_stats() -> Dict[str, tuple]:
+    from utils import cache
+    return {
+        "query_embedding": (cache.query_embedding_cache.hits, cache.query_embedding_cache.misses),
+        "retrieval": (cache.retrieval_cache.hits, cache.retrieval_cache.misses),
+        "answer": (cache.answer_cache.hits, cache.answer_cache.misses),
+        "semantic_answer": (cache.semantic_answer_cache.hits, cache.semantic_answer_cache.misses),
+        "rerank_score": (cache.rerank_score_cache.hits, cache.rerank_score_cache.misses),
+    }
+
+
+def stage_summary() -> List[Dict]:
+    """Per-stage count, mean and p50/p95 over recent samples, for the admin panel"""
+    rows = []
+    for stage, found in _stages():
+        with found._lock:
+            count, total = found.count, found.total
+        rows.append({
+            "stage": stage,
+            "count": count,
+            "mean_ms": round(total / count * 1000, 2) if count else 0.0,
+            "p50_ms": round(found.percentile(0.50) * 1000, 2),
+            "p95_ms": round(found.percentile(0.95) * 1000, 2),
+        })
+    return rows
+
+
+def cache_summary() -> List[Dict]:
+    rows = []
+    for name, (hits, misses) in _cache_stats().items():
+        lookups = hits + misses
+        rows.append({"cache": name, "hits": hits, "misses": misses,
+                     "hit_rate": round(hits / lookups, 3) if lookups else 0.0})
+    return rows
+
+
+def render_prometheus() -> str:
+    lines = [
+        "# HELP ckb_stage_seconds Time spent per pipeline stage.",
+        "# TYPE ckb_stage_seconds histogram",
+    ]
+    for stage, found in _stages():
+        with found._lock:
+            counts, count, total = list(found.bucket_counts), found.count, found.total
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, counts):
+            cumulative += bucket_count
+            lines.append(f'ckb_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'ckb_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'ckb_stage_seconds_sum{{stage="{stage}"}} {total}')
+        lines.append(f'ckb_stage_seconds_count{{stage="{stage}"}} {count}')
+
+    lines.append("# HELP ckb_cache_requests_total Cache lookups by result.")
+    lines.append("# TYPE ckb_cache_requests_total counter")
+    for name, (hits, misses) in _cache_stats().items():
+        lines.append(f'ckb_cache_requests_total{{cache="{name}",result="hit"}} {hits}')
+        lines.append(f'ckb_cache_requests_total{{cache="{name}",result="miss"}} {misses}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: str = None):
+    """Write the exposition text atomically, for node_exporter's textfile collector"""
+    path = path or Config.METRICS_FILE
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write(render_prometheus())
+    os.replace(temporary, path)
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def start_file_exporter(path: str = None, interval: float = None):
+    """Rewrite the metrics file every interval seconds from a daemon thread (once per process)"""
+    global _exporter_started
+    if not Config.METRICS_ENABLED or not (path or Config.METRICS_FILE):
+        return
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    interval = interval or Config.METRICS_FILE_INTERVAL
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                write_metrics_file(path)
+            except OSError as e:
+                print(f"Could not write metrics file: {e}")
+
+    threading.Thread(target=run, name="metrics-exporter", daemon=True).start()
@@ -0,0 +1,186 @@
+"""Compact int8 vector index with exact re-ranking.
+
+Each embedding is stored twice, in append-only files next to the Chroma data:
+an int8 code row with a per-vector scale (a quarter of the float32 size),
+which is the only part held in memory, and the float32 vector, which is
+memory-mapped and read back only for the few candidates being re-ranked.
+Queries scan the codes in blocks, keep the best n * rerank_factor candidates
+and re-score those exactly.
+
+Files for prefix <collection>.int8: .ids (one id per line), .codes, .scales
+and .vectors (raw little-endian rows).
+"""
+import os
+import threading
+from typing import List, Tuple
+
+import numpy as np
+
+from config import Config
+
+SCAN_BLOCK_ROWS = 16384
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization: vector ~= codes * scale"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedIndex:
+    def __init__(self, prefix: str, dimensions: int = None):
+        self.prefix = prefix
+        self.dimensions = dimensions
+        self.ids: List[str] = []
+        self._known = set()
+        self.codes = np.zeros((0, dimensions or 0), dtype=np.int8)
+        self.scales = np.zeros(0, dtype=np.float32)
+        # Appended (codes, scales) blocks, concatenated on the next search
+        self._appended = []
+        self._vectors = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _path(self, suffix: str) -> str:
+        return f"{self.prefix}.{suffix}"
+
+    @classmethod
+    def load(cls, prefix: str) -> "QuantizedIndex":
+        index = cls(prefix)
+        try:
+            with open(index._path("ids"), "r", encoding="utf-8") as file:
+                ids = file.read().split()
+            scales = np.fromfile(index._path("scales"), dtype=np.float32)
+            codes = np.fromfile(index._path("codes"), dtype=np.int8)
+            vector_bytes = os.path.getsize(index._path("vectors"))
+        except OSError:
+            return index
+        if not ids or not len(scales):
+            return index
+        index.dimensions = len(codes) // len(scales)
+        # An interrupted append leaves some files a row ahead; keep the rows present in all of them
+        rows = min(len(ids), len(scales), len(codes) // index.dimensions,
+                   vector_bytes // (4 * index.dimensions))
+        index.ids = ids[:rows]
+        index._known = set(index.ids)
+        index.scales = scales[:rows]
+        index.codes = codes[:rows * index.dimensions].reshape(rows, index.dimensions)
+        return index
+
+    def _exact_vectors(self) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) < len(self.ids):
+            self._vectors = np.memmap(self._path("vectors"), dtype=np.float32, mode="r",
+                                      shape=(len(self.ids), self.dimensions))
+        return self._vectors
+
+    def add(self, ids: List[str], vectors: List[List[float]]):
+        """Append vectors and persist them immediately; ids already indexed are skipped"""
+        with self._lock:
+            fresh = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._known]
+            if not fresh:
+                return
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if len(fresh) < len(ids):
+                ids, vectors = [ids[i] for i in fresh], vectors[fresh]
+            self._append(ids, vectors)
+
+    def _append(self, ids: List[str], vectors: np.ndarray):
+        if self.dimensions is None or not len(self.ids):
+            self.dimensions = vectors.shape[1]
+            self.codes = np.zeros((0, self.dimensions), dtype=np.int8)
+        codes, scales = quantize(vectors)
+        directory = os.path.dirname(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self._path("vectors"), "ab") as file:
+            vectors.tofile(file)
+        with open(self._path("codes"), "ab") as file:
+            codes.tofile(file)
+        with open(self._path("scales"), "ab") as file:
+            scales.tofile(file)
+        # ids last: a row only counts once its id is written
+        with open(self._path("ids"), "a", encoding="utf-8") as file:
+            file.write("".join(f"{chunk_id}\n" for chunk_id in ids))
+        self.ids.extend(ids)
+        self._known.update(ids)
+        self._appended.append((codes, scales))
+        self._vectors = None
+
+    def _consolidate(self):
+        if self._appended:
+            self.codes = np.concatenate([self.codes] + [codes for codes, _ in self._appended])
+            self.scales = np.concatenate([self.scales] + [scales for _, scales in self._appended])
+            self._appended = []
+
+    def remove(self, ids: List[str]):
+        """Drop vectors by id, rewriting the files"""
+        doomed = set(ids)
+        with self._lock:
+            keep = np.array([chunk_id not in doomed for chunk_id in self.ids], dtype=bool)
+            if keep.all():
+                return
+            kept_ids = [chunk_id for chunk_id, kept in zip(self.ids, keep) if kept]
+            vectors = np.array(self._exact_vectors()[keep])
+            self.clear()
+            if kept_ids:
+                self._append(kept_ids, vectors)
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            for suffix in ("ids", "codes", "scales", "vectors"):
+                try:
+                    os.remove(self._path(suffix))
+                except OSError:
+                    pass
+            self.ids = []
+            self._known = set()
+            self.codes = np.zeros((0, self.dimensions or 0), dtype=np.int8)
+            self.scales = np.zeros(0, dtype=np.float32)
+            self._appended = []
+
+    def search(self, query: List[float], n: int, rerank_factor: int = None) -> List[Tuple[float, str]]:
+        """[(cosine distance, id)] of the n nearest vectors, closest first (vectors are unit-normalized)"""
+        return self.search_many([query], n, rerank_factor)[0]
+
+    def search_many(self, queries: List[List[float]], n: int,
+                    rerank_factor: int = None) -> List[List[Tuple[float, str]]]:
+        """search() for several queries with a single scan over the codes"""
+        if not self.ids or n <= 0:
+            return [[] for _ in queries]
+        rerank_factor = rerank_factor or Config.QUANTIZED_RERANK_FACTOR
+        with self._lock:
+            self._consolidate()
+            # add() only appends, so rows below len(scales) stay valid after the lock is released
+            ids, codes, scales = self.ids, self.codes, self.scales
+            vectors = self._exact_vectors()
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(queries), -1)
+        rows_total = len(scales)
+        candidates = min(rows_total, n * rerank_factor)
+
+        approximate = np.empty((rows_total, len(queries)), dtype=np.float32)
+        for start in range(0, rows_total, SCAN_BLOCK_ROWS):
+            block = codes[start:start + SCAN_BLOCK_ROWS]
+            approximate[start:start + len(block)] = (block.astype(np.float32) @ queries.T) \
+                * scales[start:start + len(block), None]
+
+        results = []
+        for column, query in enumerate(queries):
+            if candidates < rows_total:
+                rows = np.argpartition(-approximate[:, column], candidates - 1)[:candidates]
+            else:
+                rows = np.arange(rows_total)
+            rows.sort()  # sequential reads from the memory map
+            exact = np.asarray(vectors[rows]) @ query
+            order = np.argsort(-exact)[:n]
+            results.append([(float(1.0 - exact[i]), ids[rows[i]]) for i in order])
+        return results
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            self._consolidate()
+        return self.codes.nbytes + self.scales.nbytes
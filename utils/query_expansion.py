@@ -0,0 +1,52 @@
+"""Rule-based query rewrites for multi-query retrieval.
+
+Company documents rarely use the words people ask with ("PTO" vs "paid time
+off", "WFH" vs "remote work"). Each rewrite swaps one term for a synonym; the
+rewrites are searched together with the original query in one batch (see
+VectorStoreManager.search_batch) and the rankings fused, so a chunk phrased
+either way is found. Rewrites cost no LLM call.
+"""
+import re
+from typing import Dict, List
+
+from config import Config
+
+SYNONYMS: Dict[str, List[str]] = {
+    "pto": ["paid time off", "vacation"],
+    "vacation": ["annual leave", "paid time off"],
+    "holiday": ["vacation", "time off"],
+    "time off": ["leave", "vacation"],
+    "sick": ["medical leave"],
+    "wfh": ["work from home", "remote work"],
+    "work from home": ["remote work"],
+    "remote": ["work from home"],
+    "salary": ["compensation", "pay"],
+    "pay": ["salary", "compensation"],
+    "bonus": ["incentive"],
+    "expenses": ["reimbursement"],
+    "expense": ["reimbursement"],
+    "reimbursement": ["expense claim"],
+    "laptop": ["computer", "equipment"],
+    "onboarding": ["new hire orientation"],
+    "manager": ["supervisor"],
+    "fired": ["termination"],
+    "quit": ["resignation"],
+}
+
+
+def expand_query(query: str, max_rewrites: int = None) -> List[str]:
+    """Up to max_rewrites rewrites of query (not including query itself)"""
+    max_rewrites = Config.QUERY_EXPANSION_MAX if max_rewrites is None else max_rewrites
+    text = " ".join(query.lower().split())
+    synonyms = {**SYNONYMS, **Config.QUERY_SYNONYMS}
+    rewrites = []
+    # Longer phrases first, so "work from home" is preferred over "home"
+    for term in sorted(synonyms, key=len, reverse=True):
+        pattern = re.compile(rf"\b{re.escape(term)}\b")
+        if not pattern.search(text):
+            continue
+        for replacement in synonyms[term]:
+            rewrite = pattern.sub(replacement, text, count=1)
+            if rewrite != text and rewrite not in rewrites:
+                rewrites.append(rewrite)
+    return rewrites[:max_rewrites]
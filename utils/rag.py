@@ -0,0 +1,235 @@
+import time
+import streamlit as st
+from config import Config
+from utils.auth import AuditLogger
+from utils.cache import answer_cache, normalize_query, semantic_answer_cache
+from utils.context import pack_context
+from utils.metrics import observe, span
+from utils.document_loader import format_citation
+from utils.resources import get_groq_client, get_vector_manager
+
+
+class ResponseStream:
+    """Iterable of answer fragments; timing is filled in as it is consumed"""
+    def __init__(self, sources: list):
+        self.sources = sources
+        self.time_to_first_token = None
+        self.fragments = iter(())
+    
+    def __iter__(self):
+        return self.fragments
+
+
+class RAGSystem:
+    """Prompt assembly and answer generation over retrieved chunks.
+
+    Holds no per-request state, so one instance is shared by every session.
+    """
+    def __init__(self, client=None):
+        self._client = client
+    
+    @property
+    def client(self):
+        # Resolved on first use (and retried after a failure) so a missing API key
+        # doesn't stick to the shared instance
+        if self._client is None:
+            try:
+                self._client = get_groq_client()
+            except Exception as e:
+                st.error(f"Failed to initialize Groq client: {e}")
+        return self._client
+    
+    def _log(self, query: str, response: str, sources: list, user: dict = None):
+        # user is passed by callers without a Streamlit session (the HTTP API)
+        if user is not None:
+            AuditLogger.log_query(user["username"], query, response, sources, department=user.get("department"))
+        elif st.session_state.get("authenticated", False):
+            AuditLogger.log_query(
+                st.session_state["username"],
+                query,
+                response,
+                sources
+            )
+    
+    def _build_messages(self, query: str, context_docs: list) -> list:
+        # context_docs are already packed (see pack_context)
+        context = "\n\n".join([doc.page_content for doc in context_docs])
+        
+        prompt = f"""Based on the following company documents, please answer the user's question. 
+        If the information is not in the provided context, say you don't know.
+
+        Company Documents Context:
+        {context}
+
+        User Question: {query}
+
+        Please provide a helpful answer with citations from the source documents:"""
+        
+        return [
+            {
+                "role": "system",
+                "content": "You are a helpful company knowledge assistant. Provide accurate answers based on the given documents."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    def _cache_key(self, query: str, k: int, cache_version: str):
+        if cache_version is None:
+            return None
+        return (normalize_query(query), k, cache_version)
+    
+    @staticmethod
+    def _widen(context_docs: list) -> list:
+        """Retrieved chunks with Config.CONTEXT_NEIGHBORS neighbours either side stitched on"""
+        if not Config.CONTEXT_NEIGHBORS:
+            return context_docs
+        return get_vector_manager().expand_neighbors(context_docs)
+    
+    @staticmethod
+    def _query_vector(query: str) -> list:
+        # Same embedding (and query embedding cache entry) the retrieval uses
+        return get_vector_manager().embedder.embed_query(query)
+    
+    def _remember(self, query: str, k: int, cache_version: str, response: str, sources: list):
+        cache_key = self._cache_key(query, k, cache_version)
+        if cache_key is None:
+            return
+        answer_cache.set(cache_key, (response, sources))
+        if Config.SEMANTIC_CACHE_ENABLED:
+            try:
+                query_vector = self._query_vector(query)
+            except Exception:
+                # The answer is already in hand; it just won't match paraphrases
+                return
+            semantic_answer_cache.set(query_vector, (cache_version, k), (response, sources, query))
+    
+    def cached_answer(self, query: str, cache_version: str, k: int, user: dict = None):
+        """(response, sources, original query) of an earlier answer to a paraphrase of query, or None.
+
+        Checked before retrieval, so a hit skips both the search and the LLM
+        call. Only answers generated from the same collection version for a
+        request with the same k are considered.
+        """
+        if not Config.SEMANTIC_CACHE_ENABLED or cache_version is None:
+            return None
+        try:
+            query_vector = self._query_vector(query)
+        except Exception:
+            # An embedding failure is a cache miss; retrieval reports its own errors
+            return None
+        cached = semantic_answer_cache.get(query_vector, (cache_version, k))
+        if cached is not None:
+            response, sources, _ = cached
+            self._log(query, response, sources, user)
+        return cached
+    
+    def generate_response(self, query: str, context_docs: list, cache_version: str = None,
+                          user: dict = None, k: int = None) -> str:
+        """Answer query from context_docs (ranked best first; packed into the token budget).
+
+        When cache_version (the collection version stamp) is given, answers are
+        cached per normalized query and requested k (default len(context_docs))
+        until the collection changes. user (from Authentication.authenticate)
+        attributes the audit entry when there is no Streamlit session.
+        """
+        k = len(context_docs) if k is None else k
+        cache_key = self._cache_key(query, k, cache_version)
+        cached = answer_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            response, sources = cached
+            self._log(query, response, sources, user)
+            return response, sources
+        
+        if not self.client:
+            return "Error: Groq client not initialized. Check your API key.", []
+        
+        with span("prompt_assembly"):
+            packed_docs = pack_context(self._widen(context_docs))
+            messages = self._build_messages(query, packed_docs)
+        sources = list(dict.fromkeys([format_citation(doc.metadata) for doc in packed_docs]))
+        
+        try:
+            with span("llm_generate"):
+                chat_completion = self.client.chat.completions.create(
+                    messages=messages,
+                    model=Config.GROQ_MODEL,
+                    temperature=0.1,
+                    max_tokens=1024
+                )
+            
+            response = chat_completion.choices[0].message.content
+            self._remember(query, k, cache_version, response, sources)
+            
+            # Log the interaction
+            self._log(query, response, sources, user)
+            
+            return response, sources
+            
+        except Exception as e:
+            error_msg = f"Error generating response: {str(e)}"
+            return error_msg, []
+    
+    def stream_response(self, query: str, context_docs: list, cache_version: str = None,
+                        k: int = None) -> "ResponseStream":
+        """Stream the answer as text fragments while Groq generates it.
+
+        The assembled answer is cached and audit-logged once the stream is
+        exhausted; time to first token is recorded on the returned stream.
+        """
+        with span("prompt_assembly"):
+            packed_docs = pack_context(self._widen(context_docs))
+            messages = self._build_messages(query, packed_docs)
+        sources = list(dict.fromkeys([format_citation(doc.metadata) for doc in packed_docs]))
+        response_stream = ResponseStream(sources)
+        k = len(context_docs) if k is None else k
+        response_stream.fragments = self._stream_fragments(query, k, messages, cache_version, response_stream)
+        return response_stream
+    
+    def _stream_fragments(self, query: str, k: int, messages: list, cache_version: str,
+                          response_stream: "ResponseStream"):
+        started = time.perf_counter()
+        
+        cache_key = self._cache_key(query, k, cache_version)
+        cached = answer_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            response, response_stream.sources = cached
+            response_stream.time_to_first_token = time.perf_counter() - started
+            self._log(query, response, response_stream.sources)
+            yield response
+            return
+        
+        if not self.client:
+            yield "Error: Groq client not initialized. Check your API key."
+            return
+        
+        parts = []
+        try:
+            stream = self.client.chat.completions.create(
+                messages=messages,
+                model=Config.GROQ_MODEL,
+                temperature=0.1,
+                max_tokens=1024,
+                stream=True
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if not token:
+                    continue
+                if response_stream.time_to_first_token is None:
+                    response_stream.time_to_first_token = time.perf_counter() - started
+                    observe("llm_first_token", response_stream.time_to_first_token)
+                parts.append(token)
+                yield token
+        except Exception as e:
+            yield f"Error generating response: {str(e)}"
+            return
+        
+        observe("llm_stream", time.perf_counter() - started)
+        response = "".join(parts)
+        self._remember(query, k, cache_version, response, response_stream.sources)
+        self._log(query, response, response_stream.sources)
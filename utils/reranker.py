@@ -0,0 +1,84 @@
+import threading
+import time
+
+from config import Config
+from utils.cache import normalize_query, rerank_score_cache
+from utils.metrics import span
+
+
+class CrossEncoderReranker:
+    """Re-scores retrieved chunks against the query with a CPU cross-encoder.
+
+    Pairs are scored in batches and scores are cached per (query, chunk id),
+    so repeated and overlapping queries only score new chunks. If scoring
+    exceeds the time budget, or the model can't be loaded, the retrieval
+    order is kept.
+    """
+
+    def __init__(self, model_name: str = None, batch_size: int = None, time_budget: float = None,
+                 device: str = None):
+        self.model_name = model_name or Config.RERANK_MODEL
+        self.batch_size = batch_size or Config.RERANK_BATCH_SIZE
+        self.time_budget = time_budget or Config.RERANK_TIME_BUDGET
+        self.device = device or Config.EMBEDDING_DEVICE
+        self.timeouts = 0
+        self._model = None
+        self._load_failed = False
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None and not self._load_failed:
+            with self._model_lock:
+                if self._model is None and not self._load_failed:
+                    try:
+                        from sentence_transformers import CrossEncoder
+                        self._model = CrossEncoder(self.model_name, device=self.device)
+                    except Exception as e:
+                        print(f"Re-ranker unavailable, keeping retrieval order: {e}")
+                        self._load_failed = True
+        return self._model
+
+    @staticmethod
+    def _chunk_key(doc) -> str:
+        return doc.metadata.get("chunk_id") or doc.page_content
+
+    def rerank(self, query: str, docs: list, top_n: int) -> list:
+        """Best top_n of docs (which carry metadata["chunk_id"]) by cross-encoder score"""
+        if len(docs) <= 1 or self.model is None:
+            return docs[:top_n]
+        with span("rerank"):
+            return self._rerank(query, docs, top_n)
+
+    def _rerank(self, query: str, docs: list, top_n: int) -> list:
+        deadline = time.monotonic() + self.time_budget
+        normalized = normalize_query(query)
+        scores = {}
+        pending = []
+        for doc in docs:
+            chunk_id = self._chunk_key(doc)
+            score = rerank_score_cache.get((normalized, chunk_id))
+            if score is None:
+                pending.append((chunk_id, doc.page_content))
+            else:
+                scores[chunk_id] = score
+
+        # Duplicate chunk ids only need scoring once
+        pending = list(dict(pending).items())
+        for start in range(0, len(pending), self.batch_size):
+            if time.monotonic() > deadline:
+                self.timeouts += 1
+                return docs[:top_n]
+            batch = pending[start:start + self.batch_size]
+            try:
+                batch_scores = self.model.predict([(query, text) for _, text in batch],
+                                                  batch_size=self.batch_size, show_progress_bar=False)
+            except Exception as e:
+                print(f"Re-ranking failed, keeping retrieval order: {e}")
+                return docs[:top_n]
+            for (chunk_id, _), score in zip(batch, batch_scores):
+                scores[chunk_id] = float(score)
+                rerank_score_cache.set((normalized, chunk_id), float(score))
+
+        ranked = sorted(enumerate(docs), key=lambda item: (-scores[self._chunk_key(item[1])], item[0]))
+        return [doc for _, doc in ranked[:top_n]]
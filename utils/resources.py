@@ -0,0 +1,123 @@
+"""Process-wide shared resources.
+
+Streamlit re-executes app.py on every rerun and runs each session on its own
+thread, so expensive objects (Chroma client, Groq HTTP client, processors) are
+created once per process here, on first use, and shared across sessions and
+threads. Imports are deferred so the login page doesn't pay for Chroma,
+PyTorch or the Groq SDK.
+"""
+import threading
+from config import Config
+
+_instances = {}
+_lock = threading.RLock()
+
+
+def _shared(key, factory):
+    instance = _instances.get(key)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(key)
+            if instance is None:
+                instance = factory()
+                _instances[key] = instance
+    return instance
+
+
+def get_chroma_client(path: str = None):
+    path = path or Config.VECTOR_DB_PATH
+
+    def create():
+        import chromadb
+        return chromadb.PersistentClient(path=path)
+    return _shared(("chroma", path), create)
+
+
+def get_groq_client():
+    """One Groq client per process so its HTTP connection pool is reused across requests"""
+    def create():
+        from groq import Groq
+        client = Groq(api_key=Config.GROQ_API_KEY, base_url=Config.GROQ_BASE_URL)
+        print("✅ Groq client initialized successfully")
+        return client
+    return _shared("groq", create)
+
+
+def get_document_processor():
+    def create():
+        from utils.document_loader import DocumentProcessor
+        return DocumentProcessor()
+    return _shared("document_processor", create)
+
+
+def get_vector_manager():
+    def create():
+        from utils.vector_store import VectorStoreManager
+        return VectorStoreManager()
+    return _shared("vector_manager", create)
+
+
+def get_rag_system():
+    def create():
+        from utils.rag import RAGSystem
+        return RAGSystem()
+    return _shared("rag_system", create)
+
+
+def get_reranker():
+    def create():
+        from utils.reranker import CrossEncoderReranker
+        return CrossEncoderReranker()
+    return _shared("reranker", create)
+
+
+def get_parse_pool():
+    """Warm process pool for parsing files, shared by the upload path and the ingest workers.
+
+    Spawned workers import the parsers once instead of once per batch; they
+    are started on first use.
+    """
+    def create():
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=Config.PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _shared("parse_pool", create)
+
+
+def discard_parse_pool(pool):
+    """Drop a pool broken by a crashed worker so the next caller gets a fresh one"""
+    with _lock:
+        if _instances.get("parse_pool") is pool:
+            del _instances["parse_pool"]
+    pool.shutdown(wait=False)
+
+
+def get_ingest_queue():
+    def create():
+        from utils.ingest_queue import IngestQueue
+        return IngestQueue()
+    return _shared("ingest_queue", create)
+
+
+def get_ingest_workers():
+    """Background ingestion workers, started on first call"""
+    def create():
+        from utils.ingest_queue import IngestWorkerPool
+        pool = IngestWorkerPool(get_ingest_queue())
+        pool.start()
+        return pool
+    return _shared("ingest_workers", create)
+
+
+def get_audit_store():
+    def create():
+        from utils.audit_store import AuditStore
+        return AuditStore()
+    return _shared("audit_store", create)
+
+
+def get_user_store():
+    def create():
+        from utils.user_store import UserStore
+        return UserStore()
+    return _shared("user_store", create)
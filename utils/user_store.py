@@ -0,0 +1,145 @@
+"""Persistent user accounts.
+
+Users live in a SQLite table with their bcrypt hashes, so nothing is hashed
+at import time; the demo accounts are seeded with precomputed hashes when the
+database file is first created (and Config.SEED_DEMO_USERS is set), never on a
+later start, so deleted demo users stay deleted. A password stored with a cost other than
+Config.BCRYPT_ROUNDS is re-hashed on its next successful login. At most
+Config.AUTH_MAX_CONCURRENT_HASHES bcrypt operations run at once per process,
+so a login storm queues instead of saturating every core.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import bcrypt
+
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    role TEXT NOT NULL,
+    department TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# (username, bcrypt hash of the demo password at cost 12, role, department)
+DEMO_USERS = [
+    ("admin", "$2b$12$O.7ht9R6IV7/OPHz5M536elb37pumSD/KxRBvw2.Za4W53hsLvvFq", "admin", "IT"),
+    ("employee", "$2b$12$oyNlSQ3AlE4HaZ3dZAMu7uABB7scdcWReM8HAhE0M.ZpVOcQlqFs6", "user", "HR"),
+    ("viewer", "$2b$12$mz3apNe.yU/R8DlsYGSOV..v31yVDaJkKWJvAYzejdykfvPMsNFve", "viewer", "Marketing"),
+]
+
+# Checked for unknown usernames so they take as long to reject as wrong passwords
+_DUMMY_HASH = DEMO_USERS[0][1]
+
+
+def hash_rounds(password_hash: str) -> int:
+    """Cost factor of a "$2b$<rounds>$..." hash"""
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+class UserStore:
+    def __init__(self, db_path: str = None, rounds: int = None, max_concurrent_hashes: int = None):
+        self.db_path = db_path or Config.USER_DB_PATH
+        self.rounds = rounds or Config.BCRYPT_ROUNDS
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._hash_slots = threading.BoundedSemaphore(max_concurrent_hashes or Config.AUTH_MAX_CONCURRENT_HASHES)
+        self._lock = threading.Lock()
+        self._secret = None
+        created = self.db_path == ":memory:" or not os.path.exists(self.db_path)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            if created and Config.SEED_DEMO_USERS:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO users (username, password_hash, role, department, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(username, password_hash, role, department, time.time())
+                     for username, password_hash, role, department in DEMO_USERS]
+                )
+            self._conn.commit()
+
+    def _hash(self, password: str) -> str:
+        with self._hash_slots:
+            return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds)).decode("ascii")
+
+    def _check(self, password: str, password_hash: str) -> bool:
+        with self._hash_slots:
+            return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("ascii"))
+
+    def get(self, username: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def verify(self, username: str, password: str) -> Optional[Dict]:
+        """The user's profile (username, role, department) if the password matches"""
+        row = self.get(username)
+        valid = self._check(password, row["password_hash"] if row else _DUMMY_HASH)
+        if row is None or not valid:
+            return None
+        if hash_rounds(row["password_hash"]) != self.rounds:
+            self.set_password(username, password)
+        return {"username": row["username"], "role": row["role"], "department": row["department"]}
+
+    def add_user(self, username: str, password: str, role: str, department: str = None):
+        password_hash = self._hash(password)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO users (username, password_hash, role, department, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (username, password_hash, role, department, time.time())
+            )
+            self._conn.commit()
+
+    def set_password(self, username: str, password: str) -> bool:
+        password_hash = self._hash(password)
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE users SET password_hash = ?, updated_at = ? WHERE username = ?",
+                (password_hash, time.time(), username)
+            ).rowcount
+            self._conn.commit()
+        return bool(updated)
+
+    def delete_user(self, username: str) -> bool:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM users WHERE username = ?", (username,)).rowcount
+            self._conn.commit()
+        return bool(deleted)
+
+    def list_users(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT username, role, department, updated_at FROM users ORDER BY username"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def secret(self) -> bytes:
+        """Random session-signing key, created once and shared by every process using this database"""
+        if self._secret is not None:
+            return self._secret
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('session_secret', ?)",
+                               (secrets.token_hex(32),))
+            self._conn.commit()
+            value = self._conn.execute("SELECT value FROM settings WHERE key = 'session_secret'").fetchone()[0]
+        self._secret = bytes.fromhex(value)
+        return self._secret
@@ -1,4 +1,10 @@
-import chromadb
+import hashlib
+import os
+import re
+import threading
+import uuid
+from itertools import islice
+from typing import Iterable, Iterator
 # FIXED: Use correct import path
 # Try this import instead  
 try:
@@ -6,84 +12,646 @@ try:
 except ImportError:
     from langchain_core.documents import Document
 from config import Config
+from utils.embeddings import EmbeddingEngine
+from utils.folder_sync import SyncManifest
+from utils.bm25 import BM25Index
+from utils.chunk_store import ChunkStore, stitch
+from utils.metrics import span
+from utils.quantized_index import QuantizedIndex
+from utils.cache import normalize_query, retrieval_cache
+from utils.query_expansion import expand_query
+from utils.resources import get_chroma_client, get_document_processor, get_reranker
 import streamlit as st
 
+
+def fuse_rankings(rankings: list, k: int = None) -> list:
+    """Reciprocal-rank fusion of ranked id lists: [(id, sum(1 / (k + rank)))], best first"""
+    k = k or Config.RRF_K
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = None) -> list:
+    """Fused ids only, best first (see fuse_rankings)"""
+    return [chunk_id for chunk_id, _ in fuse_rankings(rankings, k)]
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IndexKind:
+    """A kind of index derived from each collection and kept next to the Chroma data.
+
+    cls(path).clear() deletes one, cls.load(path) opens it, and
+    add(index, rows) indexes rows shaped like a Chroma get() result with the
+    given include fields; it is also how a populated collection without the
+    index is backfilled. Indexes with a refresh() method catch up with other
+    processes' writes in place; the rest are reopened when the version moves.
+    """
+
+    def __init__(self, cls, suffix: str, include: list, add, enabled=None):
+        self.cls = cls
+        self.suffix = suffix
+        self.include = include
+        self.add = add
+        self.enabled = enabled or (lambda: True)
+        self.refreshable = hasattr(cls, "refresh")
+
+
+def _add_chunk_rows(store: ChunkStore, rows: dict):
+    store.add(rows["ids"], [Document(page_content=text, metadata=metadata or {})
+                            for text, metadata in zip(rows["documents"], rows["metadatas"])])
+
+
+INDEX_KINDS = {
+    "lexical": IndexKind(BM25Index, "bm25.log", ["documents"],
+                         lambda index, rows: index.add(rows["ids"], rows["documents"])),
+    "dense": IndexKind(QuantizedIndex, "int8", ["embeddings"],
+                       lambda index, rows: index.add(rows["ids"], rows["embeddings"]),
+                       enabled=lambda: Config.VECTOR_INDEX == "int8"),
+    "chunks": IndexKind(ChunkStore, "chunks", ["documents", "metadatas"], _add_chunk_rows,
+                        enabled=lambda: Config.CHUNK_STORE_ENABLED),
+}
+
+
 class VectorStoreManager:
     def __init__(self):
-        self.client = chromadb.PersistentClient(path=Config.VECTOR_DB_PATH)
-        self.collection_name = "company_docs"
-    def create_vector_store(self, documents: list, collection_name: str = "company_docs"):
+        self.client = get_chroma_client(Config.VECTOR_DB_PATH)
+        self.collection_name = Config.SHARED_COLLECTION
+        self.embedder = EmbeddingEngine()
+        # (kind, collection name) -> (collection version, index); see INDEX_KINDS
+        self._indexes = {}
+        # (kind, collection name) of indexes being reloaded in the background
+        self._reloading = set()
+        self._index_lock = threading.Lock()
+        # Ingestion workers share this manager; Chroma's get_or_create and the
+        # BM25 log are not safe for concurrent writers to one collection.
+        # collection name -> lock, held only around the writes themselves
+        self._write_locks = {}
+
+    def _version_path(self, collection_name: str) -> str:
+        return os.path.join(Config.VECTOR_DB_PATH, f"{collection_name}.version")
+
+    def collection_version(self, collection_name: str = "company_docs") -> str:
+        """Stamp that changes whenever the collection's contents change.
+
+        It lives in a file next to the Chroma data so writes from other processes
+        (CLI jobs, workers) also invalidate cached retrievals and answers.
+        """
         try:
-            from utils.document_loader import DocumentProcessor
-            processor = DocumentProcessor()
-            split_docs = processor.split_documents(documents)
-            
-            # Handle collection creation/deletion properly
+            with open(self._version_path(collection_name), "r") as file:
+                return file.read()
+        except OSError:
+            return "0"
+
+    def collections_version(self, collection_names: list) -> str:
+        """Combined stamp for results drawn from several collections.
+
+        Names are included so answers cached for one set of partitions are
+        never served to a user who can see a different set.
+        """
+        return "|".join(f"{name}:{self.collection_version(name)}" for name in collection_names)
+
+    @staticmethod
+    def partition_name(department: str = None) -> str:
+        """Collection holding a department's documents; the shared collection for None"""
+        if not Config.PARTITION_BY_DEPARTMENT or not department:
+            return Config.SHARED_COLLECTION
+        slug = re.sub(r"[^a-z0-9]+", "_", department.lower()).strip("_") or "unknown"
+        return f"dept_{slug}"[:63]
+
+    def visible_partitions(self, department: str = None, all_departments: bool = False) -> list:
+        """Collections a user may search: the shared one plus their department's (or every partition)"""
+        names = [Config.SHARED_COLLECTION]
+        if not Config.PARTITION_BY_DEPARTMENT:
+            return names
+        if all_departments:
+            names += sorted(collection.name for collection in self.client.list_collections()
+                            if collection.name.startswith("dept_"))
+        elif department:
+            names.append(self.partition_name(department))
+        return names
+
+    def _bump_version(self, collection_name: str) -> str:
+        version = uuid.uuid4().hex
+        os.makedirs(Config.VECTOR_DB_PATH, exist_ok=True)
+        with open(self._version_path(collection_name), "w") as file:
+            file.write(version)
+        return version
+
+    def _write_lock(self, collection_name: str) -> threading.Lock:
+        with self._index_lock:
+            return self._write_locks.setdefault(collection_name, threading.Lock())
+
+    def _index_path(self, kind: str, collection_name: str) -> str:
+        return os.path.join(Config.VECTOR_DB_PATH, f"{collection_name}.{INDEX_KINDS[kind].suffix}")
+
+    def _index(self, kind: str, collection_name: str, collection=None):
+        """The collection's derived index of the given kind (see INDEX_KINDS).
+
+        When the collection version moved (another process wrote to it) a
+        refreshable index reads just what was appended; if its files were
+        compacted or cleared instead, the old index keeps serving while a
+        background thread reloads it. Other kinds are reopened. Backfilled
+        from Chroma when a populated collection has none yet.
+        """
+        spec = INDEX_KINDS[kind]
+        key = (kind, collection_name)
+        version = self.collection_version(collection_name)
+        with self._index_lock:
+            loaded = self._indexes.get(key)
+            if loaded is not None and loaded[0] == version:
+                return loaded[1]
+            if loaded is not None and spec.refreshable:
+                if loaded[1].refresh():
+                    self._indexes[key] = (version, loaded[1])
+                else:
+                    self._reload_index(kind, collection_name, version)
+                return loaded[1]
+            index = spec.cls.load(self._index_path(kind, collection_name))
+            if not len(index) and collection is not None and collection.count():
+                batch_size = Config.INGEST_BATCH_SIZE * 4
+                for offset in range(0, collection.count(), batch_size):
+                    spec.add(index, collection.get(include=spec.include, limit=batch_size, offset=offset))
+            self._indexes[key] = (version, index)
+            return index
+
+    def _reload_index(self, kind: str, collection_name: str, version: str):
+        # Called with _index_lock held
+        key = (kind, collection_name)
+        if key in self._reloading:
+            return
+        self._reloading.add(key)
+
+        def reload():
             try:
-                # Try to delete existing collection
-                self.client.delete_collection(self.collection_name)
-                st.info("🔄 Clearing existing documents...")
-            except:
-                # Collection doesn't exist, that's fine
-                pass
-            
-            # Create fresh collection
-            self.collection = self.client.create_collection(self.collection_name)
-            
-            # Add documents
-            for i, doc in enumerate(split_docs):
-                self.collection.add(
-                    documents=[doc.page_content],
-                    metadatas=[doc.metadata],
-                    ids=[f"doc_{i}"]
-                )
+                index = INDEX_KINDS[kind].cls.load(self._index_path(kind, collection_name))
+                with self._index_lock:
+                    self._indexes[key] = (version, index)
+            finally:
+                with self._index_lock:
+                    self._reloading.discard(key)
+
+        threading.Thread(target=reload, name=f"{kind}-reload-{collection_name}", daemon=True).start()
+
+    def _write_indexes(self, collection_name: str, collection) -> dict:
+        """{kind: index} of the enabled derived indexes, for a write to the collection"""
+        return {kind: self._index(kind, collection_name, collection)
+                for kind, spec in INDEX_KINDS.items() if spec.enabled()}
+
+    def _commit_indexes(self, collection_name: str, indexes: dict):
+        """Bump the collection version after a write; the written indexes are current with it"""
+        version = self._bump_version(collection_name)
+        with self._index_lock:
+            for kind, index in indexes.items():
+                self._indexes[(kind, collection_name)] = (version, index)
+
+    def index_metadata(self, collection_name: str) -> dict:
+        """Chroma HNSW settings for a new collection"""
+        metadata = {
+            "hnsw:space": Config.HNSW_SPACE,
+            "hnsw:M": Config.HNSW_M,
+            "hnsw:construction_ef": Config.HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": Config.HNSW_SEARCH_EF,
+        }
+        metadata.update(Config.HNSW_COLLECTION_PARAMS.get(collection_name, {}))
+        return metadata
+
+    def _get_or_create_collection(self, collection_name: str):
+        # get_or_create_collection(metadata=...) would overwrite the settings of an
+        # existing collection without rebuilding its index, so only pass them on create
+        try:
+            return self.client.get_collection(collection_name, embedding_function=self.embedder)
+        except ValueError:
+            return self.client.create_collection(
+                collection_name, metadata=self.index_metadata(collection_name), embedding_function=self.embedder
+            )
+
+    @staticmethod
+    def _cosine_distance(distance: float, space: str) -> float:
+        # Embeddings are unit-normalized: squared L2 is twice the cosine distance, ip is 1 - cosine
+        return distance / 2 if space == "l2" else distance
+
+    def _drop_indexes(self, collection_name: str):
+        # Snapshot file written before the BM25 index became a log
+        legacy_path = os.path.join(Config.VECTOR_DB_PATH, f"{collection_name}.bm25.json")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        with self._index_lock:
+            for kind, spec in INDEX_KINDS.items():
+                self._indexes.pop((kind, collection_name), None)
+                spec.cls(self._index_path(kind, collection_name)).clear()
+
+    @staticmethod
+    def _forget_synced_files(collection_name: str):
+        # The folder sync manifest would otherwise report the cleared files as unchanged
+        if os.path.exists(Config.SYNC_MANIFEST_PATH):
+            SyncManifest().clear(collection_name)
+
+    @staticmethod
+    def chunk_id(doc: Document) -> str:
+        """Stable id derived from the chunk's source and content"""
+        digest = hashlib.sha256()
+        digest.update(str(doc.metadata.get("source", "")).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(doc.page_content.encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def ingest_documents(self, documents: Iterable[Document], collection_name: str = "company_docs",
+                         mode: str = None, batch_size: int = None, progress_callback=None) -> dict:
+        """Split and ingest documents, raising on failure.
+
+        documents may be a lazy iterator (see iter_file_bytes): it is split
+        and embedded batch_size chunks at a time, so only one batch is held in
+        memory. mode is "append" (skip chunks already stored), "upsert"
+        (overwrite chunks with the same id) or "rebuild" (drop the collection
+        first). progress_callback(chunks_done, chunks_added) is called after
+        each batch. Returns the chunk ids plus added/skipped counts.
+
+        Parsing, splitting and embedding run unlocked; only the writes to
+        Chroma and the derived indexes hold the collection's write lock, so
+        ingests into different collections (or batches being embedded) don't
+        wait on each other.
+        """
+        mode = mode or Config.INGEST_MODE
+        batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        split_docs = get_document_processor().iter_split(documents)
+        return self._write_chunks(split_docs, collection_name, mode, batch_size, progress_callback)
+
+    def _write_chunks(self, split_docs: Iterable[Document], collection_name: str, mode: str, batch_size: int,
+                      progress_callback) -> dict:
+        write_lock = self._write_lock(collection_name)
+        with write_lock:
+            if mode == "rebuild":
+                try:
+                    self.client.delete_collection(collection_name)
+                except ValueError:
+                    # Collection doesn't exist, that's fine
+                    pass
+                self._forget_synced_files(collection_name)
             
-            st.success(f"✅ Processed {len(split_docs)} document chunks")
+            collection = self._get_or_create_collection(collection_name)
+            indexes = self._write_indexes(collection_name, collection)
+            if mode == "rebuild":
+                for index in indexes.values():
+                    index.clear()
+        
+        ids = []
+        seen = set()
+        chunks = 0
+        added = 0
+        try:
+            for batch in _batched(split_docs, batch_size):
+                chunks += len(batch)
+                # Identical chunks hash to the same id; Chroma rejects duplicate ids in one call
+                unique_docs = {}
+                for doc in batch:
+                    chunk_id = self.chunk_id(doc)
+                    if chunk_id not in seen:
+                        seen.add(chunk_id)
+                        unique_docs[chunk_id] = doc
+                batch_ids = list(unique_docs)
+                ids.extend(batch_ids)
+                if mode != "upsert" and batch_ids:
+                    batch_ids = self._missing_ids(collection, batch_ids)
+                if batch_ids:
+                    batch_docs = [unique_docs[chunk_id] for chunk_id in batch_ids]
+                    rows = {"ids": batch_ids, "documents": [doc.page_content for doc in batch_docs],
+                            "metadatas": [doc.metadata for doc in batch_docs]}
+                    rows["embeddings"] = self.embedder.embed_documents(rows["documents"])
+                    with write_lock:
+                        if mode == "upsert":
+                            write = collection.upsert
+                        else:
+                            # Another writer may have stored some of them while these were embedded
+                            rows = self._drop_rows(rows, set(self._missing_ids(collection, rows["ids"])))
+                            write = collection.add
+                        if rows["ids"]:
+                            with span("collection_add"):
+                                write(**rows)
+                            for kind, index in indexes.items():
+                                INDEX_KINDS[kind].add(index, rows)
+                            added += len(rows["ids"])
+                if progress_callback is not None:
+                    progress_callback(chunks, added)
+        finally:
+            # Batches already written stay written if a later one (or parsing) fails
+            if added or mode == "rebuild":
+                with write_lock:
+                    self._commit_indexes(collection_name, indexes)
+        
+        return {"ids": ids, "chunks": chunks, "added": added, "skipped": chunks - added}
+    
+    @staticmethod
+    def _missing_ids(collection, ids: list) -> list:
+        """ids not yet stored in the collection, in order"""
+        existing = set(collection.get(ids=ids, include=[])["ids"])
+        return [chunk_id for chunk_id in ids if chunk_id not in existing]
+
+    @staticmethod
+    def _drop_rows(rows: dict, keep: set) -> dict:
+        if len(keep) == len(rows["ids"]):
+            return rows
+        positions = [i for i, chunk_id in enumerate(rows["ids"]) if chunk_id in keep]
+        return {field: [values[i] for i in positions] for field, values in rows.items()}
+
+    def replace_chunks(self, split_docs: list, delete_ids: list, collection_name: str = "company_docs",
+                       batch_size: int = None) -> dict:
+        """Add already-split chunks, then delete others.
+
+        For incremental sync: chunks that are already stored are skipped, and
+        the collection version is bumped once per call
+        rather than once per file. delete_ids must not overlap the new chunks' ids.
+        """
+        batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        result = self._write_chunks(split_docs, collection_name, "append", batch_size, None) \
+            if split_docs else {"ids": [], "chunks": 0, "added": 0, "skipped": 0}
+        with self._write_lock(collection_name):
+            result["deleted"] = self._delete_chunks(delete_ids, collection_name, batch_size)
+        return result
+
+    def delete_chunks(self, ids: list, collection_name: str = "company_docs") -> int:
+        """Remove chunks by id from Chroma and its derived indexes; returns how many were stored"""
+        with self._write_lock(collection_name):
+            return self._delete_chunks(ids, collection_name, Config.INGEST_BATCH_SIZE)
+
+    def _delete_chunks(self, ids: list, collection_name: str, batch_size: int) -> int:
+        if not ids:
+            return 0
+        try:
+            collection = self.client.get_collection(collection_name, embedding_function=self.embedder)
+        except ValueError:
+            return 0
+        deleted = 0
+        for start in range(0, len(ids), batch_size):
+            batch_ids = collection.get(ids=list(ids[start:start + batch_size]), include=[])["ids"]
+            if batch_ids:
+                collection.delete(ids=batch_ids)
+                deleted += len(batch_ids)
+        if not deleted:
+            return 0
+        
+        indexes = self._write_indexes(collection_name, collection)
+        for index in indexes.values():
+            index.remove(ids)
+        self._commit_indexes(collection_name, indexes)
+        return deleted
+    
+    def create_vector_store(self, documents: list, collection_name: str = "company_docs",
+                            mode: str = None, batch_size: int = None):
+        """Split and ingest documents, reporting the outcome in the UI (see ingest_documents)"""
+        try:
+            if (mode or Config.INGEST_MODE) == "rebuild":
+                st.info("🔄 Clearing existing documents...")
+            result = self.ingest_documents(documents, collection_name, mode=mode, batch_size=batch_size)
+            if not result["chunks"]:
+                st.warning("No text could be extracted from the document")
+                return None
+            st.success(f"✅ Processed {result['chunks']} document chunks "
+                       f"({result['added']} new, {result['skipped']} already indexed)")
             return True
             
         except Exception as e:
             st.error(f"Error: {str(e)}")
             return None
     
-    def search_documents(self, query: str, k: int = 2, collection_name: str = "company_docs"):
+    def search_documents(self, query: str, k: int = 2, collection_name: str = "company_docs",
+                         mode: str = None, collection_names: list = None, rerank: bool = None,
+                         expand: bool = None):
+        """Top-k chunks for query.
+
+        mode "vector" is dense retrieval only; "hybrid" also runs BM25 over the
+        same chunks and fuses both candidate lists with reciprocal-rank fusion.
+        collection_names searches several partitions as one index: dense hits
+        are merged by distance and BM25 hits by score before fusion. With
+        expand (default Config.QUERY_EXPANSION) synonym rewrites of the query
+        are searched in the same batch and the rankings fused. With rerank
+        (default Config.RERANK_ENABLED) the best RERANK_CANDIDATES are
+        re-scored by the cross-encoder and the top k of those returned.
+        Each chunk's id is set in metadata["chunk_id"].
+        """
+        with span("search_documents"):
+            return self._search(query, k, collection_name, mode, collection_names, rerank, expand)
+
+    def _search(self, query: str, k: int, collection_name: str, mode: str, collection_names: list,
+                rerank: bool, expand: bool) -> list:
+        mode = mode or Config.RETRIEVAL_MODE
+        rerank = Config.RERANK_ENABLED if rerank is None else rerank
+        expand = Config.QUERY_EXPANSION if expand is None else expand
+        names = list(collection_names) if collection_names is not None else [collection_name]
+        cache_key = (tuple(names), normalize_query(query), k, mode, rerank, expand,
+                     self.collections_version(names))
+        cached = retrieval_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        queries = [query] + (expand_query(query) if expand else [])
         try:
-            self.collection = self.client.get_collection(self.collection_name)
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=k
-            )
-            
-            docs = []
-            if results['documents'] and len(results['documents']) > 0:
-                for i in range(len(results['documents'][0])):
-                    docs.append(Document(
-                        page_content=results['documents'][0][i],
-                        metadata=results['metadatas'][0][i] if results['metadatas'] and i < len(results['metadatas'][0]) else {}
-                    ))
-            return docs
-            
+            _, docs = self._search_batch(queries, k, names, mode, rerank)
         except Exception as e:
             st.error(f"Search error: {str(e)}")
             return []
+        retrieval_cache.set(cache_key, docs)
+        return list(docs)
     
-    def get_search_stats(self):
-        """Get statistics about the vector store"""
+    def search_batch(self, queries: list, k: int = 4, collection_name: str = "company_docs",
+                     mode: str = None, collection_names: list = None, rerank: bool = None) -> dict:
+        """Search several queries in one round-trip per collection.
+
+        The queries are embedded in one batch and sent to each collection as a
+        single vectorized query. Returns {"results": [[(Document, score)] per
+        query, best first, k each], "fused": [Document]}. score is the cosine
+        similarity in "vector" mode and the fusion score in "hybrid" mode.
+        fused is the top k of all rankings merged with reciprocal-rank fusion
+        and deduplicated by chunk id; with rerank it is re-scored against
+        queries[0]. Fusion assumes the queries are phrasings of one question.
+        """
+        mode = mode or Config.RETRIEVAL_MODE
+        rerank = Config.RERANK_ENABLED if rerank is None else rerank
+        names = list(collection_names) if collection_names is not None else [collection_name]
+        queries = list(queries)
+        if not queries:
+            return {"results": [], "fused": []}
+        with span("search_batch"):
+            try:
+                results, fused = self._search_batch(queries, k, names, mode, rerank)
+            except Exception as e:
+                st.error(f"Search error: {str(e)}")
+                return {"results": [[] for _ in queries], "fused": []}
+        return {"results": results, "fused": fused}
+    
+    def _search_batch(self, queries: list, k: int, names: list, mode: str, rerank: bool) -> tuple:
+        limit = max(k, Config.RERANK_CANDIDATES) if rerank else k
+        pool_size = max(limit, Config.HYBRID_CANDIDATE_POOL) if mode == "hybrid" else limit
+        query_embeddings = self.embedder.embed_queries(queries)
+        docs_by_id = {}
+        collections = {}
+        collection_of = {}
+        dense_hits = [[] for _ in queries]
+        lexical_hits = [[] for _ in queries]
+        for name in names:
+            try:
+                collection = self.client.get_collection(name, embedding_function=self.embedder)
+            except ValueError:
+                # Partition nobody has uploaded to yet
+                continue
+            if not collection.count():
+                continue
+            collections[name] = collection
+            if Config.VECTOR_INDEX == "int8":
+                # Documents for the winners are fetched after fusion
+                found = self._index("dense", name, collection).search_many(query_embeddings, pool_size)
+                for hits, query_hits in zip(dense_hits, found):
+                    for distance, chunk_id in query_hits:
+                        collection_of[chunk_id] = name
+                        hits.append((distance, chunk_id))
+            else:
+                space = (collection.metadata or {}).get("hnsw:space", "l2")
+                results = collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=min(pool_size, collection.count()),
+                    include=["documents", "metadatas", "distances"]
+                )
+                for hits, ids, texts, metadatas, distances in zip(
+                    dense_hits, results['ids'], results['documents'], results['metadatas'], results['distances']
+                ):
+                    for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances):
+                        docs_by_id[chunk_id] = Document(page_content=text, metadata=metadata or {})
+                        collection_of[chunk_id] = name
+                        hits.append((self._cosine_distance(distance, space), chunk_id))
+            
+            if mode == "hybrid":
+                lexical_index = self._index("lexical", name, collection)
+                for hits, query in zip(lexical_hits, queries):
+                    for chunk_id, score in lexical_index.search(query, pool_size):
+                        collection_of.setdefault(chunk_id, name)
+                        hits.append((score, chunk_id))
+        
+        # Per-query rankings of (chunk id, score)
+        rankings = []
+        for dense, lexical in zip(dense_hits, lexical_hits):
+            dense_ranked = [(chunk_id, 1.0 - distance) for distance, chunk_id in sorted(dense)][:pool_size]
+            if mode == "hybrid":
+                lexical_ids = [chunk_id for _, chunk_id in sorted(lexical, reverse=True)][:pool_size]
+                rankings.append(fuse_rankings([[chunk_id for chunk_id, _ in dense_ranked], lexical_ids])[:limit])
+            else:
+                rankings.append(dense_ranked[:limit])
+        if len(rankings) > 1:
+            fused_ids = reciprocal_rank_fusion([[chunk_id for chunk_id, _ in ranking] for ranking in rankings])
+        else:
+            fused_ids = [chunk_id for chunk_id, _ in rankings[0]]
+        fused_ids = fused_ids[:limit]
+        
+        # BM25 and int8 hits only carry ids; their text comes from the chunk store, else from Chroma
+        wanted = dict.fromkeys(fused_ids + [chunk_id for ranking in rankings for chunk_id, _ in ranking[:k]])
+        missing = {}
+        for chunk_id in wanted:
+            if chunk_id not in docs_by_id:
+                missing.setdefault(collection_of[chunk_id], []).append(chunk_id)
+        for name, chunk_ids in missing.items():
+            if Config.CHUNK_STORE_ENABLED:
+                docs_by_id.update(self._index("chunks", name, collections[name]).get(chunk_ids))
+                chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id not in docs_by_id]
+            if not chunk_ids:
+                continue
+            fetched = collections[name].get(ids=chunk_ids, include=["documents", "metadatas"])
+            for chunk_id, text, metadata in zip(fetched['ids'], fetched['documents'], fetched['metadatas']):
+                docs_by_id[chunk_id] = Document(page_content=text, metadata=metadata or {})
+        for chunk_id in wanted:
+            if chunk_id in docs_by_id:
+                docs_by_id[chunk_id].metadata["chunk_id"] = chunk_id
+                docs_by_id[chunk_id].metadata["collection"] = collection_of[chunk_id]
+        
+        fused = [docs_by_id[chunk_id] for chunk_id in fused_ids if chunk_id in docs_by_id]
+        fused = get_reranker().rerank(queries[0], fused, k) if rerank else fused[:k]
+        results = [[(docs_by_id[chunk_id], score) for chunk_id, score in ranking[:k] if chunk_id in docs_by_id]
+                   for ranking in rankings]
+        return results, fused
+    
+    def neighbors(self, doc: Document, window: int = 1) -> list:
+        """doc and up to window chunks either side of it from the same source, in source order.
+
+        doc must come from search_documents (which sets its chunk id and
+        collection); [doc] is returned when no neighbours are known.
+        """
+        chunk_id = doc.metadata.get("chunk_id")
+        if not Config.CHUNK_STORE_ENABLED or not chunk_id or window <= 0:
+            return [doc]
+        name = doc.metadata.get("collection", self.collection_name)
         try:
-            self.collection = self.client.get_collection(self.collection_name)
-            count = self.collection.count()
-            return {
-                "total_chunks": count,
-                "collection_name": self.collection_name
-            }
-        except:
+            collection = self.client.get_collection(name, embedding_function=self.embedder)
+        except ValueError:
+            return [doc]
+        return self._index("chunks", name, collection).neighbors(chunk_id, window) or [doc]
+
+    def context_window(self, doc: Document, window: int = 1) -> str:
+        """Text of doc's chunk widened by its neighbours, overlaps removed"""
+        return stitch(self.neighbors(doc, window))
+
+    def expand_neighbors(self, docs: list, window: int = None) -> list:
+        """Each retrieved chunk widened to include window neighbours either side (for prompt context)"""
+        window = Config.CONTEXT_NEIGHBORS if window is None else window
+        if window <= 0:
+            return docs
+        expanded = []
+        for doc in docs:
+            run = self.neighbors(doc, window)
+            metadata = dict(doc.metadata)
+            paged = [neighbour.metadata for neighbour in run if "page" in neighbour.metadata]
+            if paged:
+                metadata["page"] = min(meta["page"] for meta in paged)
+                metadata["page_end"] = max(meta.get("page_end", meta["page"]) for meta in paged)
+            rows = [neighbour.metadata for neighbour in run if "row_start" in neighbour.metadata]
+            if rows:
+                metadata["row_start"] = min(meta["row_start"] for meta in rows)
+                metadata["row_end"] = max(meta["row_end"] for meta in rows)
+            expanded.append(Document(page_content=stitch(run), metadata=metadata))
+        return expanded
+    
+    def get_search_stats(self, collection_names: list = None):
+        """Get statistics about the vector store (summed over collection_names)"""
+        names = collection_names or [self.collection_name]
+        total = 0
+        found = []
+        for name in names:
+            try:
+                collection = self.client.get_collection(name, embedding_function=self.embedder)
+            except Exception:
+                continue
+            total += collection.count()
+            found.append(name)
+        if not found:
             return {"total_chunks": 0, "collection_name": "Not available"}
+        return {
+            "total_chunks": total,
+            "collection_name": ", ".join(found)
+        }
     
-    def clear_database(self):
-        """Completely clear the database"""
+    def clear_database(self, collection_names: list = None):
+        """Completely clear the given collections (by default the shared one)"""
+        names = collection_names or [self.collection_name]
         try:
-            self.client.delete_collection(self.collection_name)
+            for name in names:
+                with self._write_lock(name):
+                    try:
+                        self.client.delete_collection(name)
+                    except ValueError:
+                        # Collection doesn't exist, that's fine
+                        pass
+                    self._drop_indexes(name)
+                    self._forget_synced_files(name)
+                    self._bump_version(name)
             st.success("✅ Database cleared successfully!")
             return True
         except Exception as e:
             st.error(f"Error clearing database: {str(e)}")
-            return False
\ No newline at end of file
+            return False